@@ -1,6 +1,7 @@
-from flask import Flask
+from flask import Flask, redirect, session, url_for
 from flask_pymongo import PyMongo
 from flask_bcrypt import Bcrypt
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -18,15 +19,190 @@ def create_app():
     # 配置MongoDB
     app.config["MONGO_URI"] = os.getenv("MONGO_URI", "mongodb://localhost:27017/world_guide")
     
+    # MongoDB连接池：每个工作进程的最大连接数、等待连接超时和选择服务器超时（毫秒）
+    app.config["MONGO_MAX_POOL_SIZE"] = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    app.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"] = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+    app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    
     # 配置应用密钥
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-flask-secret-key")
     
+    # 列表页每页文章数
+    app.config["ARTICLES_PAGE_SIZE"] = int(os.getenv("ARTICLES_PAGE_SIZE", "20"))
+    
+    # 浏览量计数：exact 每次浏览直接写入，buffered 合并后批量写入
+    app.config["VIEW_COUNTER_MODE"] = os.getenv("VIEW_COUNTER_MODE", "exact")
+    app.config["VIEW_COUNTER_FLUSH_INTERVAL"] = float(os.getenv("VIEW_COUNTER_FLUSH_INTERVAL", "5"))
+    app.config["VIEW_COUNTER_MAX_PENDING"] = int(os.getenv("VIEW_COUNTER_MAX_PENDING", "1000"))
+    
+    # 密码哈希：进程池大小、排队上限和等待超时（秒）
+    # 未设置 BCRYPT_LOG_ROUNDS 时，启动时按 BCRYPT_TARGET_MS 自动选择工作因子
+    app.config["BCRYPT_POOL_SIZE"] = int(os.getenv("BCRYPT_POOL_SIZE", "2"))
+    app.config["BCRYPT_QUEUE_SIZE"] = int(os.getenv("BCRYPT_QUEUE_SIZE", "8"))
+    app.config["BCRYPT_QUEUE_TIMEOUT"] = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "5"))
+    app.config["BCRYPT_TARGET_MS"] = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+    if os.getenv("BCRYPT_LOG_ROUNDS"):
+        app.config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS"))
+    
+    # 用户信息缓存
+    app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", "300"))
+    app.config["USER_CACHE_MAX_ENTRIES"] = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    
+    # 页面缓存：memory 为进程内缓存，mongo 为多进程共享缓存，none 关闭
+    app.config["PAGE_CACHE_BACKEND"] = os.getenv("PAGE_CACHE_BACKEND", "memory")
+    app.config["PAGE_CACHE_TTL"] = int(os.getenv("PAGE_CACHE_TTL", "60"))
+    app.config["PAGE_CACHE_MAX_ENTRIES"] = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1000"))
+    
+    # 后台任务（搜索索引、相关文章、缩略图）：inline 由本进程的后台线程执行，queue 写入队列由 flask jobs work 执行
+    app.config["JOB_QUEUE_MODE"] = os.getenv("JOB_QUEUE_MODE", "inline").lower()
+    # inline 模式的后台线程数，0 表示在请求中直接执行（仅用于调试）
+    app.config["JOB_INLINE_WORKERS"] = int(os.getenv("JOB_INLINE_WORKERS", "1"))
+    app.config["JOB_MAX_ATTEMPTS"] = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    app.config["JOB_LEASE_SECONDS"] = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+    app.config["JOB_RETRY_BASE_SECONDS"] = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+    
+    # 列表页和个人中心流式渲染：页面头部先发出，文章边从游标读取边渲染
+    app.config["STREAM_LIST_PAGES"] = os.getenv("STREAM_LIST_PAGES", "").lower() in ("1", "true", "yes")
+    app.config["STREAM_CHUNK_SIZE"] = int(os.getenv("STREAM_CHUNK_SIZE", "2048"))
+    
+    # 响应压缩：按 Accept-Encoding 选择 Brotli 或 gzip，小于 COMPRESS_MIN_SIZE 字节的响应不压缩
+    app.config["COMPRESS_RESPONSES"] = os.getenv("COMPRESS_RESPONSES", "1").lower() in ("1", "true", "yes")
+    app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    app.config["COMPRESS_GZIP_LEVEL"] = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+    app.config["COMPRESS_BROTLI_QUALITY"] = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+    
+    # 正文存储编码：zlib（默认）、zstd（需安装 zstandard）或 none；短于 CONTENT_COMPRESS_MIN_SIZE 字节的正文不压缩
+    app.config["CONTENT_CODEC"] = os.getenv("CONTENT_CODEC", "zlib").lower()
+    app.config["CONTENT_COMPRESS_MIN_SIZE"] = int(os.getenv("CONTENT_COMPRESS_MIN_SIZE", "256"))
+    if os.getenv("CONTENT_COMPRESS_LEVEL"):
+        app.config["CONTENT_COMPRESS_LEVEL"] = int(os.getenv("CONTENT_COMPRESS_LEVEL"))
+    
+    # 限流：memory 为进程内计数，mongo 为多进程共享计数，none 关闭；RATE_LIMITS 覆盖默认限额，如 auth.login=10/60
+    app.config["RATE_LIMIT_BACKEND"] = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    app.config["RATE_LIMITS"] = os.getenv("RATE_LIMITS", "")
+    # 过载保护：受限端点在近 10 秒请求中 MongoDB 命令耗时的 p90（毫秒）、后台任务排队数或本进程处理中的受限请求数超过阈值时返回503，0 表示不检查
+    app.config["SHED_MONGO_LATENCY_MS"] = float(os.getenv("SHED_MONGO_LATENCY_MS", "500"))
+    app.config["SHED_JOB_QUEUE_DEPTH"] = int(os.getenv("SHED_JOB_QUEUE_DEPTH", "10000"))
+    app.config["SHED_MAX_INFLIGHT"] = int(os.getenv("SHED_MAX_INFLIGHT", "0"))
+    
+    # 反向代理的层数：信任 X-Forwarded-For 中最后几个地址，限流和日志按真实客户端IP计；
+    # 直接对外服务时保持0，否则客户端可以伪造该请求头
+    app.config["PROXY_FIX_X_FOR"] = int(os.getenv("PROXY_FIX_X_FOR", "0"))
+    
+    # 读路由：开启后列表、详情、搜索和个人中心按读偏好读取副本集从节点，maxStalenessSeconds 不小于90
+    app.config["READ_ROUTING"] = os.getenv("READ_ROUTING", "").lower() in ("1", "true", "yes")
+    app.config["READ_PREFERENCE"] = os.getenv("READ_PREFERENCE", "secondaryPreferred")
+    app.config["READ_MAX_STALENESS_SECONDS"] = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+    app.config["READ_ROUTES"] = os.getenv("READ_ROUTES", "")
+    # 作者写入后多少秒内在因果一致会话中读取个人中心，默认与 READ_MAX_STALENESS_SECONDS 相同
+    if os.getenv("READ_YOUR_WRITES_SECONDS"):
+        app.config["READ_YOUR_WRITES_SECONDS"] = int(os.getenv("READ_YOUR_WRITES_SECONDS"))
+    
+    # 日志级别，以及记录慢请求明细的耗时阈值（毫秒）
+    app.config["LOG_LEVEL"] = os.getenv("LOG_LEVEL", "INFO").upper()
+    app.config["SLOW_REQUEST_MS"] = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    
+    # flask assets build 的输出目录，默认为 app/static/dist
+    app.config["ASSETS_DIST_DIR"] = os.getenv("ASSETS_DIST_DIR")
+    
+    from app.log import configure_logging
+    configure_logging(app)
+    
+    if app.config["PROXY_FIX_X_FOR"]:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
+    
     # 初始化扩展
-    mongo.init_app(app)
+    # connect=False 让客户端在第一次使用时才建立连接，fork 之前创建的客户端不会被子进程继承使用
+    from app import tracing
+    mongo.init_app(
+        app,
+        maxPoolSize=app.config["MONGO_MAX_POOL_SIZE"],
+        waitQueueTimeoutMS=app.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+        serverSelectionTimeoutMS=app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        connect=False,
+        event_listeners=[tracing.command_listener]
+    )
+    
+    from app.read_routing import read_routing
+    read_routing.init_app(app)
+    from app.codec import content_codec
+    content_codec.init_app(app)
+    from app.passwords import password_hasher
+    password_hasher.init_app(app)
     bcrypt.init_app(app)
     
+    from app.view_counter import view_counter
+    view_counter.init_app(app)
+    from app.jobs import job_queue
+    job_queue.init_app(app)
+    from app.page_cache import page_cache
+    page_cache.init_app(app)
+    from app.user_cache import user_cache
+    user_cache.init_app(app)
+    tracing.init_app(app)
+    # 在请求计时之后检查限流，被拒绝的请求也计入指标
+    from app.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+    # 模板通过 asset_url 引用静态资源，需在渲染任何页面之前注册
+    from app.assets import assets
+    assets.init_app(app)
+    from app.compression import compression
+    compression.init_app(app)
+    
     # 注册蓝图
     from app.blueprints.auth import auth_bp
     app.register_blueprint(auth_bp)
+    from app.blueprints.media import media_bp
+    app.register_blueprint(media_bp)
+    
+    # 首页：开发服务器和生产环境入口使用同一个应用，都需要注册
+    @app.route('/')
+    def index():
+        # 检查用户是否已登录，通过session验证
+        if 'user_id' in session:
+            # 已登录，重定向到主页
+            return redirect(url_for('auth.home_page'))
+        # 未登录，重定向到登录页面
+        return redirect(url_for('auth.login_page'))
+    
+    # 注册命令行工具
+    from app.media import media_cli
+    from app.derive import derive_cli
+    from app.indexes import indexes_cli
+    from app.stats import stats_cli
+    from app.search import search_cli
+    from app.recommend import recommend_cli
+    from app.assets import assets_cli
+    from app.transfer import data_cli
+    from app.codec import content_cli
+    from app.thumbnails import thumbnails_cli
+    from app.jobs import jobs_cli
+    from app.read_routing import reads_cli
+    from app.engagement import engagement_cli
+    from app.facets import facets_cli
+    app.cli.add_command(media_cli)
+    app.cli.add_command(derive_cli)
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(recommend_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(content_cli)
+    app.cli.add_command(thumbnails_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(reads_cli)
+    app.cli.add_command(engagement_cli)
+    app.cli.add_command(facets_cli)
+    
+    # 可选：启动时创建索引
+    if os.getenv("MONGO_ENSURE_INDEXES", "").lower() in ("1", "true", "yes"):
+        from app.indexes import ensure_indexes
+        with app.app_context():
+            try:
+                ensure_indexes()
+            except Exception:
+                logging.getLogger(__name__).exception("启动时创建索引失败")
     
     return app 
\ No newline at end of file
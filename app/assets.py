@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import abort, current_app, request, send_file, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+MANIFEST_NAME = 'manifest.json'
+ASSETS_URL_PREFIX = '/assets'
+
+# 一年，文件名包含内容哈希，内容变化时地址也会变化
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# 值得预先压缩的文本类文件
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    text = CSS_COMMENT_RE.sub('', text)
+    text = CSS_SPACE_RE.sub(' ', text)
+    text = CSS_PUNCTUATION_RE.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    # 未安装 rjsmin 时只去掉行尾空白和空行，其余交给 gzip/brotli
+    lines = (line.rstrip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def fingerprint(path, data):
+    """在扩展名前插入内容哈希：css/site.css -> css/site.0123456789ab.css"""
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build_assets(static_dir, dist_dir, clean=False):
+    """压缩、加指纹并预先压缩 static 目录下的全部文件，返回清单 {原路径: 带指纹的路径}
+
+    旧版本的文件默认保留，已缓存旧页面的浏览器仍能取到对应的资源。
+    """
+    if clean and os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    dist_dir = os.path.abspath(dist_dir)
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != dist_dir)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            if name.endswith('.css'):
+                data = minify_css(data.decode('utf-8')).encode('utf-8')
+            elif name.endswith('.js'):
+                data = minify_js(data.decode('utf-8')).encode('utf-8')
+
+            hashed = fingerprint(path, data)
+            target = os.path.join(dist_dir, hashed)
+            _write(target, data)
+
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                # mtime=0 使相同内容的 .gz 文件逐字节相同
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    _write(target + '.gz', compressed)
+                if brotli is not None:
+                    compressed = brotli.compress(data, quality=11)
+                    if len(compressed) < len(data):
+                        _write(target + '.br', compressed)
+
+            manifest[path] = hashed
+
+    _write(os.path.join(dist_dir, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class Assets:
+    """模板中通过 asset_url('css/site.css') 引用静态资源
+
+    执行过 flask assets build 时返回带内容哈希的 /assets/ 地址，按浏览器支持的编码
+    返回预先压缩的 .br 或 .gz 文件，并允许浏览器永久缓存；否则退回普通的 /static/ 地址。
+    """
+
+    def __init__(self, app=None):
+        self.dist_dir = None
+        self.manifest = {}
+        self._files = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.dist_dir = app.config.get('ASSETS_DIST_DIR') or os.path.join(app.static_folder, 'dist')
+        self.load_manifest()
+        app.add_template_global(self.url, 'asset_url')
+        app.add_url_rule(f'{ASSETS_URL_PREFIX}/<path:filename>', 'assets', self.serve)
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.dist_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        # 只提供清单中登记过的文件
+        self._files = set(self.manifest.values())
+
+    def url(self, path):
+        hashed = self.manifest.get(path)
+        if hashed is None:
+            return url_for('static', filename=path)
+        return url_for('assets', filename=hashed)
+
+    def serve(self, filename):
+        if filename not in self._files:
+            abort(404)
+
+        path = os.path.join(self.dist_dir, filename)
+        encoding = None
+        accepted = request.accept_encodings
+        for candidate, ext in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.exists(path + ext):
+                path, encoding = path + ext, candidate
+                break
+
+        response = send_file(
+            path,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            max_age=ASSET_MAX_AGE,
+            conditional=True
+        )
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
+
+assets_cli = AppGroup('assets', help='静态资源命令')
+
+
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='先删除之前构建的全部文件')
+def build_command(clean):
+    """压缩静态文件，生成带内容哈希的文件名和 .gz/.br 预压缩文件"""
+    manifest = build_assets(current_app.static_folder, assets.dist_dir, clean=clean)
+    click.echo(f"已构建 {len(manifest)} 个文件到 {assets.dist_dir}")
+    if brotli is None:
+        click.echo("未安装 brotli，只生成 .gz 文件")
+    if rcssmin is None or rjsmin is None:
+        click.echo("未安装 rcssmin/rjsmin，CSS 和 JS 只做简单压缩")
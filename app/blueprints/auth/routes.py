@@ -1,10 +1,45 @@
-from flask import render_template, request, jsonify, redirect, url_for, flash, make_response, session
-from app import mongo, bcrypt
+from flask import render_template, request, jsonify, redirect, url_for, flash, make_response, session, current_app
+from app import mongo
+from app.passwords import password_hasher, PasswordHasherBusy
+from app.user_cache import user_cache
+from app.media import extract_inline_images
+from app.derive import derive_article_fields, ensure_derived
+from app.drafts import DraftConflict, DraftPatchError, ensure_previews, patch_draft, save_draft
+from app.codec import content_codec
+from app.thumbnails import existing_thumb, schedule_thumbnails
+from app.jobs import job_queue
+from app.read_routing import read_db, read_routing
+from app.pagination import KeysetStream, keyset_page
+from app.stats import get_author_stats, increment_author_stats
+from app.facets import navigation_facets, update_facets
+from app.view_counter import view_counter
+from app import search
+from app import recommend
+from app.page_cache import page_cache, LIST_TAG, article_tag, author_tag, category_tag
+from app.streaming import render_stream
+from app.validation import ValidationError, validate_article, validate_comment, validate_registration
+from app import engagement
 from . import auth_bp
 from bson.objectid import ObjectId
-import traceback
+from pymongo.errors import DuplicateKeyError
+import logging
 import datetime
-from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# 列表页只读取模板用到的字段，不读取文章正文
+ARTICLE_LIST_FIELDS = {
+    "title": 1,
+    "category": 1,
+    "excerpt": 1,
+    "cover_image": 1,
+    "author_name": 1,
+    "created_at": 1,
+    "cover_thumb": 1,
+    "derived_version": 1
+}
+USER_ARTICLE_LIST_FIELDS = dict(ARTICLE_LIST_FIELDS, views=1, likes=1)
+DRAFT_LIST_FIELDS = {"title": 1, "category": 1, "preview": 1, "updated_at": 1}
 
 # 登录页面
 @auth_bp.route('/login', methods=['GET'])
@@ -29,7 +64,7 @@ def home_page():
         current_user_id = session['user_id']
         
         # 查找用户信息
-        user = mongo.db.users.find_one({"_id": ObjectId(current_user_id)})
+        user = user_cache.get(current_user_id)
         
         if not user:
             # 如果用户不存在，重定向到登录页面
@@ -38,8 +73,7 @@ def home_page():
         return render_template('home.html', user=user)
     except Exception as e:
         # 记录错误
-        print(f"访问主页时发生错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("访问主页时发生错误")
         # 重定向到登录页面
         return redirect(url_for('auth.login_page'))
 
@@ -53,18 +87,20 @@ def register():
     confirm_password = request.form.get('confirm_password')
     
     # 表单验证
-    if not username or not email or not password or not confirm_password:
-        return jsonify({"success": False, "message": "所有字段都是必填的"}), 400
-    
-    if password != confirm_password:
-        return jsonify({"success": False, "message": "两次输入的密码不一致"}), 400
+    try:
+        validate_registration(username, email, password, confirm_password)
+    except ValidationError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     
     # 检查用户名或邮箱是否已存在
     if mongo.db.users.find_one({"$or": [{"username": username}, {"email": email}]}):
         return jsonify({"success": False, "message": "用户名或邮箱已被使用"}), 400
     
-    # 哈希密码
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    # 哈希密码，在独立进程池中计算
+    try:
+        hashed_password = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return jsonify({"success": False, "message": "服务器繁忙，请稍后重试"}), 503
     
     # 创建用户记录
     user = {
@@ -73,8 +109,11 @@ def register():
         "password": hashed_password
     }
     
-    # 将用户添加到数据库
-    result = mongo.db.users.insert_one(user)
+    # 将用户添加到数据库，唯一索引防止并发注册出现重复账户
+    try:
+        result = mongo.db.users.insert_one(user)
+    except DuplicateKeyError:
+        return jsonify({"success": False, "message": "用户名或邮箱已被使用"}), 400
     
     return jsonify({"success": True, "message": "注册成功"}), 201
 
@@ -93,7 +132,23 @@ def login():
     user = mongo.db.users.find_one({"username": username})
     
     # 验证用户和密码
-    if user and bcrypt.check_password_hash(user['password'], password):
+    try:
+        password_ok = bool(user) and password_hasher.check(user['password'], password)
+    except PasswordHasherBusy:
+        return jsonify({"success": False, "message": "服务器繁忙，请稍后重试"}), 503
+    
+    if password_ok:
+        # 工作因子已调高时，用新的工作因子重新哈希
+        if password_hasher.needs_rehash(user['password']):
+            try:
+                mongo.db.users.update_one(
+                    {"_id": user['_id'], "password": user['password']},
+                    {"$set": {"password": password_hasher.hash(password)}}
+                )
+                user_cache.invalidate(user['_id'])
+            except PasswordHasherBusy:
+                pass
+        
         # 保存用户ID到session
         session['user_id'] = str(user['_id'])
         session['username'] = user['username']
@@ -120,7 +175,7 @@ def profile():
     current_user_id = session['user_id']
     
     # 查找用户信息
-    user = mongo.db.users.find_one({"_id": ObjectId(current_user_id)})
+    user = user_cache.get(current_user_id)
     
     if not user:
         return jsonify({"success": False, "message": "用户不存在"}), 404
@@ -155,9 +210,15 @@ def publish_article_page():
         if draft:
             # 转换ID为字符串，方便在模板中使用
             draft['_id'] = str(draft['_id'])
+            draft['content'] = content_codec.decode(draft.get('content'))
     
     return render_template('publish_article.html', draft=draft)
 
+# 文章写入或删除后同步搜索索引和相关文章，JOB_QUEUE_MODE 为 queue 时由后台工作进程执行
+def schedule_article_sync(article_id):
+    for name in ('search.sync', 'recommend.sync'):
+        job_queue.enqueue(name, {"article_id": str(article_id)}, key=f'{name}:{article_id}')
+
 # 发布文章API
 @auth_bp.route('/api/article/publish', methods=['POST'])
 def publish_article():
@@ -166,13 +227,10 @@ def publish_article():
         return jsonify({"success": False, "message": "请先登录"}), 401
     
     try:
-        print("收到文章发布请求")
         data = request.json
         
         if not data:
             return jsonify({"success": False, "message": "未接收到数据"}), 400
-            
-        print(f"接收到的数据: {data}")
         
         title = data.get('title')
         content = data.get('content')
@@ -180,16 +238,18 @@ def publish_article():
         tags = data.get('tags', [])
         
         # 验证数据
-        if not title or not content or not category:
-            return jsonify({"success": False, "message": "文章标题、内容和分类为必填项"}), 400
+        try:
+            validate_article(title, content, category, tags)
+        except ValidationError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
         
-        if len(title) < 5 or len(title) > 100:
-            return jsonify({"success": False, "message": "标题长度应在5-100字之间"}), 400
+        # 将内嵌图片转存到图片存储
+        content = extract_inline_images(content)
         
-        # 创建文章记录
+        # 创建文章记录，正文按存储编码压缩
         article = {
             "title": title,
-            "content": content,
+            "content": content_codec.encode(content),
             "category": category,
             "tags": tags,
             "author_id": session['user_id'],
@@ -198,13 +258,32 @@ def publish_article():
             "updated_at": datetime.datetime.now(),
             "views": 0,
             "likes": 0,
-            "comments": []
+            "comment_count": 0
         }
         
+        # 写入时计算摘要、封面图、标题大纲和字数
+        article.update(derive_article_fields(content))
+        
+        # 封面图已有缩略图时直接使用，否则发布后在后台生成
+        article['cover_thumb'] = existing_thumb(article['cover_image'])
+        
         # 将文章添加到数据库
         result = mongo.db.articles.insert_one(article)
         article_id = str(result.inserted_id)
         
+        # 更新作者统计和分类、标签计数
+        increment_author_stats(session['user_id'], articles=1)
+        update_facets(new=article)
+        
+        # 更新搜索索引和相关文章
+        schedule_article_sync(article_id)
+        
+        if article['cover_thumb'] is None:
+            schedule_thumbnails(article_id, article['cover_image'])
+        
+        # 使相关页面缓存失效
+        page_cache.invalidate(author_id=session['user_id'], categories=[category])
+        
         return jsonify({
             "success": True, 
             "message": "文章发布成功", 
@@ -213,11 +292,10 @@ def publish_article():
         }), 201
         
     except Exception as e:
-        print(f"发布文章错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("发布文章错误")
         return jsonify({"success": False, "message": f"发布文章时发生错误: {str(e)}"}), 500
 
-# 保存草稿API
+# 保存草稿API，提交完整内容；已有草稿的自动保存使用增量接口
 @auth_bp.route('/api/article/draft', methods=['POST'])
 def save_article_draft():
     # 检查用户是否已登录
@@ -226,85 +304,72 @@ def save_article_draft():
     
     try:
         data = request.json
-        title = data.get('title')
-        content = data.get('content')
-        category = data.get('category')
-        tags = data.get('tags', [])
-        draft_id = data.get('draft_id')
-        
-        # 如果提供了draft_id且有效，直接更新该草稿
-        if draft_id and ObjectId.is_valid(draft_id):
-            draft = mongo.db.drafts.find_one({
-                "_id": ObjectId(draft_id),
-                "author_id": session['user_id']
-            })
-            
-            if draft:
-                mongo.db.drafts.update_one(
-                    {"_id": ObjectId(draft_id)},
-                    {"$set": {
-                        "title": title,
-                        "content": content,
-                        "category": category,
-                        "tags": tags,
-                        "updated_at": datetime.datetime.now()
-                    }}
-                )
-                return jsonify({
-                    "success": True, 
-                    "message": "草稿已更新",
-                    "redirect_url": url_for('auth.user_center')
-                }), 200
-        
-        # 创建草稿记录
-        draft = {
-            "title": title,
-            "content": content,
-            "category": category,
-            "tags": tags,
-            "author_id": session['user_id'],
-            "created_at": datetime.datetime.now(),
-            "updated_at": datetime.datetime.now(),
-            "is_draft": True
+        if not data:
+            return jsonify({"success": False, "message": "未接收到数据"}), 400
+        
+        # 将内嵌图片转存到图片存储，替换后的地址返回给编辑器
+        images = []
+        fields = {
+            "title": data.get('title'),
+            "content": extract_inline_images(data.get('content'), images),
+            "category": data.get('category'),
+            "tags": data.get('tags', [])
         }
         
-        # 检查用户是否已有该草稿
-        existing_draft = mongo.db.drafts.find_one({
-            "author_id": session['user_id'],
-            "title": title,
-            "is_draft": True
-        })
+        # 提供了 draft_id 时更新该草稿，否则按标题更新已有草稿或新建
+        draft_id, revision, created = save_draft(session['user_id'], fields, data.get('draft_id'))
         
-        if existing_draft:
-            # 更新现有草稿
-            mongo.db.drafts.update_one(
-                {"_id": existing_draft['_id']},
-                {"$set": {
-                    "content": content,
-                    "category": category,
-                    "tags": tags,
-                    "updated_at": datetime.datetime.now()
-                }}
-            )
-            return jsonify({
-                "success": True, 
-                "message": "草稿已更新",
-                "redirect_url": url_for('auth.user_center')
-            }), 200
-        else:
-            # 创建新草稿
-            result = mongo.db.drafts.insert_one(draft)
-            return jsonify({
-                "success": True, 
-                "message": "草稿已保存",
-                "redirect_url": url_for('auth.user_center')
-            }), 201
+        return jsonify({
+            "success": True, 
+            "message": "草稿已保存" if created else "草稿已更新",
+            "draft_id": str(draft_id),
+            "revision": revision,
+            "images": images,
+            "redirect_url": url_for('auth.user_center')
+        }), 201 if created else 200
             
     except Exception as e:
-        print(f"保存草稿错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("保存草稿错误")
         return jsonify({"success": False, "message": "保存草稿时发生错误"}), 500
 
+# 草稿增量保存API：在 base_revision 上应用补丁，修订号不一致时返回409
+@auth_bp.route('/api/draft/<draft_id>/patch', methods=['POST'])
+def patch_article_draft(draft_id):
+    # 检查用户是否已登录
+    if 'user_id' not in session:
+        return jsonify({"success": False, "message": "请先登录"}), 401
+    
+    if not ObjectId.is_valid(draft_id):
+        return jsonify({"success": False, "message": "无效的草稿ID"}), 400
+    
+    data = request.json
+    if not data or not isinstance(data.get('base_revision'), int):
+        return jsonify({"success": False, "message": "缺少基准修订号"}), 400
+    
+    # 标题、分类和标签很小，每次随补丁一起提交
+    fields = {key: data[key] for key in ('title', 'category', 'tags') if key in data}
+    
+    try:
+        result = patch_draft(draft_id, session['user_id'], data['base_revision'], data.get('patches'), fields)
+    except DraftConflict as e:
+        return jsonify({
+            "success": False,
+            "conflict": True,
+            "revision": e.revision,
+            "message": "草稿已在其他窗口修改"
+        }), 409
+    except DraftPatchError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.exception("增量保存草稿错误")
+        return jsonify({"success": False, "message": "保存草稿时发生错误"}), 500
+    
+    if result is None:
+        return jsonify({"success": False, "message": "草稿不存在或无权限修改"}), 404
+    
+    revision, images = result
+    return jsonify({"success": True, "message": "草稿已更新", "revision": revision, "images": images}), 200
+
 # 删除草稿API
 @auth_bp.route('/api/draft/delete/<draft_id>', methods=['POST'])
 def delete_draft(draft_id):
@@ -338,66 +403,55 @@ def delete_draft(draft_id):
         }), 200
         
     except Exception as e:
-        print(f"删除草稿错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("删除草稿错误")
         return jsonify({"success": False, "message": f"删除草稿时发生错误: {str(e)}"}), 500
 
 # 文章详情页面
 @auth_bp.route('/article/<article_id>', methods=['GET'])
 def article_detail(article_id):
     try:
-        print(f"\n\n============ 开始处理文章详情请求 ============")
-        print(f"接收到文章详情请求，article_id: {article_id}, 类型: {type(article_id)}")
-        
         # 检查article_id是否为有效的ObjectId格式
         if not ObjectId.is_valid(article_id):
-            print(f"无效的文章ID格式: {article_id}")
-            print(f"============ 结束处理文章详情请求 ============\n\n")
+            logger.info("无效的文章ID格式", extra={"fields": {"article_id": article_id}})
             return redirect(url_for('auth.articles'))
         
-        print(f"文章ID有效，尝试查询文章数据")
-        # 查找文章
-        article = mongo.db.articles.find_one({"_id": ObjectId(article_id)})
+        # 命中页面缓存时只记录浏览量
+        cached = page_cache.lookup()
+        if cached:
+            view_counter.record(article_id, cached['meta'].get('author_id'))
+            return page_cache.respond(cached)
+        
+        # 查找文章，开启读路由时可能读自从节点
+        article = read_db().articles.find_one({"_id": ObjectId(article_id)})
+        
+        # 从节点可能还没有复制刚发布的文章，从主节点再读一次
+        if not article and read_routing.may_lag():
+            article = mongo.db.articles.find_one({"_id": ObjectId(article_id)})
         
         if not article:
-            print(f"未找到ID为{article_id}的文章")
-            print(f"============ 结束处理文章详情请求 ============\n\n")
+            logger.info("文章不存在", extra={"fields": {"article_id": article_id}})
             return redirect(url_for('auth.articles'))
         
-        print(f"成功找到文章: {article['title']}")
         # 增加浏览量
-        mongo.db.articles.update_one(
-            {"_id": ObjectId(article_id)},
-            {"$inc": {"views": 1}}
-        )
+        view_counter.record(article_id, article.get('author_id'))
+        
+        # 旧文章尚无派生字段时补算
+        ensure_derived([article])
+        
+        # 相关文章已预先计算，按文章ID读取一次
+        related_articles = recommend.related_articles(article)
         
         # 确保关联文章的ID是字符串
         article['_id'] = str(article['_id'])
         
-        # 从文章内容中提取标题
-        headings = []
-        if article.get('content'):
-            try:
-                soup = BeautifulSoup(article['content'], 'html.parser')
-                for i, heading in enumerate(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])):
-                    level = int(heading.name[1])
-                    headings.append({
-                        'level': level,
-                        'text': heading.text.strip(),
-                        'id': f'heading-{i+1}'
-                    })
-            except Exception as e:
-                print(f"解析标题时发生错误: {str(e)}")
-        
-        # 查找相关文章
-        related_articles = list(mongo.db.articles.find({
-            "category": article['category'],
-            "_id": {"$ne": ObjectId(article_id)}
-        }).sort("created_at", -1).limit(3))
-        
-        # 处理相关文章中的ID
-        for related in related_articles:
-            related['_id'] = str(related['_id'])
+        # 标题大纲在写入时已经计算
+        headings = article.get('headings', [])
+        
+        # 只在渲染正文时解压
+        article['content'] = content_codec.decode(article.get('content'))
+        
+        # 封面图取自正文第一张图片，详情页正文中已经包含，不再重复显示
+        article.pop('cover_image', None)
         
         # 查找作者信息
         author = None
@@ -405,16 +459,14 @@ def article_detail(article_id):
         total_views = 0
         
         if article.get('author_id'):
-            author = mongo.db.users.find_one({"_id": ObjectId(article['author_id'])})
-            
-            # 获取作者文章数
-            article_count = mongo.db.articles.count_documents({"author_id": article['author_id']})
+            author = user_cache.get(article['author_id'])
             
-            # 获取作者所有文章的总浏览量
-            author_articles = mongo.db.articles.find({"author_id": article['author_id']})
-            total_views = sum(doc.get('views', 0) for doc in author_articles)
+            # 作者文章数和总浏览量来自统计文档
+            author_stats = get_author_stats(article['author_id'])
+            article_count = author_stats['article_count']
+            total_views = author_stats['total_views']
         
-        return render_template('article_detail.html', 
+        body = render_template('article_detail.html', 
                               article=article, 
                               related_articles=related_articles, 
                               author=author, 
@@ -422,44 +474,316 @@ def article_detail(article_id):
                               article_count=article_count,
                               total_views=total_views)
         
+        # 从节点读到的可能是更新前的文章，与主节点的版本一致时才缓存，
+        # 否则刚失效的缓存会被旧页面重新填上
+        cache = not read_routing.may_lag() or mongo.db.articles.count_documents(
+            {"_id": ObjectId(article_id), "updated_at": article.get('updated_at')}, limit=1
+        ) > 0
+        
+        # 作者信息来自作者统计；相关文章列表在其他文章变化后随缓存到期更新
+        return page_cache.store(
+            body,
+            tags=[
+                article_tag(article_id),
+                author_tag(article.get('author_id')),
+                category_tag(article.get('category'))
+            ],
+            meta={"author_id": article.get('author_id')},
+            cache=cache
+        )
+        
     except Exception as e:
-        print(f"加载文章详情错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("加载文章详情错误")
         return redirect(url_for('auth.home_page'))
 
-# 所有文章列表页面
+# 文章实时计数API，详情页可能来自缓存，浏览量通过该接口获取
+@auth_bp.route('/api/article/<article_id>/stats', methods=['GET'])
+def article_stats(article_id):
+    if not ObjectId.is_valid(article_id):
+        return jsonify({"success": False, "message": "无效的文章ID"}), 400
+    
+    article = mongo.db.articles.find_one(
+        {"_id": ObjectId(article_id)},
+        {"views": 1, "likes": 1, "comment_count": 1, "author_id": 1}
+    )
+    if not article:
+        return jsonify({"success": False, "message": "文章不存在"}), 404
+    
+    stats = {
+        "views": article.get('views', 0),
+        "likes": article.get('likes', 0),
+        "comment_count": article.get('comment_count', 0)
+    }
+    if article.get('author_id'):
+        stats['author_total_views'] = get_author_stats(article['author_id'])['total_views']
+    if 'user_id' in session:
+        stats['liked'] = engagement.has_liked(article_id, session['user_id'])
+    
+    return jsonify({"success": True, "stats": stats}), 200
+
+# 点赞或取消点赞API，提交 liked 为 true 或 false，重复提交结果相同
+@auth_bp.route('/api/article/<article_id>/like', methods=['POST'])
+def like_article(article_id):
+    if 'user_id' not in session:
+        return jsonify({"success": False, "message": "请先登录"}), 401
+    if not ObjectId.is_valid(article_id):
+        return jsonify({"success": False, "message": "无效的文章ID"}), 400
+    
+    try:
+        data = request.json or {}
+        article = mongo.db.articles.find_one({"_id": ObjectId(article_id)}, {"author_id": 1})
+        if not article:
+            return jsonify({"success": False, "message": "文章不存在"}), 404
+        
+        liked = bool(data.get('liked', True))
+        engagement.set_like(article, session['user_id'], liked)
+        
+        # 点赞数只在实时计数接口和个人中心显示，不需要使页面缓存失效
+        article = mongo.db.articles.find_one({"_id": article['_id']}, {"likes": 1})
+        if not article:
+            return jsonify({"success": False, "message": "文章不存在"}), 404
+        return jsonify({"success": True, "liked": liked, "likes": article.get('likes', 0)}), 200
+    
+    except Exception as e:
+        logger.exception("点赞错误")
+        return jsonify({"success": False, "message": "点赞时发生错误"}), 500
+
+# 评论列表API，按时间倒序分页
+@auth_bp.route('/api/article/<article_id>/comments', methods=['GET'])
+def article_comments(article_id):
+    if not ObjectId.is_valid(article_id):
+        return jsonify({"success": False, "message": "无效的文章ID"}), 400
+    
+    try:
+        comments, next_cursor = engagement.list_comments(article_id, after=request.args.get('after'))
+        return jsonify({
+            "success": True,
+            "comments": [engagement.comment_json(comment) for comment in comments],
+            "next_cursor": next_cursor
+        }), 200
+    
+    except Exception as e:
+        logger.exception("加载评论错误")
+        return jsonify({"success": False, "message": "加载评论时发生错误"}), 500
+
+# 发表评论API
+@auth_bp.route('/api/article/<article_id>/comments', methods=['POST'])
+def post_comment(article_id):
+    if 'user_id' not in session:
+        return jsonify({"success": False, "message": "请先登录"}), 401
+    if not ObjectId.is_valid(article_id):
+        return jsonify({"success": False, "message": "无效的文章ID"}), 400
+    
+    try:
+        data = request.json or {}
+        content = data.get('content')
+        try:
+            validate_comment(content)
+        except ValidationError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        
+        if not mongo.db.articles.count_documents({"_id": ObjectId(article_id)}, limit=1):
+            return jsonify({"success": False, "message": "文章不存在"}), 404
+        
+        comment = engagement.add_comment(article_id, session['user_id'], session['username'], content.strip())
+        if comment is None:
+            return jsonify({"success": False, "message": "文章不存在"}), 404
+        return jsonify({"success": True, "comment": engagement.comment_json(comment)}), 201
+    
+    except Exception as e:
+        logger.exception("发表评论错误")
+        return jsonify({"success": False, "message": "发表评论时发生错误"}), 500
+
+# 删除自己的评论API
+@auth_bp.route('/api/comment/delete/<comment_id>', methods=['POST'])
+def delete_comment(comment_id):
+    if 'user_id' not in session:
+        return jsonify({"success": False, "message": "请先登录"}), 401
+    if not ObjectId.is_valid(comment_id):
+        return jsonify({"success": False, "message": "无效的评论ID"}), 400
+    
+    try:
+        if not engagement.delete_comment(comment_id, session['user_id']):
+            return jsonify({"success": False, "message": "评论不存在或无权限删除"}), 404
+        return jsonify({"success": True, "message": "评论已删除"}), 200
+    
+    except Exception as e:
+        logger.exception("删除评论错误")
+        return jsonify({"success": False, "message": "删除评论时发生错误"}), 500
+
+# 列表页中每篇文章渲染前的处理
+def prepare_list_article(article):
+    # 封面图和摘要在写入时已经计算，旧文章补算一次
+    ensure_derived([article])
+    # 确保_id是字符串，以便在模板中使用
+    article['_id'] = str(article['_id'])
+    return article
+
+# 列表页和列表API的筛选条件：分类、标签、作者
+def article_list_filters():
+    filters = {}
+    for name in ('category', 'tag', 'author'):
+        value = request.args.get(name, '').strip()
+        if value:
+            filters[name] = value
+    return filters
+
+def article_list_query(filters):
+    query = {}
+    if 'category' in filters:
+        query['category'] = filters['category']
+    if 'tag' in filters:
+        query['tags'] = filters['tag']
+    if 'author' in filters:
+        query['author_id'] = filters['author']
+    return query
+
+# 所有文章列表页面，可按分类和标签筛选
 @auth_bp.route('/articles', methods=['GET'])
 def articles():
     try:
-        # 获取所有文章，按创建时间倒序排列
-        articles = list(mongo.db.articles.find().sort("created_at", -1))
+        cached = page_cache.lookup()
+        if cached:
+            return page_cache.respond(cached)
+        
+        filters = article_list_filters()
+        query = article_list_query(filters)
+        
+        # 侧边栏的分类和标签计数已预先统计，一次小查询读取
+        context = {"filters": filters, "facets": navigation_facets()}
+        
+        # 流式渲染：页面头部先发出，文章边从游标读取边渲染
+        if current_app.config['STREAM_LIST_PAGES']:
+            page = KeysetStream(
+                read_db().articles,
+                query,
+                ARTICLE_LIST_FIELDS,
+                after=request.args.get('after'),
+                limit=current_app.config['ARTICLES_PAGE_SIZE'],
+                prepare=prepare_list_article
+            )
+            return page_cache.stream(render_stream('article_list.html', articles=page, **context), tags=[LIST_TAG])
+        
+        # 按创建时间倒序分页读取文章
+        articles, next_cursor = keyset_page(
+            read_db().articles,
+            query,
+            ARTICLE_LIST_FIELDS,
+            after=request.args.get('after'),
+            limit=current_app.config['ARTICLES_PAGE_SIZE']
+        )
         
-        # 添加可读的日期格式
         for article in articles:
-            # 确保_id是字符串，以便在模板中使用
-            article['_id'] = str(article['_id'])
-            
-            # 如果没有封面图片，尝试从内容中提取第一张图片
-            if not article.get('cover_image') and article.get('content'):
-                soup = BeautifulSoup(article['content'], 'html.parser')
-                first_img = soup.find('img')
-                if first_img and first_img.get('src'):
-                    article['cover_image'] = first_img['src']
-            
-            # 如果没有文章摘要，可以从内容生成
-            if 'excerpt' not in article:
-                # 从内容移除HTML标签并截取前150个字符作为摘要
-                if article.get('content'):
-                    soup = BeautifulSoup(article['content'], 'html.parser')
-                    article['excerpt'] = soup.get_text()[:150] + '...'
+            prepare_list_article(article)
         
-        return render_template('article_list.html', articles=articles)
+        body = render_template('article_list.html', articles=articles, next_cursor=next_cursor, **context)
+        return page_cache.store(body, tags=[LIST_TAG])
     
     except Exception as e:
-        print(f"加载文章列表错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("加载文章列表错误")
         return redirect(url_for('auth.home_page'))
 
+# 列表API中的文章卡片数据
+def article_card_json(article):
+    article_id = str(article['_id'])
+    return {
+        "id": article_id,
+        "title": article.get('title'),
+        "category": article.get('category'),
+        "excerpt": article.get('excerpt'),
+        "cover_image": article.get('cover_image'),
+        "cover_thumb": article.get('cover_thumb'),
+        "author_name": article.get('author_name'),
+        "created_at": article['created_at'].strftime('%Y-%m-%d') if article.get('created_at') else None,
+        "url": url_for('auth.article_detail', article_id=article_id)
+    }
+
+# 文章列表API，供列表页无限滚动使用
+@auth_bp.route('/api/articles', methods=['GET'])
+def articles_feed():
+    query = article_list_query(article_list_filters())
+    
+    try:
+        articles, next_cursor = keyset_page(
+            read_db().articles,
+            query,
+            ARTICLE_LIST_FIELDS,
+            after=request.args.get('after'),
+            limit=current_app.config['ARTICLES_PAGE_SIZE']
+        )
+        ensure_derived(articles)
+        
+        items = [article_card_json(article) for article in articles]
+        
+        return jsonify({"success": True, "articles": items, "next_cursor": next_cursor}), 200
+    
+    except Exception as e:
+        logger.exception("加载文章列表API错误")
+        return jsonify({"success": False, "message": "加载文章列表时发生错误"}), 500
+
+# 按搜索结果的顺序读取文章
+def load_search_results(query, page):
+    page_size = current_app.config['ARTICLES_PAGE_SIZE']
+    article_ids, total = search.search_articles(query, limit=page_size, offset=(page - 1) * page_size)
+    
+    docs = {doc['_id']: doc for doc in read_db().articles.find(
+        {"_id": {"$in": article_ids}}, ARTICLE_LIST_FIELDS
+    )}
+    articles = [docs[article_id] for article_id in article_ids if article_id in docs]
+    ensure_derived(articles)
+    
+    has_more = page * page_size < total
+    return articles, has_more
+
+# 搜索结果页面
+@auth_bp.route('/search', methods=['GET'])
+def search_page():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    try:
+        articles, has_more = load_search_results(query, page)
+        for article in articles:
+            article['_id'] = str(article['_id'])
+        
+        return render_template('article_list.html',
+                              articles=articles,
+                              query=query,
+                              next_page=page + 1 if has_more else None)
+    
+    except Exception as e:
+        logger.exception("搜索文章错误")
+        return redirect(url_for('auth.articles'))
+
+# 搜索API
+@auth_bp.route('/api/search', methods=['GET'])
+def search_api():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    try:
+        articles, has_more = load_search_results(query, page)
+        
+        items = [article_card_json(article) for article in articles]
+        
+        return jsonify({
+            "success": True,
+            "articles": items,
+            "next_page": page + 1 if has_more else None
+        }), 200
+    
+    except Exception as e:
+        logger.exception("搜索API错误")
+        return jsonify({"success": False, "message": "搜索时发生错误"}), 500
+
+# 个人中心中每篇文章渲染前的处理
+def prepare_user_article(article):
+    prepare_list_article(article)
+    # 格式化时间
+    if article.get('created_at'):
+        article['created_at_formatted'] = article['created_at'].strftime('%Y-%m-%d %H:%M')
+    return article
+
 # 个人中心页面
 @auth_bp.route('/user-center', methods=['GET'])
 def user_center():
@@ -471,39 +795,42 @@ def user_center():
         current_user_id = session['user_id']
         
         # 获取用户信息
-        user = mongo.db.users.find_one({"_id": ObjectId(current_user_id)})
+        user = user_cache.get(current_user_id)
         if not user:
             return redirect(url_for('auth.login_page'))
         
-        # 获取用户的文章列表
-        user_articles = list(mongo.db.articles.find(
-            {"author_id": current_user_id}
-        ).sort("created_at", -1))
-        
-        # 处理文章数据
-        for article in user_articles:
-            article['_id'] = str(article['_id'])
-            
-            # 如果没有封面图片，尝试从内容中提取第一张图片
-            if not article.get('cover_image') and article.get('content'):
-                soup = BeautifulSoup(article['content'], 'html.parser')
-                first_img = soup.find('img')
-                if first_img and first_img.get('src'):
-                    article['cover_image'] = first_img['src']
-            
-            # 生成摘要
-            if 'excerpt' not in article and article.get('content'):
-                soup = BeautifulSoup(article['content'], 'html.parser')
-                article['excerpt'] = soup.get_text()[:150] + '...'
-            
-            # 格式化时间
-            if article.get('created_at'):
-                article['created_at_formatted'] = article['created_at'].strftime('%Y-%m-%d %H:%M')
+        # 作者刚写入过时，read_db() 返回因果一致的会话，保证读到自己的修改
+        db = read_db()
+        
+        # 分页获取用户的文章列表，流式渲染时边读取边渲染
+        stream = current_app.config['STREAM_LIST_PAGES']
+        next_cursor = None
+        if stream:
+            user_articles = KeysetStream(
+                db.articles,
+                {"author_id": current_user_id},
+                USER_ARTICLE_LIST_FIELDS,
+                after=request.args.get('after'),
+                limit=current_app.config['ARTICLES_PAGE_SIZE'],
+                prepare=prepare_user_article
+            )
+        else:
+            user_articles, next_cursor = keyset_page(
+                db.articles,
+                {"author_id": current_user_id},
+                USER_ARTICLE_LIST_FIELDS,
+                after=request.args.get('after'),
+                limit=current_app.config['ARTICLES_PAGE_SIZE']
+            )
+            for article in user_articles:
+                prepare_user_article(article)
         
-        # 获取用户的草稿列表
-        user_drafts = list(mongo.db.drafts.find(
-            {"author_id": current_user_id, "is_draft": True}
+        # 获取用户的草稿列表，只读取列表显示的字段，不读取正文
+        user_drafts = list(db.drafts.find(
+            {"author_id": current_user_id, "is_draft": True},
+            DRAFT_LIST_FIELDS
         ).sort("updated_at", -1))
+        ensure_previews(user_drafts)
         
         # 处理草稿数据
         for draft in user_drafts:
@@ -513,29 +840,26 @@ def user_center():
             if draft.get('updated_at'):
                 draft['updated_at_formatted'] = draft['updated_at'].strftime('%Y-%m-%d %H:%M')
         
-        # 计算统计数据
-        total_articles = len(user_articles)
-        total_views = sum(article.get('views', 0) for article in user_articles)
-        total_likes = sum(article.get('likes', 0) for article in user_articles)
+        # 统计数据
+        author_stats = get_author_stats(current_user_id)
         
         # 用户信息
         user_info = {
             "username": user['username'],
             "email": user['email'],
-            "total_articles": total_articles,
-            "total_views": total_views,
-            "total_likes": total_likes,
+            "total_articles": author_stats['article_count'],
+            "total_views": author_stats['total_views'],
+            "total_likes": author_stats['total_likes'],
             "join_date": user.get('created_at', datetime.datetime.now()).strftime('%Y-%m-%d')
         }
         
-        return render_template('user_center.html', 
-                              user=user_info,
-                              articles=user_articles,
-                              drafts=user_drafts)
+        context = dict(user=user_info, articles=user_articles, drafts=user_drafts, next_cursor=next_cursor)
+        if stream:
+            return current_app.response_class(render_stream('user_center.html', **context), mimetype='text/html')
+        return render_template('user_center.html', **context)
     
     except Exception as e:
-        print(f"加载个人中心页面错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("加载个人中心页面错误")
         return redirect(url_for('auth.home_page'))
 
 # 编辑文章页面
@@ -564,12 +888,12 @@ def edit_article_page(article_id):
         
         # 确保ID是字符串
         article['_id'] = str(article['_id'])
+        article['content'] = content_codec.decode(article.get('content'))
         
         return render_template('edit_article.html', article=article)
     
     except Exception as e:
-        print(f"加载编辑文章页面错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("加载编辑文章页面错误")
         return redirect(url_for('auth.user_center'))
 
 # 更新文章API
@@ -591,11 +915,11 @@ def update_article(article_id):
         if not ObjectId.is_valid(article_id):
             return jsonify({"success": False, "message": "无效的文章ID"}), 400
         
-        # 获取文章信息确保归属当前用户
+        # 获取文章信息确保归属当前用户，正文会被整体替换，不必读取
         article = mongo.db.articles.find_one({
             "_id": ObjectId(article_id),
             "author_id": current_user_id
-        })
+        }, {"content": 0})
         
         if not article:
             return jsonify({"success": False, "message": "文章不存在或无权限修改"}), 404
@@ -607,22 +931,45 @@ def update_article(article_id):
         tags = data.get('tags', [])
         
         # 验证必填字段
-        if not title or not content or not category:
-            return jsonify({"success": False, "message": "文章标题、内容和分类为必填项"}), 400
+        try:
+            validate_article(title, content, category, tags)
+        except ValidationError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
         
-        if len(title) < 5 or len(title) > 100:
-            return jsonify({"success": False, "message": "标题长度应在5-100字之间"}), 400
+        # 将内嵌图片转存到图片存储
+        content = extract_inline_images(content)
+        
+        # 更新文章，同时重新计算派生字段
+        update_fields = {
+            "title": title,
+            "content": content_codec.encode(content),
+            "category": category,
+            "tags": tags,
+            "updated_at": datetime.datetime.now()
+        }
+        update_fields.update(derive_article_fields(content))
+        update_fields['cover_thumb'] = existing_thumb(update_fields['cover_image'])
         
-        # 更新文章
         mongo.db.articles.update_one(
             {"_id": ObjectId(article_id)},
-            {"$set": {
-                "title": title,
-                "content": content,
-                "category": category,
-                "tags": tags,
-                "updated_at": datetime.datetime.now()
-            }}
+            {"$set": update_fields}
+        )
+        
+        # 分类或标签变化时调整计数
+        update_facets(old=article, new=update_fields)
+        
+        # 更新搜索索引和相关文章
+        schedule_article_sync(article_id)
+        
+        # 新封面还没有缩略图时在后台生成
+        if update_fields['cover_thumb'] is None:
+            schedule_thumbnails(article_id, update_fields['cover_image'])
+        
+        # 使相关页面缓存失效，分类可能发生了变化
+        page_cache.invalidate(
+            article_id=article_id,
+            author_id=current_user_id,
+            categories=[article.get('category'), category]
         )
         
         return jsonify({
@@ -632,8 +979,7 @@ def update_article(article_id):
         }), 200
         
     except Exception as e:
-        print(f"更新文章错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("更新文章错误")
         return jsonify({"success": False, "message": f"更新文章时发生错误: {str(e)}"}), 500
 
 # 删除文章API
@@ -650,17 +996,36 @@ def delete_article(article_id):
         if not ObjectId.is_valid(article_id):
             return jsonify({"success": False, "message": "无效的文章ID"}), 400
         
-        # 获取文章信息确保归属当前用户
-        article = mongo.db.articles.find_one({
-            "_id": ObjectId(article_id),
-            "author_id": current_user_id
-        })
+        # 删除文章，条件中包含作者确保归属当前用户
+        article = mongo.db.articles.find_one_and_delete(
+            {"_id": ObjectId(article_id), "author_id": current_user_id},
+            projection={"views": 1, "likes": 1, "category": 1, "tags": 1}
+        )
         
         if not article:
             return jsonify({"success": False, "message": "文章不存在或无权限删除"}), 404
         
-        # 删除文章
-        mongo.db.articles.delete_one({"_id": ObjectId(article_id)})
+        # 从作者统计中扣除
+        increment_author_stats(
+            current_user_id,
+            articles=-1,
+            views=-article.get('views', 0),
+            likes=-article.get('likes', 0)
+        )
+        update_facets(old=article)
+        
+        # 从搜索索引和相关文章推荐中移除
+        schedule_article_sync(article_id)
+        
+        # 评论和点赞记录较多时删除较慢，在后台删除
+        job_queue.enqueue('engagement.purge', {"article_id": article_id}, key=f'engagement.purge:{article_id}')
+        
+        # 使相关页面缓存失效
+        page_cache.invalidate(
+            article_id=article_id,
+            author_id=current_user_id,
+            categories=[article.get('category')]
+        )
         
         return jsonify({
             "success": True,
@@ -669,6 +1034,5 @@ def delete_article(article_id):
         }), 200
         
     except Exception as e:
-        print(f"删除文章错误: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("删除文章错误")
         return jsonify({"success": False, "message": f"删除文章时发生错误: {str(e)}"}), 500 
\ No newline at end of file
@@ -0,0 +1,46 @@
+from flask import request, make_response, abort
+from app.media import media_fs, DIGEST_RE, IMAGE_TYPES
+from app.thumbnails import thumbnail_fs, THUMBNAIL_NAME_RE
+from . import media_bp
+
+# 内容寻址的文件永不变化，可以长期缓存
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+# 按文件名从 GridFS 读取不变的文件
+def immutable_file(fs, name):
+    # 浏览器已缓存同一内容，无需读取文件
+    if name in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        grid_out = fs.find_one({"_id": name})
+        if grid_out is None:
+            abort(404)
+        
+        response = make_response(grid_out.read())
+        # 只按位图类型提供，旧数据中的其他类型作为下载文件
+        content_type = grid_out.content_type
+        response.mimetype = content_type if content_type in IMAGE_TYPES else 'application/octet-stream'
+    
+    # 禁止浏览器猜测类型，即使直接打开也不执行文件中的脚本
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = 'sandbox'
+
+    response.set_etag(name)
+    response.cache_control.public = True
+    response.cache_control.max_age = MEDIA_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+# 获取图片
+@media_bp.route('/<digest>', methods=['GET'])
+def media_file(digest):
+    if not DIGEST_RE.match(digest):
+        abort(404)
+    return immutable_file(media_fs(), digest)
+
+# 获取封面缩略图
+@media_bp.route('/thumbs/<name>', methods=['GET'])
+def thumbnail_file(name):
+    if not THUMBNAIL_NAME_RE.match(name):
+        abort(404)
+    return immutable_file(thumbnail_fs(), name)
@@ -0,0 +1,133 @@
+import logging
+import zlib
+
+import click
+from bson.binary import Binary
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+
+from app import mongo
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 压缩后的正文以 BSON 二进制保存，第一个字节为格式版本
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+
+CODECS = ('zlib', 'zstd', 'none')
+
+# 保存正文的集合
+CONTENT_COLLECTIONS = ('articles', 'drafts')
+
+
+class ContentCodec:
+    """文章和草稿正文的存储编码
+
+    写入时按 CONTENT_CODEC 压缩为带版本字节的二进制，短于 CONTENT_COMPRESS_MIN_SIZE
+    字节或设为 none 时保持字符串；读取时两种形式都能解码，只在渲染正文的地方解码。
+
+    压缩后的正文无法在查询中用正则等条件匹配内容，按正文内容查找文档的命令
+    （如 media backfill）需要读出后解码再检查。
+    """
+
+    def __init__(self, app=None):
+        self.codec = 'zlib'
+        self.level = 6
+        self.min_size = 256
+        self._zstd_compressor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.codec = app.config.get('CONTENT_CODEC', 'zlib')
+        self.min_size = app.config.get('CONTENT_COMPRESS_MIN_SIZE', 256)
+        if self.codec not in CODECS:
+            raise ValueError(f'不支持的 CONTENT_CODEC: {self.codec}')
+        if self.codec == 'zstd' and zstandard is None:
+            logger.warning("未安装 zstandard，正文改用 zlib 压缩")
+            self.codec = 'zlib'
+        default_level = 3 if self.codec == 'zstd' else 6
+        self.level = app.config.get('CONTENT_COMPRESS_LEVEL') or default_level
+        if self.codec == 'zstd':
+            self._zstd_compressor = zstandard.ZstdCompressor(level=self.level)
+
+    def encode(self, content):
+        """把正文编码为存储形式"""
+        if not content or not isinstance(content, str) or self.codec == 'none':
+            return content
+        data = content.encode('utf-8')
+        if len(data) < self.min_size:
+            return content
+        if self.codec == 'zstd':
+            return Binary(bytes([FORMAT_ZSTD]) + self._zstd_compressor.compress(data))
+        return Binary(bytes([FORMAT_ZLIB]) + zlib.compress(data, self.level))
+
+    @staticmethod
+    def decode(value):
+        """把存储形式还原为正文，旧文档中的字符串原样返回"""
+        if value is None or isinstance(value, str):
+            return value
+        data = bytes(value)
+        version, payload = data[0], data[1:]
+        if version == FORMAT_ZLIB:
+            return zlib.decompress(payload).decode('utf-8')
+        if version == FORMAT_ZSTD:
+            if zstandard is None:
+                raise RuntimeError('读取 zstd 压缩的正文需要安装 zstandard')
+            return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+        raise ValueError(f'未知的正文格式版本: {version}')
+
+
+content_codec = ContentCodec()
+
+
+def _stored_size(value):
+    if value is None:
+        return 0
+    return len(value.encode('utf-8')) if isinstance(value, str) else len(value)
+
+
+def migrate_content(name, batch_size=200, decompress=False):
+    """把集合中的正文转换为当前编码（decompress 时还原为字符串），返回 (转换篇数, 转换前字节数, 转换后字节数)
+
+    只在正文未被修改时写入，迁移期间的编辑不会被覆盖。
+    """
+    # 压缩时只处理字符串，已压缩的文档保持原格式；解压时只处理二进制
+    query = {"content": {"$type": "binData" if decompress else "string"}}
+    converted = before = after = 0
+    requests = []
+    for doc in mongo.db[name].find(query, {"content": 1}).batch_size(batch_size):
+        stored = content_codec.decode(doc['content']) if decompress else content_codec.encode(doc['content'])
+        if stored is doc['content']:
+            continue
+        requests.append(UpdateOne({"_id": doc['_id'], "content": doc['content']}, {"$set": {"content": stored}}))
+        converted += 1
+        before += _stored_size(doc['content'])
+        after += _stored_size(stored)
+        if len(requests) >= batch_size:
+            mongo.db[name].bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        mongo.db[name].bulk_write(requests, ordered=False)
+    return converted, before, after
+
+
+content_cli = AppGroup('content', help='正文存储格式命令')
+
+
+@content_cli.command('migrate')
+@click.option('--batch-size', default=200, show_default=True, help='每批写入的文档数')
+@click.option('--decompress', is_flag=True, help='把压缩的正文还原为字符串（回退前执行）')
+def migrate_command(batch_size, decompress):
+    """把已有文章和草稿的正文转换为 CONTENT_CODEC 指定的压缩格式"""
+    if not decompress and content_codec.codec == 'none':
+        raise click.UsageError('CONTENT_CODEC 为 none，没有可转换的格式')
+    for name in CONTENT_COLLECTIONS:
+        converted, before, after = migrate_content(name, batch_size, decompress)
+        ratio = f'，压缩比 {before / after:.1f}' if after and not decompress else ''
+        click.echo(f"{name}: 已转换 {converted} 篇，{before} 字节 -> {after} 字节{ratio}")
@@ -0,0 +1,136 @@
+import gzip
+import zlib
+
+from flask import request
+
+from app.cache import TTLCache
+from app.tracing import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 值得压缩的响应类型，图片等已压缩的内容不再处理
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+}
+
+metrics.describe('http_responses_compressed_total', 'counter', '压缩后发送的响应数')
+metrics.describe('http_compressed_bytes_saved_total', 'counter', '压缩节省的响应字节数（不含流式响应）')
+
+
+def _gzip_stream(chunks, level):
+    # wbits=31 输出带 gzip 头的数据；每段之后同步刷新，浏览器可以立即解压显示
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class Compression:
+    """按请求的 Accept-Encoding 用 Brotli 或 gzip 压缩响应
+
+    普通响应小于 COMPRESS_MIN_SIZE 字节时不压缩；带 ETag 的响应（页面缓存命中）
+    按 ETag 缓存压缩结果，重复请求不再重新压缩。流式响应逐段压缩并立即发出。
+    已带 Content-Encoding 的响应（如预压缩的静态资源）和 send_file 的响应保持原样。
+    """
+
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self._encoded = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('COMPRESS_RESPONSES', True):
+            return
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 5)
+        self._encoded = TTLCache(
+            max_entries=app.config.get('COMPRESS_CACHE_MAX_ENTRIES', 256),
+            ttl=app.config.get('PAGE_CACHE_TTL', 60)
+        )
+        app.after_request(self.compress_response)
+
+    def _choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br'] and accepted['br'] >= accepted['gzip']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        # mtime=0 使相同内容的压缩结果相同
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        # 同一地址按请求头返回不同编码，共享缓存需要区分
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        encoding = self._choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            original = response.response
+            stream = _brotli_stream if encoding == 'br' else _gzip_stream
+            level = self.brotli_quality if encoding == 'br' else self.gzip_level
+            response.response = stream(response.iter_encoded(), level)
+            if hasattr(original, 'close'):
+                response.call_on_close(original.close)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            etag, weak = response.get_etag()
+            key = (etag, encoding) if etag else None
+            compressed = self._encoded.get(key) if key else None
+            if compressed is None:
+                compressed = self._compress(data, encoding)
+                if key:
+                    self._encoded.set(key, compressed)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+            metrics.inc('http_compressed_bytes_saved_total', len(data) - len(compressed))
+            # 压缩后的字节不同，强 ETag 改为弱 ETag
+            if etag and not weak:
+                response.set_etag(etag, weak=True)
+
+        response.content_encoding = encoding
+        metrics.inc('http_responses_compressed_total', encoding=encoding)
+        return response
+
+
+compression = Compression()
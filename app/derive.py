@@ -0,0 +1,103 @@
+import re
+
+import click
+from bs4 import BeautifulSoup
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+
+from app import mongo
+from app.codec import content_codec
+
+# 派生字段的版本号，派生规则变化时递增，旧文档可通过 derive backfill 重新计算
+DERIVATION_VERSION = 1
+
+EXCERPT_LENGTH = 150
+
+# 中日韩字符按字计数，其他文字按单词计数
+CJK_CHARS = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af'
+CJK_RE = re.compile(f'[{CJK_CHARS}]')
+WORD_RE = re.compile(r'[A-Za-z0-9]+(?:[\'\-][A-Za-z0-9]+)*')
+
+
+def count_words(text):
+    return len(CJK_RE.findall(text)) + len(WORD_RE.findall(text))
+
+
+def derive_article_fields(content):
+    """从文章HTML中计算摘要、封面图、标题大纲和字数"""
+    return derive_article(content)[0]
+
+
+def derive_article(content):
+    """解析一次文章HTML，返回 (派生字段, 纯文本)，纯文本供搜索索引使用
+
+    content 可以是压缩后的存储形式。
+    """
+    soup = BeautifulSoup(content_codec.decode(content) or '', 'html.parser')
+    text = soup.get_text()
+
+    cover_image = None
+    first_img = soup.find('img')
+    if first_img and first_img.get('src'):
+        cover_image = first_img['src']
+
+    headings = []
+    for i, heading in enumerate(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])):
+        headings.append({
+            'level': int(heading.name[1]),
+            'text': heading.text.strip(),
+            'id': f'heading-{i+1}'
+        })
+
+    fields = {
+        "excerpt": text[:EXCERPT_LENGTH] + '...',
+        "cover_image": cover_image,
+        "headings": headings,
+        "word_count": count_words(text),
+        "derived_version": DERIVATION_VERSION
+    }
+    return fields, text
+
+
+def ensure_derived(articles):
+    """为尚未派生或派生版本过旧的文章补算字段并写回数据库"""
+    for article in articles:
+        if article.get('derived_version') == DERIVATION_VERSION:
+            continue
+
+        if 'content' not in article:
+            doc = mongo.db.articles.find_one({"_id": article['_id']}, {"content": 1})
+            article['content'] = doc.get('content') if doc else None
+
+        fields = derive_article_fields(article.get('content'))
+        mongo.db.articles.update_one({"_id": article['_id']}, {"$set": fields})
+        article.update(fields)
+
+    return articles
+
+
+derive_cli = AppGroup('derive', help='文章派生字段相关命令')
+
+
+@derive_cli.command('backfill')
+@click.option('--batch-size', default=200, show_default=True, help='每批读取的文档数')
+@click.option('--force', is_flag=True, help='忽略版本号，重新计算所有文章')
+def backfill_command(batch_size, force):
+    """为旧文章计算或重新计算派生字段"""
+    query = {} if force else {"derived_version": {"$ne": DERIVATION_VERSION}}
+    cursor = mongo.db.articles.find(query, {"content": 1}).batch_size(batch_size)
+
+    updated = 0
+    batch = []
+    for doc in cursor:
+        batch.append(UpdateOne(
+            {"_id": doc['_id']},
+            {"$set": derive_article_fields(doc.get('content'))}
+        ))
+        if len(batch) >= batch_size:
+            updated += mongo.db.articles.bulk_write(batch, ordered=False).matched_count
+            batch = []
+    if batch:
+        updated += mongo.db.articles.bulk_write(batch, ordered=False).matched_count
+
+    click.echo(f"已处理 {updated} 篇文章")
@@ -0,0 +1,148 @@
+import datetime
+import html
+import re
+
+from bson.objectid import ObjectId
+
+from app import mongo
+from app.codec import content_codec
+from app.media import extract_inline_images
+
+# 单次增量保存允许的补丁数
+MAX_PATCHES = 64
+
+# 个人中心草稿列表显示的预览长度，预览只取正文开头的一段计算
+PREVIEW_LENGTH = 150
+PREVIEW_SOURCE_CHARS = 4000
+TAG_RE = re.compile(r'<[^>]*>')
+
+
+class DraftPatchError(ValueError):
+    """补丁格式错误或位置超出草稿内容"""
+
+
+class DraftConflict(Exception):
+    """草稿已被其他窗口修改，修订号与基准修订号不一致"""
+
+    def __init__(self, revision):
+        super().__init__(revision)
+        self.revision = revision
+
+
+def apply_patches(content, patches, images=None):
+    """依次把 {start, end, text} 补丁应用到内容上，补丁列表为空时内容不变
+
+    start 和 end 是浏览器中 JavaScript 字符串的下标（UTF-16 码元），每个补丁的
+    位置都基于前一个补丁应用后的内容。补丁中的内嵌图片会转存到图片存储，
+    替换后的地址按顺序追加到 images 中。
+    """
+    if not isinstance(patches, list) or len(patches) > MAX_PATCHES:
+        raise DraftPatchError('补丁数量无效')
+
+    units = (content or '').encode('utf-16-le')
+    for patch in patches:
+        try:
+            start, end, text = int(patch['start']), int(patch['end']), patch.get('text') or ''
+        except (KeyError, TypeError, ValueError):
+            raise DraftPatchError('补丁格式无效')
+        if not isinstance(text, str) or not 0 <= start <= end <= len(units) // 2:
+            raise DraftPatchError('补丁位置超出草稿内容')
+        text = extract_inline_images(text, images)
+        units = units[:start * 2] + text.encode('utf-16-le') + units[end * 2:]
+
+    try:
+        return units.decode('utf-16-le')
+    except UnicodeDecodeError:
+        # 补丁位置落在代理对中间
+        raise DraftPatchError('补丁位置无效')
+
+
+def draft_preview(content):
+    """草稿正文开头的纯文本，草稿列表不必读取和解压正文"""
+    text = html.unescape(TAG_RE.sub(' ', (content or '')[:PREVIEW_SOURCE_CHARS]))
+    return ' '.join(text.split())[:PREVIEW_LENGTH]
+
+
+def ensure_previews(drafts):
+    """为尚无预览字段的旧草稿补算预览并写回数据库"""
+    for draft in drafts:
+        if 'preview' in draft:
+            continue
+        doc = mongo.db.drafts.find_one({"_id": draft['_id']}, {"content": 1})
+        draft['preview'] = draft_preview(content_codec.decode(doc.get('content')) if doc else None)
+        mongo.db.drafts.update_one({"_id": draft['_id']}, {"$set": {"preview": draft['preview']}})
+    return drafts
+
+
+def stored_fields(fields):
+    """把草稿字段转换为存储形式：压缩正文并计算预览"""
+    fields = dict(fields)
+    if 'content' in fields:
+        fields['preview'] = draft_preview(fields['content'])
+        fields['content'] = content_codec.encode(fields['content'])
+    return fields
+
+
+def patch_draft(draft_id, author_id, base_revision, patches, fields=None):
+    """在 base_revision 上应用补丁并保存，返回 (新修订号, 补丁中图片替换后的地址)
+
+    草稿不存在时返回 None；修订号已变化时抛出 DraftConflict。
+    """
+    draft = mongo.db.drafts.find_one(
+        {"_id": ObjectId(draft_id), "author_id": author_id, "is_draft": True},
+        {"content": 1, "revision": 1}
+    )
+    if draft is None:
+        return None
+
+    revision = draft.get('revision', 0)
+    if revision != base_revision:
+        raise DraftConflict(revision)
+
+    images = []
+    changes = dict(fields or {})
+    changes['content'] = apply_patches(content_codec.decode(draft.get('content')), patches, images)
+    changes = stored_fields(changes)
+    changes['updated_at'] = datetime.datetime.now()
+
+    # 只有修订号仍等于读取时的值才写入，期间其他窗口的保存会使这次更新不匹配
+    query = {"_id": draft['_id'], "author_id": author_id}
+    query["revision"] = revision if 'revision' in draft else {"$exists": False}
+    result = mongo.db.drafts.update_one(query, {"$set": changes, "$inc": {"revision": 1}})
+    if result.matched_count == 0:
+        current = mongo.db.drafts.find_one({"_id": draft['_id']}, {"revision": 1})
+        raise DraftConflict(current.get('revision', 0) if current else None)
+
+    return revision + 1, images
+
+
+def save_draft(author_id, fields, draft_id=None):
+    """保存完整草稿，返回 (草稿ID, 新修订号, 是否新建)
+
+    指定 draft_id 时更新该草稿，否则按作者和标题更新已有草稿或新建。
+    """
+    now = datetime.datetime.now()
+    update = {"$set": dict(stored_fields(fields), updated_at=now), "$inc": {"revision": 1}}
+
+    # 取更新前的文档：不存在说明是新建的，修订号为更新前的值加一
+    if draft_id and ObjectId.is_valid(draft_id):
+        before = mongo.db.drafts.find_one_and_update(
+            {"_id": ObjectId(draft_id), "author_id": author_id},
+            update,
+            projection={"revision": 1}
+        )
+        if before:
+            return before['_id'], before.get('revision', 0) + 1, False
+
+    # 同一作者同一标题的草稿只保留一份
+    new_id = ObjectId()
+    update["$setOnInsert"] = {"_id": new_id, "created_at": now}
+    before = mongo.db.drafts.find_one_and_update(
+        {"author_id": author_id, "title": fields.get('title'), "is_draft": True},
+        update,
+        projection={"revision": 1},
+        upsert=True
+    )
+    if before:
+        return before['_id'], before.get('revision', 0) + 1, False
+    return new_id, 1, True
@@ -0,0 +1,161 @@
+import datetime
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import AppGroup
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+from app.jobs import job_queue
+from app.pagination import keyset_page
+from app.stats import increment_author_stats
+
+# 评论单独保存，按 (article_id, created_at, _id) 分页读取，文章文档大小不随评论增长
+COMMENTS_COLLECTION = 'comments'
+# 每个 (文章, 用户) 一条点赞记录，唯一索引保证重复点赞不重复计数
+LIKES_COLLECTION = 'article_likes'
+
+COMMENT_FIELDS = {"article_id": 1, "author_id": 1, "author_name": 1, "content": 1, "created_at": 1}
+
+COMMENTS_PAGE_SIZE = 20
+
+
+def comment_json(comment):
+    return {
+        "id": str(comment['_id']),
+        "author_id": comment.get('author_id'),
+        "author_name": comment.get('author_name'),
+        "content": comment.get('content'),
+        "created_at": comment['created_at'].strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+def list_comments(article_id, after=None, limit=COMMENTS_PAGE_SIZE):
+    """按时间倒序读取一页评论，返回 (评论列表, 下一页游标)"""
+    return keyset_page(
+        mongo.db[COMMENTS_COLLECTION],
+        {"article_id": ObjectId(article_id)},
+        COMMENT_FIELDS,
+        after=after,
+        limit=limit
+    )
+
+
+def add_comment(article_id, author_id, author_name, content):
+    """保存评论并增加文章的评论数，返回评论文档；文章已删除时返回 None"""
+    comment = {
+        "article_id": ObjectId(article_id),
+        "author_id": author_id,
+        "author_name": author_name,
+        "content": content,
+        "created_at": datetime.datetime.now(),
+    }
+    comment['_id'] = mongo.db[COMMENTS_COLLECTION].insert_one(comment).inserted_id
+    result = mongo.db.articles.update_one({"_id": ObjectId(article_id)}, {"$inc": {"comment_count": 1}})
+    if not result.matched_count:
+        # 文章在检查后被删除，清理任务可能已经执行过
+        mongo.db[COMMENTS_COLLECTION].delete_one({"_id": comment['_id']})
+        return None
+    return comment
+
+
+def delete_comment(comment_id, author_id):
+    """删除自己的评论并减少文章的评论数，返回是否删除"""
+    comment = mongo.db[COMMENTS_COLLECTION].find_one_and_delete(
+        {"_id": ObjectId(comment_id), "author_id": author_id},
+        projection={"article_id": 1}
+    )
+    if comment is None:
+        return False
+    mongo.db.articles.update_one({"_id": comment['article_id']}, {"$inc": {"comment_count": -1}})
+    return True
+
+
+def set_like(article, user_id, liked):
+    """点赞或取消点赞，可重复调用；只有状态变化时才修改文章和作者的点赞数
+
+    返回状态是否发生了变化。文章计数的更新作为判断依据：文章已被删除时删除刚写入的
+    点赞记录，也不修改作者的点赞数，避免清理任务执行后留下孤立的记录。
+    """
+    article_id = article['_id']
+    if liked:
+        try:
+            mongo.db[LIKES_COLLECTION].insert_one({
+                "article_id": article_id,
+                "user_id": user_id,
+                "created_at": datetime.datetime.now(),
+            })
+        except DuplicateKeyError:
+            return False
+        change = 1
+    else:
+        result = mongo.db[LIKES_COLLECTION].delete_one({"article_id": article_id, "user_id": user_id})
+        if not result.deleted_count:
+            return False
+        change = -1
+
+    result = mongo.db.articles.update_one({"_id": article_id}, {"$inc": {"likes": change}})
+    if not result.matched_count:
+        if liked:
+            mongo.db[LIKES_COLLECTION].delete_one({"article_id": article_id, "user_id": user_id})
+        return False
+    increment_author_stats(article.get('author_id'), likes=change)
+    return True
+
+
+def has_liked(article_id, user_id):
+    return mongo.db[LIKES_COLLECTION].count_documents(
+        {"article_id": ObjectId(article_id), "user_id": user_id}, limit=1
+    ) > 0
+
+
+@job_queue.handler('engagement.purge')
+def purge_article(article_id):
+    """后台任务：文章删除后删除它的评论和点赞记录"""
+    article_id = ObjectId(article_id)
+    if mongo.db.articles.count_documents({"_id": article_id}, limit=1):
+        return
+    mongo.db[COMMENTS_COLLECTION].delete_many({"article_id": article_id})
+    mongo.db[LIKES_COLLECTION].delete_many({"article_id": article_id})
+
+
+def _counts(collection):
+    return {doc['_id']: doc['count'] for doc in mongo.db[collection].aggregate([
+        {"$group": {"_id": "$article_id", "count": {"$sum": 1}}}
+    ], allowDiskUse=True)}
+
+
+def recount(batch_size=500):
+    """按评论和点赞记录重新计算每篇文章的计数，返回修改的文章数
+
+    同时删除旧文章中内嵌的空 comments 数组。作者的总点赞数需随后执行 stats rebuild。
+    """
+    comment_counts = _counts(COMMENTS_COLLECTION)
+    like_counts = _counts(LIKES_COLLECTION)
+
+    updated = 0
+    requests = []
+    cursor = mongo.db.articles.find({}, {"likes": 1, "comment_count": 1, "comments": 1}).batch_size(batch_size)
+    for doc in cursor:
+        fields = {"likes": like_counts.get(doc['_id'], 0), "comment_count": comment_counts.get(doc['_id'], 0)}
+        if all(doc.get(key) == value for key, value in fields.items()) and 'comments' not in doc:
+            continue
+        requests.append(UpdateOne({"_id": doc['_id']}, {"$set": fields, "$unset": {"comments": ""}}))
+        if len(requests) >= batch_size:
+            updated += mongo.db.articles.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += mongo.db.articles.bulk_write(requests, ordered=False).modified_count
+    return updated
+
+
+engagement_cli = AppGroup('engagement', help='评论和点赞命令')
+
+
+@engagement_cli.command('recount')
+@click.option('--batch-size', default=500, show_default=True, help='每批写入的文档数')
+def recount_command(batch_size):
+    """按评论和点赞记录重新计算文章的评论数和点赞数，修正计数偏差"""
+    updated = recount(batch_size)
+    click.echo(f"已修正 {updated} 篇文章的计数，请随后执行 stats rebuild 更新作者的总点赞数")
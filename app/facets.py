@@ -0,0 +1,133 @@
+import collections
+import datetime
+
+import click
+from flask.cli import AppGroup
+from pymongo import ReplaceOne, UpdateOne
+
+from app import mongo
+from app.read_routing import read_db
+
+# 每个分类、每个标签一份计数文档，_id 为 "<类型>:<值>"
+FACETS_COLLECTION = 'facet_counts'
+
+CATEGORY = 'category'
+TAG = 'tag'
+
+# 侧边栏显示的分类和标签数
+TOP_CATEGORIES = 20
+TOP_TAGS = 30
+
+
+def article_facets(article):
+    """文章计入的 (类型, 值)，重复的标签只计一次"""
+    if not article:
+        return set()
+    facets = set()
+    if article.get('category'):
+        facets.add((CATEGORY, article['category']))
+    for tag in article.get('tags') or ():
+        if isinstance(tag, str) and tag:
+            facets.add((TAG, tag))
+    return facets
+
+
+def update_facets(old=None, new=None):
+    """文章发布、更新或删除后调整计数
+
+    old 为修改前的文章（发布时为 None），new 为修改后的文章（删除时为 None），
+    只对发生变化的分类和标签执行 $inc。
+    """
+    changes = collections.Counter()
+    for facet in article_facets(old):
+        changes[facet] -= 1
+    for facet in article_facets(new):
+        changes[facet] += 1
+
+    requests = [
+        UpdateOne(
+            {"_id": f'{kind}:{value}'},
+            {"$inc": {"count": change}, "$setOnInsert": {"kind": kind, "value": value}},
+            upsert=True
+        )
+        for (kind, value), change in changes.items() if change
+    ]
+    if requests:
+        mongo.db[FACETS_COLLECTION].bulk_write(requests, ordered=False)
+
+
+def top_facets(kind, limit):
+    """按文章数从多到少返回一种类型的 [{value, count}]"""
+    cursor = read_db()[FACETS_COLLECTION].find(
+        {"kind": kind, "count": {"$gt": 0}},
+        {"_id": 0, "value": 1, "count": 1}
+    ).sort("count", -1).limit(limit)
+    return list(cursor)
+
+
+def navigation_facets():
+    """列表页侧边栏的分类和热门标签"""
+    return {
+        "categories": top_facets(CATEGORY, TOP_CATEGORIES),
+        "tags": top_facets(TAG, TOP_TAGS),
+    }
+
+
+def _aggregate_categories():
+    yield from mongo.db.articles.aggregate([
+        {"$match": {"category": {"$nin": [None, ""]}}},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+    ], allowDiskUse=True)
+
+
+def _aggregate_tags():
+    yield from mongo.db.articles.aggregate([
+        {"$project": {"tags": 1}},
+        {"$unwind": "$tags"},
+        # 同一篇文章重复的标签只计一次
+        {"$group": {"_id": {"article": "$_id", "tag": "$tags"}}},
+        {"$group": {"_id": "$_id.tag", "count": {"$sum": 1}}},
+    ], allowDiskUse=True)
+
+
+def rebuild_facets(batch_size=1000):
+    """用聚合重新计算全部计数，修正计数偏差，返回写入的计数文档数"""
+    rebuilt_at = datetime.datetime.now()
+    collection = mongo.db[FACETS_COLLECTION]
+
+    counts = {}
+    for doc in _aggregate_categories():
+        counts[(CATEGORY, doc['_id'])] = doc['count']
+    for doc in _aggregate_tags():
+        if isinstance(doc['_id'], str) and doc['_id']:
+            counts[(TAG, doc['_id'])] = doc['count']
+
+    updated = 0
+    requests = []
+    for (kind, value), count in counts.items():
+        requests.append(ReplaceOne(
+            {"_id": f'{kind}:{value}'},
+            {"kind": kind, "value": value, "count": count, "rebuilt_at": rebuilt_at},
+            upsert=True
+        ))
+        if len(requests) >= batch_size:
+            collection.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        updated += len(requests)
+
+    # 删除本次没有重建到的分类和标签（已没有文章）
+    collection.delete_many({"rebuilt_at": {"$ne": rebuilt_at}})
+    return updated
+
+
+facets_cli = AppGroup('facets', help='分类和标签计数命令')
+
+
+@facets_cli.command('rebuild')
+def rebuild_command():
+    """用聚合重新计算分类和标签的文章数，可定期执行修正计数偏差"""
+    count = rebuild_facets()
+    click.echo(f"已更新 {count} 个分类和标签的计数")
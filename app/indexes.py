@@ -0,0 +1,186 @@
+import datetime
+import sys
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import AppGroup
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app import mongo
+from app.jobs import DONE_RETENTION_SECONDS
+from app.pagination import KEYSET_SORT
+
+# 各集合需要的索引，create_indexes 对已存在的同名同定义索引不做任何操作
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "articles": [
+        # 文章列表分页
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        # 个人中心、作者统计、按作者筛选
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="author_created_at_id"),
+        # 相关文章、按分类筛选
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="category_created_at_id"),
+        # 按标签筛选
+        IndexModel([("tags", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="tags_created_at_id"),
+    ],
+    "facet_counts": [
+        # 侧边栏按文章数读取分类和标签
+        IndexModel([("kind", ASCENDING), ("count", DESCENDING)], name="kind_count"),
+    ],
+    "search_postings": [
+        # 按词项读取权重最高的文章
+        IndexModel([("term", ASCENDING), ("w", DESCENDING)], name="term_weight"),
+        # 更新或删除文章时移除旧的 posting；同一篇文章的每个词项只有一条
+        IndexModel([("article_id", ASCENDING), ("term", ASCENDING)], name="article_term_unique", unique=True),
+    ],
+    "page_cache": [
+        # 共享页面缓存：按标签失效，过期条目自动删除
+        IndexModel([("tags", ASCENDING)], name="tags"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "article_signatures": [
+        # 按 LSH 分桶查找候选相似文章
+        IndexModel([("buckets", ASCENDING)], name="buckets"),
+    ],
+    "recommendations": [
+        # 文章更新或删除时修改其他文章推荐列表中的该文章
+        IndexModel([("items._id", ASCENDING)], name="items_id"),
+    ],
+    "rate_limits": [
+        # 令牌桶重新装满后删除
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "comments": [
+        # 按文章分页读取评论
+        IndexModel([("article_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="article_created_at_id"),
+    ],
+    "article_likes": [
+        # 每个用户对每篇文章只能点赞一次
+        IndexModel([("article_id", ASCENDING), ("user_id", ASCENDING)], name="article_user_unique", unique=True),
+    ],
+    "jobs": [
+        # 工作进程领取到期的任务、重新领取租约过期的任务
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        # 排队中的相同任务只保留一个
+        IndexModel([("key", ASCENDING)], name="queued_key_unique", unique=True,
+                   partialFilterExpression={"status": "queued", "key": {"$exists": True}}),
+        # 完成的任务到期后删除
+        IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=DONE_RETENTION_SECONDS,
+                   partialFilterExpression={"status": "done"}),
+    ],
+    "drafts": [
+        # 个人中心草稿箱
+        IndexModel([("author_id", ASCENDING), ("is_draft", ASCENDING), ("updated_at", DESCENDING)],
+                   name="author_draft_updated_at"),
+        # 保存草稿时按标题查找
+        IndexModel([("author_id", ASCENDING), ("is_draft", ASCENDING), ("title", ASCENDING)],
+                   name="author_draft_title"),
+    ],
+}
+
+
+def query_shapes():
+    """各路由使用的查询形态：(名称, 集合, 过滤条件, 排序)"""
+    oid = ObjectId()
+    now = datetime.datetime.utcnow()
+    after_cursor = {"created_at": {"$lte": now}, "$or": [
+        {"created_at": {"$lt": now}},
+        {"created_at": now, "_id": {"$lt": oid}}
+    ]}
+    return [
+        ("login", "users", {"username": "verify"}, None),
+        ("register", "users", {"$or": [{"username": "verify"}, {"email": "verify@example.com"}]}, None),
+        ("articles", "articles", {}, KEYSET_SORT),
+        ("articles next page", "articles", {"$and": [{}, after_cursor]}, KEYSET_SORT),
+        ("articles by category", "articles", {"category": "verify"}, KEYSET_SORT),
+        ("articles by tag", "articles", {"tags": "verify"}, KEYSET_SORT),
+        ("facet sidebar", "facet_counts", {"kind": "tag", "count": {"$gt": 0}}, [("count", -1)]),
+        ("user_center articles", "articles", {"author_id": str(oid)}, KEYSET_SORT),
+        ("user_center next page", "articles", {"$and": [{"author_id": str(oid)}, after_cursor]}, KEYSET_SORT),
+        ("related articles fallback", "articles", {"category": "verify", "_id": {"$ne": oid}},
+         [("created_at", -1), ("_id", -1)]),
+        ("recommendation candidates", "article_signatures", {"buckets": {"$in": ["0:verify"]}, "_id": {"$ne": oid}}, None),
+        ("recommendations containing article", "recommendations", {"items._id": oid}, None),
+        ("author article count", "articles", {"author_id": str(oid)}, None),
+        ("user_center drafts", "drafts", {"author_id": str(oid), "is_draft": True}, [("updated_at", -1)]),
+        ("search postings", "search_postings", {"term": "verify"}, [("w", -1)]),
+        ("search article postings", "search_postings", {"article_id": oid}, None),
+        ("article comments", "comments", {"article_id": oid}, KEYSET_SORT),
+        ("article comments next page", "comments", {"$and": [{"article_id": oid}, after_cursor]}, KEYSET_SORT),
+        ("article like", "article_likes", {"article_id": oid, "user_id": str(oid)}, None),
+        ("job claim", "jobs", {"status": "queued", "run_at": {"$lte": now}}, [("run_at", 1)]),
+        ("expired job leases", "jobs", {"status": "running", "lease_until": {"$lt": now}}, [("lease_until", 1)]),
+        ("draft by title", "drafts", {"author_id": str(oid), "title": "verify", "is_draft": True}, None),
+    ]
+
+
+def ensure_indexes():
+    """创建所有登记的索引，返回 {集合: 索引名列表}"""
+    created = {}
+    for name, models in INDEXES.items():
+        created[name] = mongo.db[name].create_indexes(models)
+    return created
+
+
+def _bad_stages(plan):
+    """找出执行计划中的全表扫描和内存排序阶段"""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get('stage') in ('COLLSCAN', 'SORT'):
+            found.append(plan['stage'])
+        for value in plan.values():
+            found.extend(_bad_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            found.extend(_bad_stages(item))
+    return found
+
+
+def verify_query_plans():
+    """对每种查询形态执行 explain，返回 [(名称, 问题阶段列表)]"""
+    results = []
+    for name, collection, query, sort in query_shapes():
+        cursor = mongo.db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        results.append((name, _bad_stages(plan)))
+    return results
+
+
+indexes_cli = AppGroup('indexes', help='索引管理命令')
+
+
+@indexes_cli.command('ensure')
+def ensure_command():
+    """创建登记的索引（可重复执行）"""
+    try:
+        created = ensure_indexes()
+    except OperationFailure as e:
+        click.echo(f"创建索引失败: {e}", err=True)
+        sys.exit(1)
+    for name, index_names in created.items():
+        click.echo(f"{name}: {', '.join(index_names)}")
+
+
+@indexes_cli.command('verify')
+def verify_command():
+    """检查各路由查询是否会全表扫描或内存排序"""
+    failed = False
+    for name, stages in verify_query_plans():
+        if stages:
+            failed = True
+            click.echo(f"[失败] {name}: {', '.join(sorted(set(stages)))}")
+        else:
+            click.echo(f"[通过] {name}")
+    if failed:
+        sys.exit(1)
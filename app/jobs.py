@@ -0,0 +1,355 @@
+import atexit
+import datetime
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+from app.tracing import metrics
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = 'jobs'
+
+# 任务状态：排队（包括等待重试）、执行中、完成、多次失败后放弃
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+# 重试间隔从 JOB_RETRY_BASE_SECONDS 开始每次翻倍，最长一小时
+RETRY_MAX_SECONDS = 3600
+
+# 完成的任务保留一周后由 TTL 索引删除，放弃的任务一直保留供排查
+DONE_RETENTION_SECONDS = 7 * 24 * 3600
+
+# 最多保存的错误信息长度
+MAX_ERROR_LENGTH = 2000
+
+metrics.describe('jobs_processed_total', 'counter', '按任务名和结果统计的后台任务执行次数')
+metrics.describe('job_duration_seconds', 'histogram', '后台任务执行耗时')
+
+
+class UnknownJob(Exception):
+    """任务名没有对应的处理函数"""
+
+
+class JobQueue:
+    """保存在 MongoDB 中的后台任务队列
+
+    发布、更新、删除文章后需要做的工作（搜索索引、相关文章、缩略图）通过 enqueue
+    加入队列，由 flask jobs work 启动的工作进程执行。工作进程用 find_one_and_update
+    领取任务并持有一段时间的租约，进程退出后租约到期的任务会被其他工作进程重新领取；
+    失败的任务按指数退避重试，超过 JOB_MAX_ATTEMPTS 次后标记为 dead。
+
+    任务只带文章 ID，处理时读取文章的最新状态，因此排队中的相同任务（idempotency key
+    相同）合并为一个，重复执行也没有副作用。JOB_QUEUE_MODE 为 inline 时不写入队列，
+    由本进程的后台线程执行，不需要单独的工作进程，请求不等待任务完成；进程退出时
+    未执行的任务会丢失。JOB_INLINE_WORKERS 为 0 时在 enqueue 时直接执行，仅用于调试。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'inline'
+        self.inline_workers = 1
+        self.max_attempts = 5
+        self.lease_seconds = 300
+        self.retry_base_seconds = 10
+        self._handlers = {}
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('JOB_QUEUE_MODE', 'inline')
+        if self.mode not in ('inline', 'queue'):
+            raise ValueError(f'不支持的 JOB_QUEUE_MODE: {self.mode}')
+        self.inline_workers = app.config.get('JOB_INLINE_WORKERS', 1)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', 5)
+        self.lease_seconds = app.config.get('JOB_LEASE_SECONDS', 300)
+        self.retry_base_seconds = app.config.get('JOB_RETRY_BASE_SECONDS', 10)
+        atexit.register(self.shutdown)
+
+    def handler(self, name):
+        """登记任务处理函数，payload 的字段作为关键字参数传入"""
+        def decorator(func):
+            self._handlers[name] = func
+            return func
+        return decorator
+
+    @property
+    def collection(self):
+        return mongo.db[JOBS_COLLECTION]
+
+    def enqueue(self, name, payload=None, key=None, delay=0):
+        """加入一个任务
+
+        key 相同的任务在排队期间只保留一个；已在执行的任务不受影响，新任务会在它之后
+        再执行一次，读取到执行期间的修改。inline 模式下交给后台线程执行，失败只记录日志。
+        """
+        payload = payload or {}
+        if name not in self._handlers:
+            raise UnknownJob(name)
+
+        if self.mode == 'inline':
+            self._submit_inline(name, payload, key)
+            return None
+
+        now = datetime.datetime.utcnow()
+        job = {
+            "name": name,
+            "payload": payload,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "run_at": now + datetime.timedelta(seconds=delay),
+            "created_at": now,
+        }
+        if key is None:
+            return self.collection.insert_one(job).inserted_id
+
+        job["key"] = key
+        try:
+            result = self.collection.update_one(
+                {"key": key, "status": QUEUED},
+                {"$setOnInsert": job},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # 其他请求同时加入了相同的任务
+            return None
+        return result.upserted_id
+
+    def _ensure_executor(self):
+        # fork 之后子进程不能使用父进程的线程
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.inline_workers, thread_name_prefix='jobs')
+                self._pid = os.getpid()
+                self._pending = set()
+            return self._executor
+
+    def _submit_inline(self, name, payload, key):
+        if self.inline_workers <= 0:
+            self._run_inline(name, payload)
+            return
+        executor = self._ensure_executor()
+        with self._lock:
+            # 与队列模式相同，key 相同的任务在开始执行前只保留一个
+            if key is not None:
+                if key in self._pending:
+                    return
+                self._pending.add(key)
+        executor.submit(self._run_inline, name, payload, key)
+
+    def _run_inline(self, name, payload, key=None):
+        if key is not None:
+            with self._lock:
+                self._pending.discard(key)
+        try:
+            with self.app.app_context():
+                self._execute(name, payload)
+        except Exception:
+            logger.exception("执行任务失败", extra={"fields": {"job": name}})
+            metrics.inc('jobs_processed_total', job=name, result='failed')
+        else:
+            metrics.inc('jobs_processed_total', job=name, result=DONE)
+
+    def shutdown(self):
+        """等待后台线程执行完已提交的 inline 任务"""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _execute(self, name, payload):
+        handler = self._handlers.get(name)
+        if handler is None:
+            raise UnknownJob(name)
+        started = time.perf_counter()
+        try:
+            handler(**payload)
+        finally:
+            metrics.observe('job_duration_seconds', time.perf_counter() - started, job=name)
+
+    def claim(self, worker, names=None):
+        """领取一个到期的任务，没有可执行的任务时返回 None"""
+        now = datetime.datetime.utcnow()
+        lease = {
+            "$set": {
+                "status": RUNNING,
+                "worker": worker,
+                "lease_until": now + datetime.timedelta(seconds=self.lease_seconds),
+                "started_at": now,
+            },
+            "$inc": {"attempts": 1},
+        }
+        # 先取排队的任务，再取租约已过期（工作进程退出）的任务
+        for query, sort in (
+            ({"status": QUEUED, "run_at": {"$lte": now}}, [("run_at", 1)]),
+            ({"status": RUNNING, "lease_until": {"$lt": now}}, [("lease_until", 1)]),
+        ):
+            if names:
+                query["name"] = {"$in": list(names)}
+            job = self.collection.find_one_and_update(
+                query, lease, sort=sort, return_document=ReturnDocument.AFTER
+            )
+            if job is not None:
+                return job
+        return None
+
+    def _owned(self, job):
+        # 只有仍持有租约的工作进程才能修改任务状态
+        return {"_id": job['_id'], "status": RUNNING, "worker": job['worker'], "attempts": job['attempts']}
+
+    def complete(self, job):
+        now = datetime.datetime.utcnow()
+        self.collection.update_one(self._owned(job), {
+            "$set": {"status": DONE, "finished_at": now},
+            "$unset": {"lease_until": "", "worker": ""},
+        })
+        metrics.inc('jobs_processed_total', job=job['name'], result=DONE)
+
+    def fail(self, job, error):
+        """记录失败：未超过重试次数时按退避时间重新排队，否则标记为 dead"""
+        now = datetime.datetime.utcnow()
+        error = error[-MAX_ERROR_LENGTH:]
+        if job['attempts'] >= job.get('max_attempts', self.max_attempts):
+            self.collection.update_one(self._owned(job), {
+                "$set": {"status": DEAD, "last_error": error, "failed_at": now},
+                "$unset": {"lease_until": "", "worker": ""},
+            })
+            metrics.inc('jobs_processed_total', job=job['name'], result=DEAD)
+            logger.error("任务多次失败后放弃", extra={"fields": {
+                "job": job['name'], "job_id": str(job['_id']), "attempts": job['attempts']
+            }})
+            return
+
+        delay = min(self.retry_base_seconds * 2 ** (job['attempts'] - 1), RETRY_MAX_SECONDS)
+        # 随机抖动，避免同时失败的任务同时重试
+        delay *= random.uniform(0.5, 1.0)
+        try:
+            self.collection.update_one(self._owned(job), {
+                "$set": {
+                    "status": QUEUED,
+                    "run_at": now + datetime.timedelta(seconds=delay),
+                    "last_error": error,
+                },
+                "$unset": {"lease_until": "", "worker": ""},
+            })
+        except DuplicateKeyError:
+            # 执行期间已有相同的任务排队，由它完成这次工作
+            self.collection.delete_one(self._owned(job))
+        metrics.inc('jobs_processed_total', job=job['name'], result='retry')
+
+    def run_one(self, worker, names=None):
+        """领取并执行一个任务，返回是否领取到任务"""
+        job = self.claim(worker, names)
+        if job is None:
+            return False
+
+        fields = {"job": job['name'], "job_id": str(job['_id']), "attempt": job['attempts']}
+        if job['attempts'] > job.get('max_attempts', self.max_attempts):
+            # 多次在执行中租约过期（如导致工作进程崩溃），不再执行
+            self.fail(job, job.get('last_error') or '租约多次过期')
+            return True
+        try:
+            self._execute(job['name'], job.get('payload') or {})
+        except UnknownJob:
+            job['attempts'] = job.get('max_attempts', self.max_attempts)
+            self.fail(job, f"未知的任务: {job['name']}")
+        except Exception:
+            logger.exception("执行任务失败", extra={"fields": fields})
+            self.fail(job, traceback.format_exc())
+        else:
+            self.complete(job)
+            logger.debug("任务完成", extra={"fields": fields})
+        return True
+
+    def depth(self):
+        """已到期、等待执行的任务数"""
+        if self.mode != 'queue':
+            return 0
+        return self.collection.count_documents({"status": QUEUED, "run_at": {"$lte": datetime.datetime.utcnow()}})
+
+
+job_queue = JobQueue()
+
+jobs_cli = AppGroup('jobs', help='后台任务命令')
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='执行完当前到期的任务后退出')
+@click.option('--poll-interval', default=1.0, show_default=True, help='没有任务时的轮询间隔（秒）')
+@click.option('--name', 'names', multiple=True, help='只执行指定名称的任务，可重复')
+def work_command(once, poll_interval, names):
+    """启动工作进程执行后台任务，收到 SIGTERM 或 SIGINT 后执行完当前任务再退出"""
+    if current_app.config.get('JOB_QUEUE_MODE') != 'queue':
+        click.echo("JOB_QUEUE_MODE 不是 queue，任务由 Web 进程的后台线程执行，不会进入队列", err=True)
+
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    processed = 0
+    click.echo(f"工作进程 {worker} 已启动", err=True)
+    while not stopping:
+        if job_queue.run_one(worker, names):
+            processed += 1
+            continue
+        if once:
+            break
+        time.sleep(poll_interval)
+    click.echo(f"已执行 {processed} 个任务", err=True)
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """按任务名和状态统计任务数"""
+    rows = job_queue.collection.aggregate([
+        {"$group": {"_id": {"name": "$name", "status": "$status"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id.name": 1, "_id.status": 1}},
+    ])
+    for row in rows:
+        click.echo(f"{row['_id']['name']}\t{row['_id']['status']}\t{row['count']}")
+
+
+@jobs_cli.command('retry')
+@click.option('--name', default=None, help='只重试指定名称的任务')
+def retry_command(name):
+    """把放弃（dead）的任务重新排队"""
+    query = {"status": DEAD}
+    if name:
+        query["name"] = name
+    requeued = 0
+    for job in job_queue.collection.find(query, {"_id": 1}):
+        try:
+            result = job_queue.collection.update_one(
+                {"_id": job['_id'], "status": DEAD},
+                {"$set": {"status": QUEUED, "attempts": 0, "run_at": datetime.datetime.utcnow()}}
+            )
+            requeued += result.modified_count
+        except DuplicateKeyError:
+            # 已有相同的任务在排队
+            job_queue.collection.delete_one({"_id": job['_id'], "status": DEAD})
+    click.echo(f"已重新排队 {requeued} 个任务")
@@ -0,0 +1,41 @@
+import datetime
+import logging
+import sys
+
+
+class KeyValueFormatter(logging.Formatter):
+    """输出 key=value 格式的单行日志，便于日志系统检索
+
+    通过 extra={"fields": {...}} 传入的字段会附加在消息之后。
+    """
+
+    def format(self, record):
+        parts = {
+            "ts": datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        parts.update(getattr(record, 'fields', {}))
+        line = ' '.join(f'{key}={self._quote(value)}' for key, value in parts.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+    @staticmethod
+    def _quote(value):
+        text = str(value)
+        if not text or any(c in text for c in ' "=\n'):
+            return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        return text
+
+
+def configure_logging(app):
+    """按 LOG_LEVEL 配置 app 包下的日志输出"""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(KeyValueFormatter())
+
+    logger = logging.getLogger('app')
+    logger.handlers = [handler]
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    logger.propagate = False
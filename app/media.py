@@ -0,0 +1,136 @@
+import base64
+import binascii
+import hashlib
+import re
+
+import click
+import gridfs
+from flask.cli import AppGroup
+
+from app import mongo
+from app.codec import content_codec
+from app.derive import derive_article_fields
+
+# 图片按内容哈希存放在 GridFS 的 media 集合中，文件 _id 即 sha256 十六进制摘要
+MEDIA_COLLECTION = 'media'
+MEDIA_URL_PREFIX = '/media/'
+
+# 编辑器通过 FileReader.readAsDataURL 嵌入的图片
+DATA_URL_RE = re.compile(r'data:(image/[a-zA-Z0-9.+-]+);base64,([A-Za-z0-9+/=]+)')
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# 只保存位图；SVG 等可以包含脚本的类型与站点同源提供时会造成存储型 XSS
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+IMAGE_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+
+
+def media_fs():
+    return gridfs.GridFS(mongo.db, collection=MEDIA_COLLECTION)
+
+
+def media_url(digest):
+    return MEDIA_URL_PREFIX + digest
+
+
+def sniff_image_type(data):
+    """按文件头识别位图类型，不是允许的类型时返回 None"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def store_image(data, content_type):
+    """按内容哈希保存图片，已存在时直接复用，返回摘要"""
+    digest = hashlib.sha256(data).hexdigest()
+    fs = media_fs()
+    if not fs.exists(digest):
+        try:
+            fs.put(data, _id=digest, content_type=content_type)
+        except gridfs.errors.FileExists:
+            # 并发请求已经写入了同一张图片
+            pass
+    return digest
+
+
+def extract_inline_images(content, collected=None):
+    """把内容中的 base64 图片替换为 /media/<hash> 地址
+
+    同一篇内容中重复出现的图片只写入一次。无法解码、不是位图或声明的类型与文件头
+    不符的 data URL 保持原样，不写入图片存储。传入 collected 列表时，按出现顺序
+    追加每个 data URL 替换后的地址。
+    """
+    if not content or 'data:image/' not in content:
+        return content
+
+    replaced = {}
+
+    def _replace(match):
+        data_url = match.group(0)
+        if data_url not in replaced:
+            try:
+                data = base64.b64decode(match.group(2), validate=True)
+            except (binascii.Error, ValueError):
+                replaced[data_url] = data_url
+            else:
+                # 保存的类型取自文件头，而不是客户端声明的类型
+                content_type = sniff_image_type(data)
+                if content_type is None or content_type != match.group(1).lower():
+                    replaced[data_url] = data_url
+                else:
+                    replaced[data_url] = media_url(store_image(data, content_type))
+        if collected is not None:
+            collected.append(replaced[data_url])
+        return replaced[data_url]
+
+    return DATA_URL_RE.sub(_replace, content)
+
+
+media_cli = AppGroup('media', help='图片存储相关命令')
+
+
+@media_cli.command('backfill')
+@click.option('--batch-size', default=100, show_default=True, help='每批读取的文档数')
+def backfill_command(batch_size):
+    """把已有文章和草稿中的内嵌图片迁移到图片存储，文章同时重新计算封面图和摘要等派生字段"""
+    from app.page_cache import page_cache
+    from app.thumbnails import existing_thumb
+
+    articles = 0
+    for name in ('articles', 'drafts'):
+        collection = mongo.db[name]
+        # 压缩保存的正文无法用正则匹配，一并读出后解压检查
+        cursor = collection.find(
+            {"$or": [{"content": {"$regex": "data:image/"}}, {"content": {"$type": "binData"}}]},
+            {"content": 1}
+        ).batch_size(batch_size)
+
+        migrated = 0
+        for doc in cursor:
+            original = content_codec.decode(doc['content'])
+            if not original or 'data:image/' not in original:
+                continue
+            content = extract_inline_images(original)
+            if content != original:
+                fields = {"content": content_codec.encode(content)}
+                if name == 'articles':
+                    # 列表页读取的封面图仍是 data URL，需要与正文一起更新
+                    fields.update(derive_article_fields(content))
+                    fields['cover_thumb'] = existing_thumb(fields['cover_image'])
+                collection.update_one({"_id": doc['_id']}, {"$set": fields})
+                migrated += 1
+
+        click.echo(f"{name}: 已迁移 {migrated} 篇文档")
+        if name == 'articles':
+            articles = migrated
+
+    if articles:
+        page_cache.invalidate()
+        click.echo("请随后执行 thumbnails backfill 生成新封面的缩略图，并执行 recommend build 更新相关文章列表中的封面")
@@ -0,0 +1,184 @@
+import datetime
+import hashlib
+import threading
+from collections import defaultdict
+
+from bson.binary import Binary
+from flask import current_app, make_response, request, session
+
+from app import mongo
+from app.cache import TTLCache
+
+# 所有列表页共用的标签，任何文章变化都会使列表页失效
+LIST_TAG = 'list'
+
+
+def article_tag(article_id):
+    return f'article:{article_id}'
+
+
+def author_tag(author_id):
+    return f'author:{author_id}'
+
+
+def category_tag(category):
+    return f'category:{category}'
+
+
+class MemoryBackend:
+    """进程内缓存，多进程部署时各进程的缓存和失效互不相通"""
+
+    def __init__(self, max_entries, ttl):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        evicted = self._entries.set(key, entry)
+        with self._lock:
+            for tag in entry['tags']:
+                self._tags[tag].add(key)
+            # 被淘汰的键留在标签索引里不影响正确性，这里顺带清理
+            for old_key in evicted:
+                for keys in self._tags.values():
+                    keys.discard(old_key)
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.pop(tag, ()))
+        for key in keys:
+            self._entries.delete(key)
+
+
+class MongoBackend:
+    """保存在 MongoDB 中的共享缓存，多个进程共用，过期条目由 TTL 索引清理"""
+
+    collection_name = 'page_cache'
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    @property
+    def collection(self):
+        return mongo.db[self.collection_name]
+
+    def get(self, key):
+        doc = self.collection.find_one({"_id": key})
+        if doc is None or doc['expires_at'] < datetime.datetime.utcnow():
+            return None
+        doc['body'] = bytes(doc['body'])
+        return doc
+
+    def set(self, key, entry):
+        doc = dict(entry)
+        doc['body'] = Binary(entry['body'])
+        doc['tags'] = list(entry['tags'])
+        doc['expires_at'] = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+        self.collection.replace_one({"_id": key}, doc, upsert=True)
+
+    def invalidate(self, tags):
+        self.collection.delete_many({"tags": {"$in": list(tags)}})
+
+
+class PageCache:
+    """渲染结果缓存
+
+    写接口按文章、作者和分类标签使缓存失效；命中时返回带 ETag 和
+    Last-Modified 的响应，浏览器重复访问可以得到 304。
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+        ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('PAGE_CACHE_MAX_ENTRIES', 1000), ttl)
+        elif backend == 'mongo':
+            self.backend = MongoBackend(ttl)
+        else:
+            self.backend = None
+
+    def _key(self):
+        # 导航栏会根据登录状态变化
+        viewer = 'user' if 'user_id' in session else 'guest'
+        return f'{viewer}:{request.full_path}'
+
+    def lookup(self):
+        """查找当前请求的缓存条目"""
+        if self.backend is None:
+            return None
+        return self.backend.get(self._key())
+
+    def respond(self, entry):
+        response = make_response(entry['body'])
+        response.mimetype = 'text/html'
+        response.set_etag(entry['etag'], weak=True)
+        response.last_modified = entry['last_modified']
+        # 页面按登录状态区分，只允许浏览器缓存，且每次都要重新验证
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def _entry(self, body, tags, meta=None):
+        data = body.encode('utf-8')
+        return {
+            "body": data,
+            "etag": hashlib.sha1(data).hexdigest(),
+            "last_modified": datetime.datetime.utcnow().replace(microsecond=0),
+            "tags": set(tags),
+            "meta": meta or {}
+        }
+
+    def store(self, body, tags, meta=None, cache=True):
+        """缓存渲染结果并返回响应，cache 为 False 时只返回响应"""
+        entry = self._entry(body, tags, meta)
+        if self.backend is not None and cache:
+            self.backend.set(self._key(), entry)
+        return self.respond(entry)
+
+    def stream(self, chunks, tags, meta=None):
+        """边发送边收集流式渲染的片段，完整发送后才写入缓存
+
+        流式响应在发出内容前无法计算 ETag，之后命中缓存的请求才带 ETag。
+        """
+        key = self._key() if self.backend is not None else None
+
+        def generate():
+            parts = []
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            # 中途出错或客户端断开时不会执行到这里，不完整的页面不会被缓存
+            if key is not None:
+                self.backend.set(key, self._entry(''.join(parts), tags, meta))
+
+        response = current_app.response_class(generate(), mimetype='text/html')
+        if hasattr(chunks, 'close'):
+            response.call_on_close(chunks.close)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    def invalidate(self, article_id=None, author_id=None, categories=()):
+        """文章发布、更新或删除后调用"""
+        if self.backend is None:
+            return
+        tags = {LIST_TAG}
+        if article_id:
+            tags.add(article_tag(article_id))
+        if author_id:
+            tags.add(author_tag(author_id))
+        tags.update(category_tag(category) for category in categories if category)
+        self.backend.invalidate(tags)
+
+
+page_cache = PageCache()
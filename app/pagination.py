@@ -0,0 +1,95 @@
+import base64
+import binascii
+import datetime
+
+from bson.objectid import ObjectId
+
+# 按 (created_at, _id) 倒序分页，游标记录上一页最后一条文档的位置
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+# MongoDB 中的时间为毫秒精度，游标以毫秒整数记录
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def encode_cursor(doc):
+    millis = (doc['created_at'] - EPOCH) // datetime.timedelta(milliseconds=1)
+    raw = f"{millis}:{doc['_id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，无效时返回 None"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        millis, oid = raw.split(':', 1)
+        created_at = EPOCH + datetime.timedelta(milliseconds=int(millis))
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        return None
+    if not ObjectId.is_valid(oid):
+        return None
+    return created_at, ObjectId(oid)
+
+
+def _after(query, after):
+    position = decode_cursor(after)
+    if not position:
+        return query
+    created_at, oid = position
+    # $lte 条件让查询计划可以直接限定索引范围
+    return {"$and": [query, {"created_at": {"$lte": created_at}, "$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": oid}}
+    ]}]}
+
+
+def keyset_page(collection, query, projection, after=None, limit=20):
+    """读取一页文档，返回 (文档列表, 下一页游标)"""
+    # 多取一条用于判断是否还有下一页
+    docs = list(collection.find(_after(query, after), projection).sort(KEYSET_SORT).limit(limit + 1))
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor
+
+
+class KeysetStream:
+    """边从游标读取边产出一页文档，供流式渲染使用
+
+    prepare 在产出前处理每篇文档。只能遍历一次，遍历结束后 next_cursor 才有值，
+    模板中需在循环之后再读取。
+    """
+
+    def __init__(self, collection, query, projection, after=None, limit=20, prepare=None):
+        self.limit = limit
+        self.next_cursor = None
+        self._prepare = prepare
+        self._cursor = collection.find(_after(query, after), projection).sort(KEYSET_SORT).limit(limit + 1)
+        self._first = None
+
+    def _peek(self):
+        if self._first is None:
+            self._first = next(self._cursor, None)
+        return self._first
+
+    def __bool__(self):
+        return self._peek() is not None
+
+    def __iter__(self):
+        doc = self._peek()
+        count = 0
+        while doc is not None:
+            if count == self.limit:
+                # 多取的一条只说明还有下一页
+                self.next_cursor = encode_cursor(last)
+                break
+            last = {"created_at": doc['created_at'], "_id": doc['_id']}
+            if self._prepare is not None:
+                self._prepare(doc)
+            yield doc
+            count += 1
+            doc = next(self._cursor, None)
+        self._cursor.close()
@@ -0,0 +1,135 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt as bcrypt_lib
+
+# 自动调整只会提高工作因子：下限为原来固定使用的 12，硬件较快时也不降低哈希强度
+DEFAULT_LOG_ROUNDS = 12
+MAX_LOG_ROUNDS = 16
+# 测量耗时使用的工作因子，较低以缩短启动时间
+CALIBRATION_LOG_ROUNDS = 10
+
+
+class PasswordHasherBusy(Exception):
+    """哈希任务排队已满或等待超时"""
+
+
+def _hash_password(password, rounds):
+    return bcrypt_lib.hashpw(password, bcrypt_lib.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _check_password(hashed, password):
+    return bcrypt_lib.checkpw(password, hashed)
+
+
+def hash_rounds(hashed):
+    """从 $2b$12$... 格式的哈希中读取工作因子，无法识别时返回 None"""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def tune_log_rounds(target_ms):
+    """估算单次哈希耗时不超过目标值的最大工作因子，不低于 DEFAULT_LOG_ROUNDS"""
+    start = time.perf_counter()
+    _hash_password(b'tune-password', CALIBRATION_LOG_ROUNDS)
+    elapsed_ms = max((time.perf_counter() - start) * 1000, 0.001)
+    # 工作因子每加一，耗时翻倍
+    rounds = CALIBRATION_LOG_ROUNDS + int(math.floor(math.log2(target_ms / elapsed_ms)))
+    return max(DEFAULT_LOG_ROUNDS, min(MAX_LOG_ROUNDS, rounds))
+
+
+class PasswordHasher:
+    """在独立进程池中计算 bcrypt 哈希，避免占用请求线程
+
+    排队中的任务数有上限，超过上限或等待超时时抛出 PasswordHasherBusy。
+    进程池大小为 0 时在当前线程中计算。
+    """
+
+    def __init__(self, app=None):
+        self.log_rounds = DEFAULT_LOG_ROUNDS
+        self.pool_size = 2
+        self.max_queue = 8
+        self.queue_timeout = 5.0
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.pool_size = app.config.get('BCRYPT_POOL_SIZE', 2)
+        self.max_queue = app.config.get('BCRYPT_QUEUE_SIZE', self.pool_size * 4)
+        self.queue_timeout = app.config.get('BCRYPT_QUEUE_TIMEOUT', 5.0)
+
+        log_rounds = app.config.get('BCRYPT_LOG_ROUNDS')
+        if not log_rounds:
+            log_rounds = tune_log_rounds(app.config.get('BCRYPT_TARGET_MS', 250))
+            app.config['BCRYPT_LOG_ROUNDS'] = log_rounds
+        self.log_rounds = log_rounds
+
+    def queue_depth(self):
+        """已提交但尚未完成的哈希任务数"""
+        return self._pending
+
+    def hash(self, password):
+        return self._run(_hash_password, password.encode('utf-8'), self.log_rounds)
+
+    def check(self, hashed, password):
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self._run(_check_password, hashed, password.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        rounds = hash_rounds(hashed)
+        return rounds is not None and rounds < self.log_rounds
+
+    def _run(self, func, *args):
+        if self.pool_size <= 0:
+            return func(*args)
+
+        executor, slots = self._get_executor()
+        if not slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy()
+
+        with self._lock:
+            self._pending += 1
+
+        def release(future=None):
+            with self._lock:
+                self._pending -= 1
+            slots.release()
+
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            release()
+            raise
+        # 等待超时后进程池仍在计算，计算完成时才归还名额，排队数的上限才有效
+        future.add_done_callback(release)
+        try:
+            return future.result(timeout=self.queue_timeout + 5)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy()
+
+    def _get_executor(self):
+        # 进程池不能跨 fork 使用，每个工作进程各自创建
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._slots = threading.BoundedSemaphore(self.pool_size + self.max_queue)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,216 @@
+import datetime
+import logging
+import math
+import threading
+import time
+
+from flask import g, jsonify, request, session
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app import mongo
+from app.cache import TTLCache
+from app.tracing import command_listener, metrics
+
+logger = logging.getLogger(__name__)
+
+# 默认限额：端点 -> (次数, 秒数)，同一IP和同一登录用户分别计数
+DEFAULT_LIMITS = {
+    'auth.login': (10, 60),
+    'auth.register': (5, 600),
+    'auth.publish_article': (20, 600),
+    'auth.save_article_draft': (30, 60),
+    'auth.patch_article_draft': (120, 60),
+    'auth.update_article': (30, 600),
+    'auth.post_comment': (10, 60),
+    'auth.like_article': (60, 60),
+}
+
+# 会加入后台任务的端点，任务积压时拒绝
+QUEUE_ENDPOINTS = ('auth.publish_article', 'auth.update_article')
+
+# MongoDB 后端并发更新同一个键时的最多重试次数
+MAX_CAS_ATTEMPTS = 5
+
+# 后台任务排队数的缓存时间（秒），避免每个请求都统计一次
+QUEUE_DEPTH_TTL = 5.0
+
+metrics.describe('rate_limited_requests_total', 'counter', '超出限额被拒绝的请求数')
+metrics.describe('shed_requests_total', 'counter', '系统繁忙时被拒绝的请求数')
+
+
+def parse_limits(spec):
+    """解析 RATE_LIMITS，格式为 端点=次数/秒数，多项用逗号分隔，例如 auth.login=10/60"""
+    limits = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        endpoint, _, value = item.partition('=')
+        count, _, period = value.partition('/')
+        limits[endpoint.strip()] = (int(count), float(period))
+    return limits
+
+
+class MemoryBackend:
+    """进程内计数，多进程部署时每个进程分别限额"""
+
+    def __init__(self, max_entries=100000):
+        self._tats = TTLCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+
+    def acquire(self, key, interval, period):
+        with self._lock:
+            now = time.time()
+            tat = self._tats.get(key, now)
+            new_tat = max(tat, now) + interval
+            if new_tat - now > period:
+                return False, new_tat - now - period
+            self._tats.set(key, new_tat, ttl=new_tat - now)
+            return True, 0.0
+
+
+class MongoBackend:
+    """保存在 MongoDB 中的计数，多个进程和主机共用，空闲的键由 TTL 索引清理"""
+
+    collection_name = 'rate_limits'
+
+    @property
+    def collection(self):
+        return mongo.db[self.collection_name]
+
+    def acquire(self, key, interval, period):
+        for _ in range(MAX_CAS_ATTEMPTS):
+            now = time.time()
+            doc = self.collection.find_one({"_id": key})
+            tat = doc['tat'] if doc else now
+            new_tat = max(tat, now) + interval
+            if new_tat - now > period:
+                return False, new_tat - now - period
+
+            fields = {"tat": new_tat, "expires_at": datetime.datetime.utcfromtimestamp(new_tat)}
+            if doc is None:
+                try:
+                    self.collection.insert_one({"_id": key, **fields})
+                    return True, 0.0
+                except DuplicateKeyError:
+                    continue
+            # 只在其他请求没有同时修改时写入，否则重新读取
+            if self.collection.update_one({"_id": key, "tat": tat}, {"$set": fields}).modified_count:
+                return True, 0.0
+        return False, interval
+
+
+class RateLimiter:
+    """写接口和登录注册的限流与过载保护
+
+    按端点配置限额，同一IP和同一登录用户分别使用令牌桶（以 GCRA 形式实现，每个键只
+    保存下一个令牌的理论到达时间）：允许连续发出“次数”个请求，之后按“秒数/次数”的
+    间隔补充。超出时返回 429 和 Retry-After。
+
+    受限的端点在系统繁忙时直接返回 503：本进程近期请求中 MongoDB 命令耗时的 p90、
+    后台任务排队数或本进程正在处理的受限请求数超过阈值时，不再接受新请求，
+    列表和详情等读页面不受影响。
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.limits = {}
+        self.max_inflight = 0
+        self.max_mongo_latency_ms = 0
+        self.max_queue_depth = 0
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._queue_depth = (0.0, 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryBackend()
+        elif backend == 'mongo':
+            self.backend = MongoBackend()
+        else:
+            self.backend = None
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(parse_limits(app.config.get('RATE_LIMITS')))
+        self.max_inflight = app.config.get('SHED_MAX_INFLIGHT', 0)
+        self.max_mongo_latency_ms = app.config.get('SHED_MONGO_LATENCY_MS', 0)
+        self.max_queue_depth = app.config.get('SHED_JOB_QUEUE_DEPTH', 0)
+
+        app.before_request(self.check_request)
+        app.teardown_request(self.release_request)
+        metrics.describe('rate_limit_inflight', 'gauge', '本进程正在处理的受限请求数')
+        metrics.gauge('rate_limit_inflight', lambda: self._inflight)
+
+    def _client_ip(self):
+        # 部署在反向代理之后时由 PROXY_FIX_X_FOR 启用的 ProxyFix 设置为真实客户端IP
+        return request.remote_addr or 'unknown'
+
+    def _job_queue_depth(self):
+        from app.jobs import job_queue
+        checked_at, depth = self._queue_depth
+        if time.monotonic() - checked_at > QUEUE_DEPTH_TTL:
+            depth = job_queue.depth()
+            self._queue_depth = (time.monotonic(), depth)
+        return depth
+
+    def _overloaded(self, endpoint):
+        """返回拒绝请求的原因，系统不繁忙时返回 None"""
+        if self.max_inflight and self._inflight >= self.max_inflight:
+            return 'inflight'
+        if self.max_mongo_latency_ms and command_listener.recent_latency_ms() > self.max_mongo_latency_ms:
+            return 'mongo_latency'
+        if self.max_queue_depth and endpoint in QUEUE_ENDPOINTS and self._job_queue_depth() > self.max_queue_depth:
+            return 'job_queue'
+        return None
+
+    def _keys(self, endpoint):
+        keys = [('ip', f'{endpoint}:ip:{self._client_ip()}')]
+        if 'user_id' in session:
+            keys.append(('user', f"{endpoint}:user:{session['user_id']}"))
+        return keys
+
+    def check_request(self):
+        endpoint = request.endpoint
+        limit = self.limits.get(endpoint)
+        if limit is None or request.method != 'POST':
+            return None
+
+        reason = self._overloaded(endpoint)
+        if reason is not None:
+            metrics.inc('shed_requests_total', endpoint=endpoint, reason=reason)
+            logger.warning("系统繁忙，拒绝请求", extra={"fields": {"endpoint": endpoint, "reason": reason}})
+            response = jsonify({"success": False, "message": "服务器繁忙，请稍后重试"})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+
+        if self.backend is not None:
+            count, period = limit
+            for scope, key in self._keys(endpoint):
+                try:
+                    allowed, retry_after = self.backend.acquire(key, period / count, period)
+                except PyMongoError:
+                    # 计数不可用时放行，不因限流失败影响正常使用
+                    logger.warning("限流计数失败", exc_info=True, extra={"fields": {"endpoint": endpoint}})
+                    continue
+                if not allowed:
+                    metrics.inc('rate_limited_requests_total', endpoint=endpoint, scope=scope)
+                    response = jsonify({"success": False, "message": "请求过于频繁，请稍后重试"})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+
+        with self._lock:
+            self._inflight += 1
+        g.rate_limit_inflight = True
+        return None
+
+    def release_request(self, exc):
+        if g.pop('rate_limit_inflight', False):
+            with self._lock:
+                self._inflight -= 1
+
+
+rate_limiter = RateLimiter()
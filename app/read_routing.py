@@ -0,0 +1,236 @@
+import functools
+import logging
+import time
+
+import click
+from bson import json_util
+from flask import current_app, g, has_request_context, request, session
+from flask.cli import AppGroup
+from pymongo.errors import PyMongoError
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+from app import mongo
+
+logger = logging.getLogger(__name__)
+
+# 启用读路由时的默认配置：端点 -> 读偏好，列表、详情、搜索和个人中心可以读从节点
+DEFAULT_ROUTES = (
+    'auth.articles',
+    'auth.articles_feed',
+    'auth.article_detail',
+    'auth.search_page',
+    'auth.search_api',
+    'auth.user_center',
+)
+
+# 作者在自己写入之后需要读到写入结果的页面：发布和更新后跳转到详情页
+READ_YOUR_WRITES_ENDPOINTS = ('auth.user_center', 'auth.article_detail')
+
+# MongoDB 允许的最小 maxStalenessSeconds
+MIN_MAX_STALENESS = 90
+
+# 写入标记的会话键：最后一次写入之后的集群时间和操作时间
+WRITE_MARKER_KEY = 'read_after'
+
+# 读偏好中可以带 maxStalenessSeconds 的模式
+STALENESS_MODES = ('primaryPreferred', 'secondary', 'secondaryPreferred', 'nearest')
+
+# 绑定会话后需要传入 session 参数的读方法
+SESSION_METHODS = ('find', 'find_one', 'aggregate', 'count_documents', 'distinct')
+
+
+def parse_routes(spec, default_mode, default_staleness):
+    """解析 READ_ROUTES，格式为 端点=读偏好[:maxStalenessSeconds]，多项用逗号分隔"""
+    routes = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        endpoint, _, value = item.partition('=')
+        mode, _, staleness = (value or default_mode).partition(':')
+        routes[endpoint.strip()] = (mode.strip(), int(staleness) if staleness else default_staleness)
+    return routes
+
+
+def build_read_preference(mode, max_staleness):
+    if mode == 'primary' or mode not in STALENESS_MODES:
+        max_staleness = -1
+    elif 0 < max_staleness < MIN_MAX_STALENESS:
+        raise ValueError(f'maxStalenessSeconds 不能小于 {MIN_MAX_STALENESS}: {max_staleness}')
+    return make_read_preference(read_pref_mode_from_name(mode), None, max_staleness=max_staleness or -1)
+
+
+class _SessionCollection:
+    """把读方法绑定到一个因果一致会话的集合"""
+
+    def __init__(self, collection, session):
+        self._collection = collection
+        self._session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in SESSION_METHODS:
+            return functools.partial(attr, session=self._session)
+        return attr
+
+
+class _SessionDatabase:
+    def __init__(self, db, session):
+        self._db = db
+        self._session = session
+
+    def __getitem__(self, name):
+        return _SessionCollection(self._db[name], self._session)
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+class ReadRouting:
+    """按端点选择读偏好，把读页面的查询分流到副本集从节点
+
+    READ_ROUTING 关闭（默认）时所有查询都使用 mongo.db。开启后 READ_ROUTES 中的端点
+    通过 read_db() 按配置的读偏好读取，maxStalenessSeconds 限制从节点的延迟；写入
+    始终使用 mongo.db。
+
+    登录用户写入成功后，会话中记录写入之后的集群时间。作者在 READ_YOUR_WRITES_SECONDS
+    内访问个人中心或文章详情页时，在一个因果一致的会话中以 majority 读关注读取，从节点会等到
+    复制了该写入再返回，保证读到自己刚写入的内容。
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.routes = {}
+        self.read_your_writes_seconds = 0
+        self._preferences = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('READ_ROUTING', False)
+        if not self.enabled:
+            return
+        mode = app.config.get('READ_PREFERENCE', 'secondaryPreferred')
+        staleness = app.config.get('READ_MAX_STALENESS_SECONDS', MIN_MAX_STALENESS)
+        self.routes = {endpoint: (mode, staleness) for endpoint in DEFAULT_ROUTES}
+        self.routes.update(parse_routes(app.config.get('READ_ROUTES'), mode, staleness))
+        # 先检查一遍配置，错误的读偏好在启动时报错
+        self._preferences = {
+            endpoint: build_read_preference(*route) for endpoint, route in self.routes.items()
+        }
+        self.read_your_writes_seconds = app.config.get('READ_YOUR_WRITES_SECONDS', staleness)
+
+        app.after_request(self.mark_writes)
+        app.teardown_request(self.end_session)
+
+    def _route_db(self, endpoint):
+        preference = self._preferences.get(endpoint)
+        if preference is None:
+            return mongo.db
+        return mongo.cx.get_database(mongo.db.name, read_preference=preference)
+
+    def _write_marker(self):
+        marker = session.get(WRITE_MARKER_KEY)
+        if not marker:
+            return None
+        marker = json_util.loads(marker)
+        if time.time() - marker['at'] > self.read_your_writes_seconds:
+            return None
+        return marker
+
+    def _lagging_db(self, endpoint):
+        preference = self._preferences.get(endpoint)
+        if preference is not None and preference.name != 'primary':
+            # 可能读自从节点，结果可能落后于最近的写入
+            g.read_may_lag = True
+        return self._route_db(endpoint)
+
+    def may_lag(self):
+        """当前请求是否读过可能落后于主节点的从节点"""
+        return has_request_context() and g.get('read_may_lag', False)
+
+    def db(self):
+        """当前请求用于读取的数据库"""
+        if not self.enabled or not has_request_context():
+            return mongo.db
+        endpoint = request.endpoint
+        if endpoint not in READ_YOUR_WRITES_ENDPOINTS or endpoint not in self._preferences:
+            return self._lagging_db(endpoint)
+
+        causal = g.get('read_session_db')
+        if causal is not None:
+            return causal
+        marker = self._write_marker()
+        if marker is None:
+            return self._lagging_db(endpoint)
+
+        read_session = mongo.cx.start_session(causal_consistency=True)
+        read_session.advance_cluster_time(marker['cluster_time'])
+        read_session.advance_operation_time(marker['operation_time'])
+        db = mongo.cx.get_database(
+            mongo.db.name,
+            read_preference=self._preferences[endpoint],
+            read_concern=ReadConcern('majority')
+        )
+        g.read_session = read_session
+        g.read_session_db = _SessionDatabase(db, read_session)
+        return g.read_session_db
+
+    def mark_writes(self, response):
+        """登录用户的写请求成功后，记录此时主节点的集群时间"""
+        if request.method != 'POST' or 'user_id' not in session or response.status_code >= 400:
+            return response
+        try:
+            with mongo.cx.start_session(causal_consistency=True) as write_session:
+                # 请求中的写入已被确认，此后主节点返回的操作时间不早于这些写入
+                mongo.db.command('ping', session=write_session)
+                if write_session.operation_time is None:
+                    return response
+                session[WRITE_MARKER_KEY] = json_util.dumps({
+                    "at": time.time(),
+                    "cluster_time": write_session.cluster_time,
+                    "operation_time": write_session.operation_time,
+                }, json_options=json_util.CANONICAL_JSON_OPTIONS)
+        except PyMongoError:
+            logger.warning("记录写入时间失败", exc_info=True)
+        return response
+
+    def end_session(self, exc):
+        read_session = g.pop('read_session', None)
+        g.pop('read_session_db', None)
+        if read_session is not None:
+            read_session.end_session()
+
+
+read_routing = ReadRouting()
+
+
+def read_db():
+    """当前请求用于读取的数据库，按端点配置的读偏好分流；写入请使用 mongo.db"""
+    return read_routing.db()
+
+
+reads_cli = AppGroup('reads', help='读路由命令')
+
+
+@reads_cli.command('check')
+def check_command():
+    """列出各端点的读偏好，并用每种读偏好执行一次查询，显示处理查询的节点"""
+    if not read_routing.enabled:
+        click.echo("READ_ROUTING 未开启，所有查询都读主节点")
+    for endpoint, (mode, staleness) in sorted(read_routing.routes.items()):
+        db = read_routing._route_db(endpoint)
+        cursor = db.articles.find({}, {"_id": 1}).limit(1)
+        try:
+            list(cursor)
+            address = cursor.address
+            served = f'{address[0]}:{address[1]}' if address else '-'
+        except PyMongoError as e:
+            served = f'失败: {e}'
+        click.echo(f"{endpoint}\t{mode}\tmaxStalenessSeconds={staleness}\t{served}")
+    # 客户端在第一次查询后才发现副本集成员
+    click.echo(f"副本集节点: {', '.join(f'{host}:{port}' for host, port in mongo.cx.nodes) or '未连接'}")
+    if current_app.config.get('READ_ROUTING') and read_routing.read_your_writes_seconds:
+        click.echo(f"写入后 {read_routing.read_your_writes_seconds} 秒内，"
+                   f"{', '.join(READ_YOUR_WRITES_ENDPOINTS)} 在因果一致会话中读取")
@@ -0,0 +1,300 @@
+import datetime
+import hashlib
+import random
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import AppGroup
+from pymongo import ReplaceOne, UpdateOne
+
+from app import mongo
+from app.derive import derive_article
+from app.jobs import job_queue
+from app.read_routing import read_db
+from app.search import tokenize
+
+# 每篇文章的 MinHash 签名和 LSH 分桶，用于查找候选相似文章
+SIGNATURES_COLLECTION = 'article_signatures'
+# 每篇文章预先计算好的相关文章列表，_id 为文章ID
+RECOMMENDATIONS_COLLECTION = 'recommendations'
+
+# 签名参数变化时递增，旧签名需要通过 recommend build 重新计算
+SIGNATURE_VERSION = 2
+
+# 64 个哈希函数分成 16 段，每段 4 行：相似度 0.5 的两篇文章约 64% 的概率至少共用一个桶，
+# 0.8 时接近 100%，0.2 时约 2.5%，0.1 时约 0.2%
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+# 每篇文章保存的相关文章数，以及参与打分的候选文章上限
+TOP_K = 5
+MAX_CANDIDATES = 200
+
+# 共同标签和同一分类的加分
+TAG_BONUS = 0.1
+CATEGORY_BONUS = 0.05
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240501)
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+# 推荐列表中冗余保存的字段，详情页侧栏直接使用
+ITEM_FIELDS = ("title", "category", "cover_image", "created_at")
+
+
+def features(title, tags, category, text):
+    """文章的特征集合：标题和正文的词项（中文为二元组）、标签和分类"""
+    found = set(tokenize(title or ''))
+    found.update(tokenize(text or ''))
+    found.update(f'tag:{tag}' for tag in tags or [])
+    if category:
+        found.add(f'category:{category}')
+    return found
+
+
+def minhash(feature_set):
+    hashes = [
+        int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for feature in feature_set
+    ]
+    if not hashes:
+        return [_PRIME] * NUM_HASHES
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _HASH_PARAMS]
+
+
+def lsh_buckets(signature):
+    return [
+        f'{band}:' + hashlib.blake2b(
+            repr(signature[band * ROWS:(band + 1) * ROWS]).encode('ascii'), digest_size=8
+        ).hexdigest()
+        for band in range(BANDS)
+    ]
+
+
+def _similarity(a, b):
+    """签名中相同位置取值相同的比例，是 Jaccard 相似度的估计"""
+    same = sum(1 for x, y in zip(a['sig'], b['sig']) if x == y)
+    score = same / NUM_HASHES
+    score += TAG_BONUS * len(set(a.get('tags') or []) & set(b.get('tags') or []))
+    if a.get('category') and a.get('category') == b.get('category'):
+        score += CATEGORY_BONUS
+    return score
+
+
+def signature_doc(article, text=None):
+    """计算文章的签名文档，text 为正文纯文本，未提供时从 content 解析"""
+    if text is None:
+        text = derive_article(article.get('content'))[1]
+    signature = minhash(features(article.get('title'), article.get('tags'), article.get('category'), text))
+    doc = {
+        "_id": article['_id'],
+        "sig": signature,
+        "buckets": lsh_buckets(signature),
+        "tags": article.get('tags') or [],
+        "version": SIGNATURE_VERSION,
+    }
+    doc.update({field: article.get(field) for field in ITEM_FIELDS})
+    return doc
+
+
+def _item(doc, score):
+    item = {"_id": doc['_id'], "score": round(score, 4)}
+    item.update({field: doc.get(field) for field in ITEM_FIELDS})
+    return item
+
+
+def _top_items(doc, candidates):
+    scored = sorted(
+        ((_similarity(doc, candidate), candidate) for candidate in candidates if candidate['_id'] != doc['_id']),
+        key=lambda pair: pair[0],
+        reverse=True
+    )
+    return [_item(candidate, score) for score, candidate in scored[:TOP_K]]
+
+
+def _candidates(doc):
+    """共用桶最多的候选文章，共用的桶越多相似度通常越高，超过上限时先保留这些"""
+    return list(mongo.db[SIGNATURES_COLLECTION].aggregate([
+        {"$match": {"buckets": {"$in": doc['buckets']}, "_id": {"$ne": doc['_id']}}},
+        {"$addFields": {"shared": {"$size": {"$setIntersection": ["$buckets", doc['buckets']]}}}},
+        {"$sort": {"shared": -1, "_id": -1}},
+        {"$limit": MAX_CANDIDATES},
+    ]))
+
+
+def _fill_from_category(doc, items, db=None):
+    """相似文章不足时用同分类的最新文章补足"""
+    if len(items) >= TOP_K or not doc.get('category'):
+        return items
+    seen = {item['_id'] for item in items} | {doc['_id']}
+    db = db if db is not None else mongo.db
+    for article in db.articles.find(
+        {"category": doc['category'], "_id": {"$ne": doc['_id']}},
+        {field: 1 for field in ITEM_FIELDS}
+    ).sort([("created_at", -1), ("_id", -1)]).limit(TOP_K + len(seen)):
+        if article['_id'] not in seen:
+            items.append(_item(article, 0))
+        if len(items) >= TOP_K:
+            break
+    return items
+
+
+def _recommendation(article_id, items):
+    return {"_id": article_id, "items": items, "built_at": datetime.datetime.now()}
+
+
+def update_recommendations(article, text=None):
+    """文章发布或更新后调用：重新计算该文章的相关文章，并把它合并进相似文章的列表
+
+    返回该文章的推荐文档。被合并的相似文章的详情页缓存到期后才会显示新列表。
+    """
+    doc = signature_doc(article, text)
+    mongo.db[SIGNATURES_COLLECTION].replace_one({"_id": doc['_id']}, doc, upsert=True)
+
+    candidates = _candidates(doc)
+    items = _fill_from_category(doc, _top_items(doc, candidates))
+    recommendation = _recommendation(doc['_id'], items)
+    mongo.db[RECOMMENDATIONS_COLLECTION].replace_one({"_id": doc['_id']}, recommendation, upsert=True)
+
+    # 标题、封面等可能变化，先更新其他文章列表中冗余保存的字段
+    # 同一列表中文章不会重复，用位置运算符 $ 更新匹配的那一项
+    mongo.db[RECOMMENDATIONS_COLLECTION].update_many(
+        {"items._id": doc['_id']},
+        {"$set": {f"items.$.{field}": doc.get(field) for field in ITEM_FIELDS}}
+    )
+
+    # 当前文章比候选文章现有列表中最不相似的一项更相似时，替换进去
+    scores = {candidate['_id']: _similarity(doc, candidate) for candidate in candidates}
+    requests = []
+    for existing in mongo.db[RECOMMENDATIONS_COLLECTION].find({"_id": {"$in": list(scores)}}):
+        others = [item for item in existing['items'] if item['_id'] != doc['_id']]
+        merged = sorted(others + [_item(doc, scores[existing['_id']])], key=lambda item: item['score'], reverse=True)
+        merged = merged[:TOP_K]
+        if merged != existing['items']:
+            requests.append(UpdateOne({"_id": existing['_id']}, {"$set": {"items": merged}}))
+    if requests:
+        mongo.db[RECOMMENDATIONS_COLLECTION].bulk_write(requests, ordered=False)
+
+    return recommendation
+
+
+def remove_recommendations(article_id):
+    """文章删除后调用：删除签名和推荐文档，并从其他文章的列表中移除"""
+    article_id = ObjectId(article_id)
+    mongo.db[SIGNATURES_COLLECTION].delete_one({"_id": article_id})
+    mongo.db[RECOMMENDATIONS_COLLECTION].delete_one({"_id": article_id})
+    mongo.db[RECOMMENDATIONS_COLLECTION].update_many(
+        {"items._id": article_id},
+        {"$pull": {"items": {"_id": article_id}}}
+    )
+
+
+@job_queue.handler('recommend.sync')
+def sync_recommendations(article_id):
+    """后台任务：按文章的当前内容更新相关文章，文章已删除时移除"""
+    article = mongo.db.articles.find_one(
+        {"_id": ObjectId(article_id)},
+        {field: 1 for field in ("title", "tags", "content") + ITEM_FIELDS}
+    )
+    if article is None:
+        remove_recommendations(article_id)
+        return
+    update_recommendations(article)
+
+
+def related_articles(article, limit=3):
+    """读取预先计算的相关文章
+
+    尚未计算（旧文章、后台任务还没执行或从节点还没复制）时只读取同分类的最新文章，
+    不在读页面的请求中计算签名和写入。queue 模式下加入后台任务由工作进程计算；
+    inline 模式下任务会在本进程中执行，留给 recommend build 补齐。
+    """
+    db = read_db()
+    recommendation = db[RECOMMENDATIONS_COLLECTION].find_one({"_id": article['_id']})
+    if recommendation is None:
+        items = _fill_from_category({"_id": article['_id'], "category": article.get('category')}, [], db)
+        recommendation = {"items": items}
+        if job_queue.mode == 'queue':
+            job_queue.enqueue('recommend.sync', {"article_id": str(article['_id'])},
+                              key=f"recommend.sync:{article['_id']}")
+    related = []
+    for item in recommendation['items'][:limit]:
+        item = dict(item)
+        item['_id'] = str(item['_id'])
+        related.append(item)
+    return related
+
+
+def build_signatures(batch_size=500, force=False):
+    """为缺少签名或签名版本过旧的文章计算签名，返回计算的篇数"""
+    existing = set() if force else {
+        doc['_id'] for doc in mongo.db[SIGNATURES_COLLECTION].find({"version": SIGNATURE_VERSION}, {"_id": 1})
+    }
+    computed = 0
+    requests = []
+    projection = {"title": 1, "tags": 1, "category": 1, "content": 1, "cover_image": 1, "created_at": 1}
+    for article in mongo.db.articles.find({}, projection).batch_size(batch_size):
+        if article['_id'] in existing:
+            continue
+        doc = signature_doc(article)
+        requests.append(ReplaceOne({"_id": doc['_id']}, doc, upsert=True))
+        computed += 1
+        if len(requests) >= batch_size:
+            mongo.db[SIGNATURES_COLLECTION].bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        mongo.db[SIGNATURES_COLLECTION].bulk_write(requests, ordered=False)
+    return computed
+
+
+def build_recommendations(batch_size=500):
+    """按 LSH 候选为每篇文章计算相关文章，每篇文章只与同桶的少量候选比较"""
+    built = 0
+    requests = []
+    for doc in mongo.db[SIGNATURES_COLLECTION].find({}).batch_size(batch_size):
+        items = _fill_from_category(doc, _top_items(doc, _candidates(doc)))
+        requests.append(ReplaceOne({"_id": doc['_id']}, _recommendation(doc['_id'], items), upsert=True))
+        built += 1
+        if len(requests) >= batch_size:
+            mongo.db[RECOMMENDATIONS_COLLECTION].bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        mongo.db[RECOMMENDATIONS_COLLECTION].bulk_write(requests, ordered=False)
+
+    _remove_orphans(batch_size)
+    return built
+
+
+def _remove_orphans(batch_size):
+    """清理已删除文章遗留的签名和推荐"""
+    for name in (SIGNATURES_COLLECTION, RECOMMENDATIONS_COLLECTION):
+        batch = []
+        for doc in mongo.db[name].find({}, {"_id": 1}).batch_size(batch_size):
+            batch.append(doc['_id'])
+            if len(batch) >= batch_size:
+                _delete_missing(name, batch)
+                batch = []
+        if batch:
+            _delete_missing(name, batch)
+
+
+def _delete_missing(name, ids):
+    found = {doc['_id'] for doc in mongo.db.articles.find({"_id": {"$in": ids}}, {"_id": 1})}
+    missing = [article_id for article_id in ids if article_id not in found]
+    if missing:
+        mongo.db[name].delete_many({"_id": {"$in": missing}})
+
+
+recommend_cli = AppGroup('recommend', help='相关文章推荐命令')
+
+
+@recommend_cli.command('build')
+@click.option('--batch-size', default=500, show_default=True, help='每批写入的文档数')
+@click.option('--force', is_flag=True, help='重新计算全部文章的签名')
+def build_command(batch_size, force):
+    """计算文章签名并重建全部相关文章列表"""
+    computed = build_signatures(batch_size, force)
+    click.echo(f"已计算 {computed} 篇文章的签名")
+    built = build_recommendations(batch_size)
+    click.echo(f"已生成 {built} 篇文章的相关文章")
@@ -0,0 +1,308 @@
+import datetime
+import math
+import re
+from collections import Counter, defaultdict
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import AppGroup
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app import mongo
+from app.derive import CJK_CHARS, derive_article
+from app.jobs import job_queue
+from app.read_routing import read_db
+
+# 倒排索引：每个 (词项, 文章) 一条 posting，w 为该词项在文章中的权重
+POSTINGS_COLLECTION = 'search_postings'
+# 词项的文档频率，_id 为词项
+TERMS_COLLECTION = 'search_terms'
+# 每篇已索引文章一份文档：已索引的词项和文章版本，_id 为文章ID
+DOCS_COLLECTION = 'search_docs'
+
+# 同一篇文章同时有多个索引任务时的最多重试次数
+MAX_CAS_ATTEMPTS = 5
+
+# 标题、标签、正文的权重
+FIELD_WEIGHTS = (('title', 3.0), ('tags', 2.0), ('text', 1.0))
+
+# BM25 词频饱和参数
+K1 = 1.2
+B = 0.75
+AVERAGE_LENGTH = 800
+
+# 每个查询词项最多读取的 posting 数，查询耗时与文章总数无关
+MAX_POSTINGS_PER_TERM = 2000
+MAX_QUERY_TERMS = 32
+MAX_RESULTS = 200
+
+TOKEN_RE = re.compile(f'([{CJK_CHARS}]+)|([A-Za-z0-9]+)')
+
+
+def tokenize(text):
+    """分词：中日韩文字按相邻两字切分，其他文字按单词小写"""
+    tokens = []
+    for cjk, word in TOKEN_RE.findall(text or ''):
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i+2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def term_weights(title, tags, text):
+    """计算文章中每个词项的权重"""
+    fields = {
+        'title': title or '',
+        'tags': ' '.join(tags or []),
+        'text': text or ''
+    }
+
+    weighted_tf = Counter()
+    length = 0
+    for field, weight in FIELD_WEIGHTS:
+        tokens = tokenize(fields[field])
+        length += len(tokens)
+        for token in tokens:
+            weighted_tf[token] += weight
+
+    norm = K1 * (1 - B + B * length / AVERAGE_LENGTH)
+    return {term: round(tf * (K1 + 1) / (tf + norm), 4) for term, tf in weighted_tf.items()}
+
+
+def article_version(article):
+    """文章内容的版本，每次更新文章都会修改 updated_at"""
+    return article.get('updated_at') or article.get('created_at') or datetime.datetime.min
+
+
+def _claim_version(article_id, version, terms):
+    """在 search_docs 上比较并交换，把已索引的版本改为 version
+
+    返回之前已索引的词项；已索引了相同或更新的版本时返回 None，不需要再写入。
+    """
+    docs = mongo.db[DOCS_COLLECTION]
+    for _ in range(MAX_CAS_ATTEMPTS):
+        current = docs.find_one({"_id": article_id})
+        if current is None:
+            try:
+                docs.insert_one({"_id": article_id, "version": version, "terms": terms})
+                return []
+            except DuplicateKeyError:
+                continue
+        if current['version'] >= version:
+            return None
+        result = docs.update_one(
+            {"_id": article_id, "version": current['version']},
+            {"$set": {"version": version, "terms": terms}}
+        )
+        if result.modified_count:
+            return current['terms']
+    return None
+
+
+def index_article(article_id, title, tags, text, version):
+    """为一篇文章建立或更新索引
+
+    同一篇文章的多个索引任务同时执行时（如多个后台线程或工作进程），先在
+    search_docs 上按文章版本比较并交换，只有把版本改为更新值的任务才调整文档频率，
+    每个词项只计一次；旧版本的任务直接跳过。posting 带有版本号，(article_id, term)
+    唯一，较旧的任务即使晚到也不会覆盖较新的 posting。
+    """
+    article_id = ObjectId(article_id)
+    weights = term_weights(title, tags, text)
+
+    old_terms = _claim_version(article_id, version, sorted(weights))
+    if old_terms is None:
+        return
+    old_terms = set(old_terms)
+
+    postings = mongo.db[POSTINGS_COLLECTION]
+    # 已有更新版本的 posting 时条件不匹配，插入与唯一索引冲突，保留较新的
+    _bulk_write_keep_newer(postings, [
+        UpdateOne(
+            {"article_id": article_id, "term": term, "v": {"$lt": version}},
+            {"$set": {"w": w, "v": version}},
+            upsert=True
+        )
+        for term, w in weights.items()
+    ])
+    postings.delete_many({"article_id": article_id, "v": {"$lt": version}})
+
+    _adjust_document_frequency(added=weights.keys() - old_terms, removed=old_terms - weights.keys())
+
+
+def remove_article(article_id):
+    article_id = ObjectId(article_id)
+    current = mongo.db[DOCS_COLLECTION].find_one_and_delete({"_id": article_id})
+    mongo.db[POSTINGS_COLLECTION].delete_many({"article_id": article_id})
+    # 只有删除了 search_docs 文档的任务调整文档频率
+    if current is not None:
+        _adjust_document_frequency(added=(), removed=current['terms'])
+
+
+@job_queue.handler('search.sync')
+def sync_article(article_id):
+    """后台任务：按文章的当前内容更新索引，文章已删除时移除"""
+    doc = mongo.db.articles.find_one(
+        {"_id": ObjectId(article_id)},
+        {"title": 1, "tags": 1, "content": 1, "updated_at": 1, "created_at": 1}
+    )
+    if doc is None:
+        remove_article(article_id)
+        return
+    index_article(
+        doc['_id'], doc.get('title'), doc.get('tags'), derive_article(doc.get('content'))[1],
+        article_version(doc)
+    )
+
+
+def _adjust_document_frequency(added, removed):
+    requests = [UpdateOne({"_id": term}, {"$inc": {"df": 1}}, upsert=True) for term in added]
+    requests.extend(UpdateOne({"_id": term}, {"$inc": {"df": -1}}) for term in removed)
+    if requests:
+        mongo.db[TERMS_COLLECTION].bulk_write(requests, ordered=False)
+
+
+def search_articles(query, limit=20, offset=0):
+    """按相关度返回 (文章ID列表, 结果总数)"""
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], 0
+
+    db = read_db()
+    total_docs = max(db.articles.estimated_document_count(), 1)
+    df = {doc['_id']: doc.get('df', 0) for doc in db[TERMS_COLLECTION].find({"_id": {"$in": terms}})}
+
+    scores = defaultdict(float)
+    matched = Counter()
+    for term in terms:
+        term_df = df.get(term, 0)
+        if term_df <= 0:
+            continue
+        idf = math.log(1 + (total_docs - term_df + 0.5) / (term_df + 0.5))
+        postings = db[POSTINGS_COLLECTION].find(
+            {"term": term}, {"article_id": 1, "w": 1, "_id": 0}
+        ).sort("w", -1).limit(MAX_POSTINGS_PER_TERM)
+        for posting in postings:
+            scores[posting['article_id']] += posting['w'] * idf
+            matched[posting['article_id']] += 1
+
+    # 命中查询词项越多的文章排名越靠前
+    ranked = sorted(
+        scores,
+        key=lambda article_id: scores[article_id] * matched[article_id] / len(terms),
+        reverse=True
+    )[:MAX_RESULTS]
+    return ranked[offset:offset + limit], len(ranked)
+
+
+def _bulk_write_keep_newer(collection, requests):
+    """批量写入，忽略因已有更新版本而条件不匹配、插入与唯一键冲突的写入"""
+    if not requests:
+        return
+    try:
+        collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+
+
+def _purge_deleted(seen):
+    """删除重建期间没有读到、且文章已不存在的 posting 和已索引版本"""
+    postings = mongo.db[POSTINGS_COLLECTION]
+    docs = mongo.db[DOCS_COLLECTION]
+    indexed = {doc['_id'] for doc in docs.find({}, {"_id": 1})}
+    indexed.update(doc['_id'] for doc in postings.aggregate([
+        {"$group": {"_id": "$article_id"}}
+    ], allowDiskUse=True))
+    for article_id in indexed - seen:
+        # 重建期间新发布的文章由它自己的索引任务写入，不能删除
+        if mongo.db.articles.count_documents({"_id": article_id}, limit=1):
+            continue
+        docs.delete_one({"_id": article_id})
+        postings.delete_many({"article_id": article_id})
+
+
+def _rebuild_batch(batch):
+    """覆盖一批文章的 posting 和已索引版本，batch 为 [(文章ID, 版本, 词项权重)]"""
+    postings = mongo.db[POSTINGS_COLLECTION]
+    docs = mongo.db[DOCS_COLLECTION]
+    requests = []
+    doc_requests = []
+    for article_id, version, weights in batch:
+        requests.extend(
+            UpdateOne(
+                {"article_id": article_id, "term": term, "v": {"$lte": version}},
+                {"$set": {"w": w, "v": version}},
+                upsert=True
+            )
+            for term, w in weights.items()
+        )
+        requests.append(DeleteMany(
+            {"article_id": article_id, "term": {"$nin": list(weights)}, "v": {"$lte": version}}
+        ))
+        doc_requests.append(UpdateOne(
+            {"_id": article_id, "version": {"$lte": version}},
+            {"$set": {"version": version, "terms": sorted(weights)}},
+            upsert=True
+        ))
+    _bulk_write_keep_newer(postings, requests)
+    _bulk_write_keep_newer(docs, doc_requests)
+
+    # 读取文章之后索引任务已写入更新的版本时，删除刚写入的旧版本 posting；
+    # 之后才写入的任务会自己删除旧版本
+    versions = {article_id: version for article_id, version, _ in batch}
+    for doc in docs.find({"_id": {"$in": list(versions)}}, {"version": 1}):
+        if doc['version'] > versions[doc['_id']]:
+            postings.delete_many({"article_id": doc['_id'], "v": {"$lt": doc['version']}})
+
+
+def rebuild_index(batch_size=200):
+    """重建全部文章的 posting、已索引版本和文档频率，返回已索引的文章数
+
+    按文章原地覆盖，不先清空，重建期间搜索照常可用。写入与 sync 使用相同的版本
+    条件：只覆盖相同或更旧版本的 posting 和 search_docs，重建期间索引任务写入的
+    更新版本保持不变。旧版本写入的不带版本号的 posting 先删除。
+    """
+    mongo.db[POSTINGS_COLLECTION].delete_many({"v": {"$exists": False}})
+
+    indexed = 0
+    seen = set()
+    batch = []
+    cursor = mongo.db.articles.find(
+        {}, {"title": 1, "tags": 1, "content": 1, "updated_at": 1, "created_at": 1}
+    ).batch_size(batch_size)
+    for doc in cursor:
+        text = derive_article(doc.get('content'))[1]
+        batch.append((doc['_id'], article_version(doc), term_weights(doc.get('title'), doc.get('tags'), text)))
+        seen.add(doc['_id'])
+        indexed += 1
+        if len(batch) >= batch_size:
+            _rebuild_batch(batch)
+            batch = []
+    if batch:
+        _rebuild_batch(batch)
+
+    _purge_deleted(seen)
+
+    # 从 posting 重新统计文档频率，$out 原子地替换词项集合
+    mongo.db[POSTINGS_COLLECTION].aggregate([
+        {"$group": {"_id": "$term", "df": {"$sum": 1}}},
+        {"$out": TERMS_COLLECTION}
+    ], allowDiskUse=True)
+    return indexed
+
+
+search_cli = AppGroup('search', help='全文搜索相关命令')
+
+
+@search_cli.command('rebuild')
+@click.option('--batch-size', default=200, show_default=True, help='每批处理的文章数')
+def rebuild_command(batch_size):
+    """重建全部文章的搜索索引"""
+    indexed = rebuild_index(batch_size)
+    click.echo(f"已索引 {indexed} 篇文章")
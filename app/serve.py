@@ -0,0 +1,84 @@
+"""生产环境入口
+
+    python -m app.serve [--bind 0.0.0.0:8000] [--workers 4] [--threads 8]
+
+使用 gunicorn 预先 fork 多个工作进程，每个进程内有多个线程。应用在每个
+工作进程 fork 之后创建，因此 MongoDB 客户端和连接池都属于各自的进程。
+
+- kill -HUP <主进程>：平滑重载，启动新工作进程后让旧进程处理完请求再退出
+- kill -TERM <主进程>：停止接收新连接，等待处理中的请求完成后退出
+- 工作进程处理 WEB_MAX_REQUESTS 个请求后自动重启
+"""
+import argparse
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+def default_options():
+    workers = multiprocessing.cpu_count() * 2 + 1
+    return {
+        "bind": os.getenv("WEB_BIND", "127.0.0.1:8000"),
+        "workers": int(os.getenv("WEB_WORKERS", str(workers))),
+        "threads": int(os.getenv("WEB_THREADS", "4")),
+        "worker_class": "gthread",
+        "max_requests": int(os.getenv("WEB_MAX_REQUESTS", "1000")),
+        "max_requests_jitter": int(os.getenv("WEB_MAX_REQUESTS_JITTER", "100")),
+        "timeout": int(os.getenv("WEB_TIMEOUT", "60")),
+        "graceful_timeout": int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30")),
+        "keepalive": int(os.getenv("WEB_KEEPALIVE", "5")),
+        # 不在主进程中加载应用，保证 MongoDB 客户端在 fork 之后创建
+        "preload_app": False,
+        "accesslog": os.getenv("WEB_ACCESS_LOG", "-"),
+        "worker_exit": worker_exit,
+    }
+
+
+def worker_exit(server, worker):
+    # 工作进程退出前写入缓冲中的浏览量
+    from app.view_counter import view_counter
+    if view_counter.app is not None:
+        view_counter.shutdown()
+
+
+class WorldGuideApplication(BaseApplication):
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from app import create_app
+        return create_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='世界指南生产环境服务')
+    parser.add_argument('--bind', help='监听地址，默认取 WEB_BIND')
+    parser.add_argument('--workers', type=int, help='工作进程数，默认取 WEB_WORKERS')
+    parser.add_argument('--threads', type=int, help='每个工作进程的线程数，默认取 WEB_THREADS')
+    parser.add_argument('--max-requests', type=int, help='工作进程处理多少请求后重启，默认取 WEB_MAX_REQUESTS')
+    args = parser.parse_args(argv)
+
+    options = default_options()
+    for key in ('bind', 'workers', 'threads', 'max_requests'):
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+
+    # 只监听本机地址时前面一定有反向代理，默认信任一层 X-Forwarded-For，
+    # 否则所有匿名请求的IP都是代理地址，登录和注册的限额会变成全站共用
+    host = options['bind'].rsplit(':', 1)[0]
+    if host in ('127.0.0.1', 'localhost', '[::1]') or host.startswith('unix'):
+        os.environ.setdefault('PROXY_FIX_X_FOR', '1')
+
+    WorldGuideApplication(options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 创建星星背景
+    createStars();
+
+    // 处理文章内容中的标题，为目录添加锚点
+    processArticleHeadings();
+
+    // 设置目录高亮功能
+    setupTOCHighlight();
+
+    // 页面可能来自缓存，浏览量单独获取
+    refreshLiveStats();
+
+    // 评论单独分页加载
+    setupComments();
+
+    // 点赞按钮
+    setupLikeButton();
+});
+
+// 更新页面上的实时计数
+function updateLiveStats(stats) {
+    document.querySelectorAll('[data-live]').forEach(el => {
+        const value = stats[el.dataset.live];
+        if (value !== undefined) {
+            el.textContent = value;
+        }
+    });
+}
+
+// 获取最新的浏览量等计数
+function refreshLiveStats() {
+    fetch(document.body.dataset.statsUrl, {
+        credentials: 'same-origin'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) return;
+
+        updateLiveStats(data.stats);
+        setLiked(data.stats.liked === true);
+    })
+    .catch(error => console.error('获取浏览量失败:', error));
+}
+
+// 点赞按钮状态
+function setLiked(liked) {
+    const button = document.getElementById('like-button');
+    if (!button) return;
+
+    button.classList.toggle('liked', liked);
+    button.querySelector('.like-label').textContent = liked ? '已点赞' : '点赞';
+}
+
+// 点赞或取消点赞
+function setupLikeButton() {
+    const button = document.getElementById('like-button');
+    if (!button) return;
+
+    button.addEventListener('click', function() {
+        if (document.body.dataset.loggedIn !== 'true') {
+            alert('请先登录');
+            return;
+        }
+
+        button.disabled = true;
+        fetch(document.body.dataset.likeUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            credentials: 'same-origin',
+            body: JSON.stringify({ liked: !button.classList.contains('liked') })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert(data.message || '点赞失败');
+                return;
+            }
+            setLiked(data.liked);
+            updateLiveStats({ likes: data.likes });
+        })
+        .catch(error => console.error('点赞失败:', error))
+        .finally(() => {
+            button.disabled = false;
+        });
+    });
+}
+
+// 生成一条评论的元素，内容按文本显示
+function renderComment(comment) {
+    const item = document.createElement('li');
+    item.className = 'comment-item';
+
+    const meta = document.createElement('div');
+    meta.className = 'comment-meta';
+    const author = document.createElement('span');
+    author.className = 'comment-author';
+    author.textContent = comment.author_name;
+    const time = document.createElement('span');
+    time.className = 'comment-time';
+    time.textContent = comment.created_at;
+    meta.appendChild(author);
+    meta.appendChild(time);
+
+    const content = document.createElement('p');
+    content.className = 'comment-content';
+    content.textContent = comment.content;
+
+    item.appendChild(meta);
+    item.appendChild(content);
+    return item;
+}
+
+// 按游标分页加载评论，发表评论后插入到列表顶部
+function setupComments() {
+    const list = document.getElementById('comment-list');
+    const loadMore = document.getElementById('load-more-comments');
+    if (!list) return;
+
+    const commentsUrl = document.body.dataset.commentsUrl;
+    let nextCursor = null;
+
+    function loadComments() {
+        const url = nextCursor ? `${commentsUrl}?after=${encodeURIComponent(nextCursor)}` : commentsUrl;
+        loadMore.disabled = true;
+        fetch(url, { credentials: 'same-origin' })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+
+            data.comments.forEach(comment => list.appendChild(renderComment(comment)));
+            nextCursor = data.next_cursor;
+            loadMore.hidden = !nextCursor;
+        })
+        .catch(error => console.error('加载评论失败:', error))
+        .finally(() => {
+            loadMore.disabled = false;
+        });
+    }
+
+    loadMore.addEventListener('click', loadComments);
+    loadComments();
+
+    const form = document.getElementById('comment-form');
+    if (!form) return;
+
+    form.addEventListener('submit', function(e) {
+        e.preventDefault();
+
+        const textarea = form.querySelector('textarea');
+        const content = textarea.value.trim();
+        if (!content) return;
+
+        const submit = form.querySelector('input[type="submit"]');
+        submit.disabled = true;
+        fetch(commentsUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            credentials: 'same-origin',
+            body: JSON.stringify({ content: content })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert(data.message || '发表评论失败');
+                return;
+            }
+            textarea.value = '';
+            list.insertBefore(renderComment(data.comment), list.firstChild);
+            refreshLiveStats();
+        })
+        .catch(error => console.error('发表评论失败:', error))
+        .finally(() => {
+            submit.disabled = false;
+        });
+    });
+}
+
+// 创建星星背景
+function createStars() {
+    const stars = document.querySelector('.stars');
+    if (!stars) return;
+
+    const starsCount = 200;
+
+    for (let i = 0; i < starsCount; i++) {
+        const star = document.createElement('div');
+        star.classList.add('star');
+
+        // 随机大小
+        const size = Math.random() * 2;
+        star.style.width = `${size}px`;
+        star.style.height = `${size}px`;
+
+        // 随机位置
+        star.style.left = `${Math.random() * 100}%`;
+        star.style.top = `${Math.random() * 100}%`;
+
+        // 随机动画延迟
+        star.style.animationDelay = `${Math.random() * 5}s`;
+
+        // 随机动画持续时间
+        star.style.animationDuration = `${Math.random() * 3 + 2}s`;
+
+        stars.appendChild(star);
+    }
+}
+
+// 处理文章内容中的标题，为目录添加锚点
+function processArticleHeadings() {
+    const articleContent = document.querySelector('.article-content');
+    if (!articleContent) return;
+
+    const headings = articleContent.querySelectorAll('h1, h2, h3, h4, h5, h6');
+    const tocLinks = document.querySelectorAll('#table-of-contents a');
+
+    if (headings.length === 0 || tocLinks.length === 0) return;
+
+    // 为每个标题添加ID和锚点
+    headings.forEach((heading, index) => {
+        heading.id = `heading-${index + 1}`;
+    });
+}
+
+// 设置目录高亮功能
+function setupTOCHighlight() {
+    const headings = document.querySelectorAll('.article-content h1, .article-content h2, .article-content h3, .article-content h4, .article-content h5, .article-content h6');
+    const tocLinks = document.querySelectorAll('#table-of-contents a');
+
+    if (headings.length === 0 || tocLinks.length === 0) return;
+
+    const observerOptions = {
+        root: null,
+        rootMargin: '0px',
+        threshold: 0.5
+    };
+
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                const id = entry.target.getAttribute('id');
+                tocLinks.forEach(link => {
+                    link.classList.remove('active');
+                    if (link.getAttribute('href') === `#${id}`) {
+                        link.classList.add('active');
+                    }
+                });
+            }
+        });
+    }, observerOptions);
+
+    headings.forEach(heading => observer.observe(heading));
+}
@@ -0,0 +1,213 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 创建星星背景
+    createStars();
+
+    // 确保文章卡片可点击
+    setupArticleLinks();
+
+    // 滚动到底部时自动加载下一页
+    setupInfiniteScroll();
+});
+
+// 无限滚动加载
+function setupInfiniteScroll() {
+    const loadMore = document.getElementById('load-more');
+    if (!loadMore || !('IntersectionObserver' in window)) return;
+
+    const grid = document.querySelector('.articles-grid');
+    let loading = false;
+
+    const observer = new IntersectionObserver(entries => {
+        if (!entries[0].isIntersecting || loading) return;
+
+        const cursor = loadMore.dataset.nextCursor;
+        if (!cursor) return;
+
+        // 列表API使用与当前页面相同的分类和标签筛选
+        const feedUrl = new URL(loadMore.dataset.feedUrl || '/auth/api/articles', window.location.href);
+        feedUrl.searchParams.set('after', cursor);
+
+        loading = true;
+        fetch(feedUrl, {
+            credentials: 'same-origin'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+
+            data.articles.forEach(article => grid.appendChild(createArticleCard(article)));
+
+            if (data.next_cursor) {
+                loadMore.dataset.nextCursor = data.next_cursor;
+                const pageUrl = new URL(window.location.href);
+                pageUrl.searchParams.set('after', data.next_cursor);
+                loadMore.querySelector('a').href = pageUrl.search;
+            } else {
+                observer.disconnect();
+                loadMore.remove();
+            }
+        })
+        .catch(error => console.error('加载文章失败:', error))
+        .finally(() => { loading = false; });
+    }, { rootMargin: '400px' });
+
+    observer.observe(loadMore);
+}
+
+// 缩略图在卡片中的显示宽度
+const THUMB_SIZES = '(max-width: 480px) 100vw, 400px';
+
+// 图片加载失败时改用默认图片；缩略图需要先去掉 <source>，否则浏览器仍使用其中的地址
+function useDefaultImage(img) {
+    img.classList.add('error');
+    if (img.parentNode && img.parentNode.tagName === 'PICTURE') {
+        img.parentNode.querySelectorAll('source').forEach(source => source.remove());
+    }
+    img.removeAttribute('srcset');
+    img.src = document.body.dataset.defaultImage;
+}
+
+// 根据API数据创建文章卡片
+function createArticleCard(article) {
+    const card = document.createElement('a');
+    card.href = article.url;
+    card.className = 'article-card';
+    card.style.textDecoration = 'none';
+
+    const imageBox = document.createElement('div');
+    imageBox.className = 'article-image';
+    const img = document.createElement('img');
+    img.alt = article.title;
+    img.style.opacity = '1';
+    img.onerror = function() {
+        this.onerror = null;
+        useDefaultImage(this);
+    };
+    if (article.cover_thumb) {
+        // 优先使用WebP缩略图，按屏幕密度选择尺寸
+        const picture = document.createElement('picture');
+        const source = document.createElement('source');
+        source.type = 'image/webp';
+        source.srcset = article.cover_thumb.webp_srcset;
+        source.sizes = THUMB_SIZES;
+        img.src = article.cover_thumb.src;
+        img.srcset = article.cover_thumb.srcset;
+        img.sizes = THUMB_SIZES;
+        img.loading = 'lazy';
+        picture.appendChild(source);
+        picture.appendChild(img);
+        imageBox.appendChild(picture);
+    } else {
+        img.src = article.cover_image || document.body.dataset.defaultImage;
+        imageBox.appendChild(img);
+    }
+
+    const content = document.createElement('div');
+    content.className = 'article-content';
+    if (article.category) {
+        const category = document.createElement('span');
+        category.className = 'article-category';
+        category.textContent = article.category;
+        content.appendChild(category);
+    }
+    const title = document.createElement('h3');
+    title.className = 'article-title';
+    title.textContent = article.title;
+    const excerpt = document.createElement('p');
+    excerpt.className = 'article-excerpt';
+    excerpt.textContent = article.excerpt || '';
+    const meta = document.createElement('div');
+    meta.className = 'article-meta';
+    const author = document.createElement('span');
+    author.className = 'author';
+    author.textContent = article.author_name || '匿名用户';
+    const date = document.createElement('span');
+    date.className = 'date';
+    date.textContent = article.created_at || 'N/A';
+    meta.append(author, date);
+    content.append(title, excerpt, meta);
+
+    card.append(imageBox, content);
+    return card;
+}
+
+// 创建星星背景
+function createStars() {
+    const stars = document.querySelector('.stars');
+    const starsCount = 200;
+
+    for (let i = 0; i < starsCount; i++) {
+        const star = document.createElement('div');
+        star.classList.add('star');
+
+        // 随机大小
+        const size = Math.random() * 2;
+        star.style.width = `${size}px`;
+        star.style.height = `${size}px`;
+
+        // 随机位置
+        star.style.left = `${Math.random() * 100}%`;
+        star.style.top = `${Math.random() * 100}%`;
+
+        // 随机动画延迟
+        star.style.animationDelay = `${Math.random() * 5}s`;
+
+        // 随机动画持续时间
+        star.style.animationDuration = `${Math.random() * 3 + 2}s`;
+
+        stars.appendChild(star);
+    }
+}
+
+// 确保文章卡片可点击
+function setupArticleLinks() {
+    // 获取所有文章卡片
+    const articleCards = document.querySelectorAll('.article-card');
+
+    // 为每个卡片添加点击事件
+    articleCards.forEach(card => {
+        card.addEventListener('click', function(e) {
+            // 阻止默认事件
+            e.preventDefault();
+
+            // 获取链接地址
+            const href = this.getAttribute('href');
+
+            // 如果有链接地址，则进行跳转
+            if (href) {
+                console.log('点击文章，跳转到:', href);
+                window.location.href = href;
+            }
+        });
+    });
+
+    // 处理图片加载
+    setupImageLoading();
+}
+
+// 设置图片加载处理
+function setupImageLoading() {
+    const images = document.querySelectorAll('.article-image img');
+
+    images.forEach(img => {
+        // 图片加载成功时的处理
+        img.addEventListener('load', function() {
+            this.style.opacity = '1';
+        });
+
+        // 图片加载失败时的处理
+        img.addEventListener('error', function() {
+            console.log('图片加载失败，使用默认图片:', this.src);
+            if (this.classList.contains('error')) {
+                return;
+            }
+            useDefaultImage(this);
+            this.style.opacity = '1';
+        });
+
+        // 如果图片已经加载完成（缓存情况）
+        if (img.complete) {
+            img.style.opacity = '1';
+        }
+    });
+}
@@ -0,0 +1,256 @@
+// 文章数据由页面中的 article-data 提供
+const articleData = JSON.parse(document.getElementById('article-data').textContent);
+
+document.addEventListener('DOMContentLoaded', function() {
+    // 创建星星背景
+    createStars();
+
+    // 初始化编辑器
+    const quill = new Quill('#editor', {
+        theme: 'snow',
+        modules: {
+            toolbar: [
+                [{ 'header': [1, 2, 3, 4, 5, 6, false] }],
+                ['bold', 'italic', 'underline', 'strike'],
+                [{ 'color': [] }, { 'background': [] }],
+                [{ 'list': 'ordered' }, { 'list': 'bullet' }],
+                [{ 'align': [] }],
+                ['blockquote', 'code-block'],
+                ['link', 'image'],
+                ['clean']
+            ]
+        },
+        placeholder: '开始撰写你的文章...'
+    });
+
+    // 设置编辑器内容
+    quill.root.innerHTML = articleData.content;
+
+    // 标签处理
+    const tagsContainer = document.getElementById('tagsContainer');
+    const tagInput = document.getElementById('tagInput');
+    const tagsHidden = document.getElementById('tags');
+
+    // 确保标签容器可以获取焦点
+    tagsContainer.addEventListener('click', function() {
+        tagInput.focus();
+    });
+
+    // 添加标签
+    tagInput.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter' || e.key === ',') {
+            e.preventDefault();
+            const value = this.value.trim();
+            if (value) {
+                addTag(value);
+                this.value = '';
+                updateTagsHidden();
+            }
+        }
+    });
+
+    // 失去焦点时添加标签
+    tagInput.addEventListener('blur', function() {
+        const value = this.value.trim();
+        if (value) {
+            addTag(value);
+            this.value = '';
+            updateTagsHidden();
+        }
+    });
+
+    // 保存文章按钮
+    document.getElementById('updateBtn').addEventListener('click', function() {
+        const title = document.getElementById('title').value;
+        const content = quill.root.innerHTML;
+        const category = document.getElementById('category').value;
+        const tags = document.getElementById('tags').value;
+        const coverImage = document.getElementById('cover_image').value;
+
+        // 验证表单
+        if (!title) {
+            showNotification('请输入文章标题', 'error');
+            return;
+        }
+
+        if (!content || content === '<p><br></p>') {
+            showNotification('请输入文章内容', 'error');
+            return;
+        }
+
+        if (!category) {
+            showNotification('请选择文章分类', 'error');
+            return;
+        }
+
+        // 收集表单数据
+        const formData = {
+            title: title,
+            content: content,
+            category: category,
+            tags: tags ? tags.split(',') : [],
+            cover_image: coverImage
+        };
+
+        // 发送到服务器
+        fetch(`/auth/api/article/update/${articleData._id}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(formData),
+            credentials: 'same-origin'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showNotification('文章更新成功', 'success');
+                setTimeout(() => {
+                    window.location.href = data.redirect_url || `/auth/article/${articleData._id}`;
+                }, 1500);
+            } else {
+                showNotification(data.message || '更新失败', 'error');
+            }
+        })
+        .catch(error => {
+            console.error('更新文章错误:', error);
+            showNotification('更新文章失败，请稍后重试', 'error');
+        });
+    });
+
+    // 初始化代码高亮
+    document.querySelectorAll('pre code').forEach(block => {
+        hljs.highlightElement(block);
+    });
+
+    // 监听代码块变化，保持高亮
+    quill.on('text-change', function() {
+        setTimeout(() => {
+            document.querySelectorAll('pre code').forEach(block => {
+                if (!block.classList.contains('hljs')) {
+                    hljs.highlightElement(block);
+                }
+            });
+        }, 100);
+    });
+});
+
+// 创建星星背景
+function createStars() {
+    const stars = document.querySelector('.stars');
+    const starsCount = 200;
+
+    for (let i = 0; i < starsCount; i++) {
+        const star = document.createElement('div');
+        star.classList.add('star');
+
+        // 随机大小
+        const size = Math.random() * 2;
+        star.style.width = `${size}px`;
+        star.style.height = `${size}px`;
+
+        // 随机位置
+        star.style.left = `${Math.random() * 100}%`;
+        star.style.top = `${Math.random() * 100}%`;
+
+        // 随机动画延迟
+        star.style.animationDelay = `${Math.random() * 5}s`;
+
+        // 随机动画持续时间
+        star.style.animationDuration = `${Math.random() * 3 + 2}s`;
+
+        stars.appendChild(star);
+    }
+}
+
+// 添加标签函数
+function addTag(value) {
+    // 检查标签是否已存在
+    const tagsContainer = document.getElementById('tagsContainer');
+    const tagInput = document.getElementById('tagInput');
+    const existingTags = Array.from(tagsContainer.querySelectorAll('.tag span'))
+        .map(span => span.textContent.toLowerCase());
+
+    if (!existingTags.includes(value.toLowerCase())) {
+        const tag = document.createElement('div');
+        tag.className = 'tag';
+        tag.innerHTML = `<span>${value}</span><div class="tag-remove" onclick="removeTag(this)">×</div>`;
+        tagsContainer.insertBefore(tag, tagInput);
+    }
+}
+
+// 移除标签函数
+function removeTag(element) {
+    const tag = element.parentElement;
+    tag.remove();
+    updateTagsHidden();
+}
+
+// 更新隐藏标签字段
+function updateTagsHidden() {
+    const tagsContainer = document.getElementById('tagsContainer');
+    const tagsHidden = document.getElementById('tags');
+    const tags = Array.from(tagsContainer.querySelectorAll('.tag span'))
+        .map(span => span.textContent);
+    tagsHidden.value = tags.join(',');
+}
+
+// 图片上传预览
+document.getElementById('coverImage').addEventListener('change', function(e) {
+    const file = e.target.files[0];
+    if (file) {
+        // 验证文件类型
+        if (!file.type.match('image.*')) {
+            showNotification('请选择图片文件', 'error');
+            return;
+        }
+
+        // 预览图片
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            const previewContainer = document.getElementById('previewContainer');
+
+            // 检查是否已有预览图，如果有则更新，没有则创建
+            let preview = document.getElementById('coverImagePreview');
+            if (!preview) {
+                preview = document.createElement('img');
+                preview.id = 'coverImagePreview';
+                preview.alt = '封面预览';
+                previewContainer.innerHTML = '';
+                previewContainer.appendChild(preview);
+            }
+
+            preview.src = e.target.result;
+            document.getElementById('cover_image').value = e.target.result;
+        };
+        reader.readAsDataURL(file);
+    }
+});
+
+// 取消按钮
+document.getElementById('cancelBtn').addEventListener('click', function() {
+    if (confirm('确定要取消编辑吗？所有未保存的更改将丢失。')) {
+        window.location.href = articleData.user_center_url;
+    }
+});
+
+// 预览按钮
+document.getElementById('previewBtn').addEventListener('click', function() {
+    // 可以在这里实现预览功能，例如打开一个模态框显示渲染后的文章
+    showNotification('预览功能暂未实现', 'error');
+});
+
+// 显示通知
+function showNotification(message, type) {
+    const notification = document.getElementById('notification');
+    const notificationText = document.getElementById('notification-text');
+
+    notificationText.textContent = message;
+    notification.className = 'notification ' + type;
+    notification.classList.add('show');
+
+    // 自动隐藏
+    setTimeout(() => {
+        notification.classList.remove('show');
+    }, 3000);
+}
@@ -0,0 +1,161 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 创建星星背景
+    createStars();
+
+    // 标签切换
+    const tabs = document.querySelectorAll('.tab');
+    const tabContents = document.querySelectorAll('.tab-content');
+
+    tabs.forEach(tab => {
+        tab.addEventListener('click', function() {
+            const tabId = this.getAttribute('data-tab');
+
+            // 移除所有激活状态
+            tabs.forEach(t => t.classList.remove('active'));
+            tabContents.forEach(c => c.classList.remove('active'));
+
+            // 激活当前标签和内容
+            this.classList.add('active');
+            document.getElementById(tabId).classList.add('active');
+        });
+    });
+});
+
+// 创建星星背景
+function createStars() {
+    const stars = document.querySelector('.stars');
+    const starsCount = 200;
+
+    for (let i = 0; i < starsCount; i++) {
+        const star = document.createElement('div');
+        star.classList.add('star');
+
+        // 随机大小
+        const size = Math.random() * 2;
+        star.style.width = `${size}px`;
+        star.style.height = `${size}px`;
+
+        // 随机位置
+        star.style.left = `${Math.random() * 100}%`;
+        star.style.top = `${Math.random() * 100}%`;
+
+        // 随机动画延迟
+        star.style.animationDelay = `${Math.random() * 5}s`;
+
+        // 随机动画持续时间
+        star.style.animationDuration = `${Math.random() * 3 + 2}s`;
+
+        stars.appendChild(star);
+    }
+}
+
+// 删除文章确认
+function confirmDelete(articleId, articleTitle) {
+    const modal = document.getElementById('deleteModal');
+    const deleteArticleTitle = document.getElementById('deleteArticleTitle');
+    const confirmDeleteBtn = document.getElementById('confirmDeleteBtn');
+
+    deleteArticleTitle.textContent = articleTitle;
+    modal.classList.add('active');
+
+    // 设置确认按钮的点击事件
+    confirmDeleteBtn.onclick = function() {
+        deleteArticle(articleId);
+    };
+}
+
+// 删除草稿确认
+function confirmDeleteDraft(draftId, draftTitle) {
+    const modal = document.getElementById('deleteModal');
+    const deleteArticleTitle = document.getElementById('deleteArticleTitle');
+    const confirmDeleteBtn = document.getElementById('confirmDeleteBtn');
+
+    deleteArticleTitle.textContent = draftTitle;
+    modal.classList.add('active');
+
+    // 设置确认按钮的点击事件
+    confirmDeleteBtn.onclick = function() {
+        deleteDraft(draftId);
+    };
+}
+
+// 关闭对话框
+function closeModal() {
+    const modal = document.getElementById('deleteModal');
+    modal.classList.remove('active');
+}
+
+// 删除文章
+function deleteArticle(articleId) {
+    fetch(`/auth/api/article/delete/${articleId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        credentials: 'same-origin'
+    })
+    .then(response => response.json())
+    .then(data => {
+        closeModal();
+
+        if (data.success) {
+            showNotification('文章已成功删除', 'success');
+            // 延迟后刷新页面
+            setTimeout(() => {
+                window.location.reload();
+            }, 1500);
+        } else {
+            showNotification(data.message || '删除失败', 'error');
+        }
+    })
+    .catch(error => {
+        closeModal();
+        console.error('删除文章错误:', error);
+        showNotification('删除文章失败，请稍后重试', 'error');
+    });
+}
+
+// 删除草稿
+function deleteDraft(draftId) {
+    fetch(`/auth/api/draft/delete/${draftId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        credentials: 'same-origin'
+    })
+    .then(response => response.json())
+    .then(data => {
+        closeModal();
+
+        if (data.success) {
+            showNotification('草稿已成功删除', 'success');
+            // 延迟后刷新页面
+            setTimeout(() => {
+                window.location.reload();
+            }, 1500);
+        } else {
+            showNotification(data.message || '删除失败', 'error');
+        }
+    })
+    .catch(error => {
+        closeModal();
+        console.error('删除草稿错误:', error);
+        showNotification('删除草稿失败，请稍后重试', 'error');
+    });
+}
+
+// 显示通知
+function showNotification(message, type) {
+    const notification = document.getElementById('notification');
+    const notificationText = document.getElementById('notification-text');
+
+    notificationText.textContent = message;
+    notification.className = 'notification ' + type;
+    notification.classList.add('show');
+
+    // 自动隐藏
+    setTimeout(() => {
+        notification.classList.remove('show');
+    }, 3000);
+}
@@ -0,0 +1,107 @@
+import datetime
+
+import click
+from flask.cli import AppGroup
+from pymongo import ReplaceOne, UpdateOne
+
+from app import mongo
+from app.read_routing import read_db
+
+# 每位作者一份统计文档，_id 为作者ID
+STATS_COLLECTION = 'author_stats'
+
+STAT_FIELDS = ('article_count', 'total_views', 'total_likes')
+
+
+def increment_author_stats(author_id, articles=0, views=0, likes=0):
+    """原子地调整作者统计
+
+    统计文档不存在时不创建，读取时会通过聚合生成完整的初始值。
+    """
+    changes = {}
+    if articles:
+        changes['article_count'] = articles
+    if views:
+        changes['total_views'] = views
+    if likes:
+        changes['total_likes'] = likes
+    if author_id and changes:
+        mongo.db[STATS_COLLECTION].update_one({"_id": author_id}, {"$inc": changes})
+
+
+def increment_author_views(views_by_author):
+    """批量增加多位作者的总浏览量
+
+    按 views_by_author 的顺序有序写入，出错时抛出 BulkWriteError，出错位置之前的已写入。
+    """
+    requests = [
+        UpdateOne({"_id": author_id}, {"$inc": {"total_views": count}})
+        for author_id, count in views_by_author.items() if author_id and count
+    ]
+    if requests:
+        mongo.db[STATS_COLLECTION].bulk_write(requests, ordered=True)
+
+
+def _aggregate_stats(match):
+    return mongo.db.articles.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$author_id",
+            "article_count": {"$sum": 1},
+            "total_views": {"$sum": "$views"},
+            "total_likes": {"$sum": "$likes"}
+        }}
+    ])
+
+
+def rebuild_author_stats(author_id=None, batch_size=1000):
+    """用聚合重新计算统计，修正计数偏差；不指定作者时重建全部"""
+    match = {"author_id": author_id} if author_id else {"author_id": {"$exists": True}}
+    rebuilt_at = datetime.datetime.now()
+    collection = mongo.db[STATS_COLLECTION]
+
+    updated = 0
+    requests = []
+    for doc in _aggregate_stats(match):
+        doc['rebuilt_at'] = rebuilt_at
+        requests.append(ReplaceOne({"_id": doc['_id']}, doc, upsert=True))
+        if len(requests) >= batch_size:
+            collection.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        updated += len(requests)
+
+    if author_id:
+        # 作者已没有文章时写入零值
+        if not updated:
+            doc = {field: 0 for field in STAT_FIELDS}
+            doc['rebuilt_at'] = rebuilt_at
+            collection.replace_one({"_id": author_id}, doc, upsert=True)
+            updated = 1
+    else:
+        # 删除本次没有重建到的作者（已没有文章）
+        collection.delete_many({"rebuilt_at": {"$ne": rebuilt_at}})
+
+    return updated
+
+
+def get_author_stats(author_id):
+    stats = read_db()[STATS_COLLECTION].find_one({"_id": author_id})
+    if stats is None:
+        # 从节点可能还没有复制新作者的统计，补算后从主节点读取
+        rebuild_author_stats(author_id)
+        stats = mongo.db[STATS_COLLECTION].find_one({"_id": author_id}) or {}
+    return {field: stats.get(field, 0) for field in STAT_FIELDS}
+
+
+stats_cli = AppGroup('stats', help='作者统计相关命令')
+
+
+@stats_cli.command('rebuild')
+@click.option('--author', 'author_id', default=None, help='只重建指定作者的统计')
+def rebuild_command(author_id):
+    """重新计算作者统计"""
+    count = rebuild_author_stats(author_id)
+    click.echo(f"已更新 {count} 位作者的统计")
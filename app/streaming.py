@@ -0,0 +1,37 @@
+import logging
+
+from flask import current_app, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+
+def render_stream(template_name, **context):
+    """流式渲染模板，返回字符串片段的生成器
+
+    模板片段很碎，合并到 STREAM_CHUNK_SIZE 个字符再产出；页面头部先发出，
+    列表部分随游标读取逐段发出。
+    """
+    app = current_app._get_current_object()
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+    chunk_size = app.config.get('STREAM_CHUNK_SIZE', 2048)
+
+    def generate():
+        buffer = []
+        size = 0
+        try:
+            for piece in template.generate(context):
+                buffer.append(piece)
+                size += len(piece)
+                if size >= chunk_size:
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+        except Exception:
+            # 响应头已经发出，只能记录错误并中断连接
+            logger.exception("流式渲染页面错误", extra={"fields": {"template": template_name}})
+            raise
+        if buffer:
+            yield ''.join(buffer)
+
+    return stream_with_context(generate())
@@ -0,0 +1,180 @@
+import io
+import logging
+import re
+
+import click
+import gridfs
+from bson.objectid import ObjectId
+from flask.cli import AppGroup
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app import mongo
+from app.jobs import job_queue
+from app.media import MEDIA_URL_PREFIX, media_fs
+from app.page_cache import page_cache
+
+logger = logging.getLogger(__name__)
+
+# 缩略图存放在 GridFS 的 thumbnails 集合中，文件 _id 为 <原图哈希>-<宽度>.<扩展名>
+THUMBNAIL_COLLECTION = 'thumbnails'
+THUMBNAIL_URL_PREFIX = MEDIA_URL_PREFIX + 'thumbs/'
+
+# 尺寸或编码参数变化时递增，旧版本的缩略图字段由 thumbnails backfill 重新生成
+THUMBNAIL_VERSION = 1
+
+# 列表卡片宽约 400 像素，另生成一份供高分屏使用；高度最多为宽度的两倍
+THUMBNAIL_WIDTHS = (400, 800)
+THUMBNAIL_FORMATS = (('webp', 'WEBP', 'image/webp'), ('jpg', 'JPEG', 'image/jpeg'))
+THUMBNAIL_QUALITY = 80
+
+# 只为图片存储中的图片生成缩略图，不下载外部图片
+SOURCE_RE = re.compile('^' + re.escape(MEDIA_URL_PREFIX) + r'([0-9a-f]{64})$')
+THUMBNAIL_NAME_RE = re.compile(r'^[0-9a-f]{64}-\d+\.(webp|jpg)$')
+
+
+def thumbnail_fs():
+    return gridfs.GridFS(mongo.db, collection=THUMBNAIL_COLLECTION)
+
+
+def thumbnail_name(digest, width, ext):
+    return f'{digest}-{width}.{ext}'
+
+
+def source_digest(cover_image):
+    match = SOURCE_RE.match(cover_image or '')
+    return match.group(1) if match else None
+
+
+def cover_thumb(digest):
+    """缩略图字段：列表模板中 <picture> 使用的 src 和 srcset"""
+    def srcset(ext):
+        return ', '.join(
+            f'{THUMBNAIL_URL_PREFIX}{thumbnail_name(digest, width, ext)} {width}w' for width in THUMBNAIL_WIDTHS
+        )
+    return {
+        "src": THUMBNAIL_URL_PREFIX + thumbnail_name(digest, THUMBNAIL_WIDTHS[0], 'jpg'),
+        "srcset": srcset('jpg'),
+        "webp_srcset": srcset('webp'),
+        "version": THUMBNAIL_VERSION,
+    }
+
+
+def existing_thumb(cover_image):
+    """原图的缩略图已全部生成时返回缩略图字段，否则返回 None
+
+    缩略图按原图哈希保存，多篇文章使用同一张封面时只生成一次。
+    """
+    digest = source_digest(cover_image)
+    if digest is None:
+        return None
+    names = [thumbnail_name(digest, width, ext) for width in THUMBNAIL_WIDTHS for ext, _, _ in THUMBNAIL_FORMATS]
+    found = mongo.db[THUMBNAIL_COLLECTION + '.files'].count_documents({"_id": {"$in": names}})
+    return cover_thumb(digest) if found == len(names) else None
+
+
+def render_thumbnails(data):
+    """解码一次原图，返回 [(宽度, 扩展名, content_type, 数据)]"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        variants = []
+        for width in THUMBNAIL_WIDTHS:
+            resized = image.copy()
+            resized.thumbnail((width, width * 2), Image.LANCZOS)
+            for ext, fmt, content_type in THUMBNAIL_FORMATS:
+                frame = resized.convert('RGB') if fmt == 'JPEG' else resized
+                out = io.BytesIO()
+                frame.save(out, fmt, quality=THUMBNAIL_QUALITY, optimize=fmt == 'JPEG')
+                variants.append((width, ext, content_type, out.getvalue()))
+        return variants
+
+
+def generate_thumbnails(cover_image):
+    """为封面图生成缩略图并返回缩略图字段；不是图片存储中的图片或无法解码时返回 None"""
+    thumb = existing_thumb(cover_image)
+    if thumb is not None:
+        return thumb
+    digest = source_digest(cover_image)
+    if digest is None:
+        return None
+
+    source = media_fs().find_one({"_id": digest})
+    if source is None:
+        return None
+    try:
+        variants = render_thumbnails(source.read())
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        logger.warning("无法生成缩略图", exc_info=True, extra={"fields": {"digest": digest}})
+        return None
+
+    fs = thumbnail_fs()
+    for width, ext, content_type, data in variants:
+        name = thumbnail_name(digest, width, ext)
+        if fs.exists(name):
+            continue
+        try:
+            fs.put(data, _id=name, content_type=content_type, source=digest)
+        except gridfs.errors.FileExists:
+            # 其他进程同时生成了同一张缩略图
+            pass
+    return cover_thumb(digest)
+
+
+def update_cover_thumb(article_id, cover_image):
+    """生成文章封面的缩略图并写入文章，返回是否写入
+
+    只有封面仍是 cover_image 时才写入，期间文章被修改时结果丢弃。
+    """
+    thumb = generate_thumbnails(cover_image)
+    if thumb is None:
+        return False
+    result = mongo.db.articles.update_one(
+        {"_id": ObjectId(article_id), "cover_image": cover_image},
+        {"$set": {"cover_thumb": thumb}}
+    )
+    return result.matched_count > 0
+
+
+@job_queue.handler('thumbnails.generate')
+def generate_article_thumbnails(article_id):
+    """后台任务：为文章当前的封面生成缩略图，写入后使列表页缓存失效"""
+    article = mongo.db.articles.find_one({"_id": ObjectId(article_id)}, {"cover_image": 1})
+    if article is None:
+        return
+    if update_cover_thumb(article_id, article.get('cover_image')):
+        page_cache.invalidate(article_id=str(article_id))
+
+
+def schedule_thumbnails(article_id, cover_image):
+    """文章发布或更新后调用，封面没有可用缩略图时加入生成任务"""
+    if source_digest(cover_image) is None:
+        return
+    job_queue.enqueue(
+        'thumbnails.generate', {"article_id": str(article_id)}, key=f'thumbnails.generate:{article_id}'
+    )
+
+
+thumbnails_cli = AppGroup('thumbnails', help='封面缩略图命令')
+
+
+@thumbnails_cli.command('backfill')
+@click.option('--batch-size', default=100, show_default=True, help='每批读取的文档数')
+@click.option('--force', is_flag=True, help='检查全部文章，补齐缺失的缩略图文件')
+def backfill_command(batch_size, force):
+    """为缺少缩略图或缩略图版本过旧的文章生成封面缩略图"""
+    query = {"cover_image": {"$regex": '^' + re.escape(MEDIA_URL_PREFIX)}}
+    if not force:
+        query["cover_thumb.version"] = {"$ne": THUMBNAIL_VERSION}
+
+    updated = skipped = 0
+    cursor = mongo.db.articles.find(query, {"cover_image": 1}).batch_size(batch_size)
+    for article in cursor:
+        if update_cover_thumb(article['_id'], article['cover_image']):
+            updated += 1
+        else:
+            skipped += 1
+
+    if updated:
+        page_cache.invalidate()
+    click.echo(f"已更新 {updated} 篇文章的缩略图，跳过 {skipped} 篇")
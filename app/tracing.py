@@ -0,0 +1,270 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 次数直方图的分桶
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# 过载判断使用近期请求中 MongoDB 命令耗时的分位数：统计窗口（秒）、最多保留的样本数，
+# 窗口内样本少于下限时不判断，单条慢命令不会触发
+LATENCY_WINDOW = 10.0
+LATENCY_MAX_SAMPLES = 2000
+LATENCY_MIN_SAMPLES = 50
+LATENCY_PERCENTILE = 0.9
+
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+class RequestTrace:
+    """一次请求中执行的 MongoDB 命令"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.commands = []
+        self._pending = {}
+
+    def command_started(self, request_id, name, collection):
+        self._pending[request_id] = (name, collection)
+
+    def command_finished(self, request_id, name, duration_micros):
+        name, collection = self._pending.pop(request_id, (name, ''))
+        self.commands.append((name, collection, duration_micros / 1000.0))
+
+    def mongo_breakdown(self):
+        """按 (命令, 集合) 汇总次数和耗时（毫秒）"""
+        breakdown = defaultdict(lambda: [0, 0.0])
+        for name, collection, duration_ms in self.commands:
+            item = breakdown[(name, collection)]
+            item[0] += 1
+            item[1] += duration_ms
+        return breakdown
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """把每条 MongoDB 命令的耗时记到当前请求上，并计入全局指标"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._samples = deque(maxlen=LATENCY_MAX_SAMPLES)
+
+    def started(self, event):
+        trace = _current_trace.get()
+        if trace is not None:
+            # getMore 的集合名在 collection 字段中
+            collection = event.command.get(event.command_name)
+            if not isinstance(collection, str):
+                collection = event.command.get('collection')
+            trace.command_started(
+                event.request_id,
+                event.command_name,
+                collection if isinstance(collection, str) else ''
+            )
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.command_finished(event.request_id, event.command_name, event.duration_micros)
+            # 只统计请求中的命令，命令行和后台任务的聚合等维护操作不计入过载判断
+            self._samples.append((time.monotonic(), event.duration_micros / 1000.0))
+        self.metrics.observe(
+            'mongo_command_duration_seconds',
+            event.duration_micros / 1_000_000,
+            command=event.command_name
+        )
+
+    def recent_latency_ms(self):
+        """本进程最近 LATENCY_WINDOW 秒内请求中 MongoDB 命令耗时的 p90（毫秒）
+
+        样本不足 LATENCY_MIN_SAMPLES 个时返回 0，只有持续变慢才会超过阈值。
+        """
+        cutoff = time.monotonic() - LATENCY_WINDOW
+        # deque 的 append 是原子操作，复制后在副本上统计
+        durations = sorted(duration for at, duration in list(self._samples) if at >= cutoff)
+        if len(durations) < LATENCY_MIN_SAMPLES:
+            return 0.0
+        return durations[min(int(len(durations) * LATENCY_PERCENTILE), len(durations) - 1)]
+
+
+class Metrics:
+    """进程内的 Prometheus 指标
+
+    多进程部署时每个工作进程分别统计，/metrics 返回的是处理该次抓取的进程的数据。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._gauges = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [buckets, [0] * len(buckets), 0, 0.0]
+            for i, bound in enumerate(histogram[0]):
+                if value <= bound:
+                    histogram[1][i] += 1
+            histogram[2] += 1
+            histogram[3] += value
+
+    def gauge(self, name, func):
+        """登记一个在抓取时计算的指标"""
+        self._gauges[name] = func
+
+    def render(self):
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, text = self._help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                described.add(name)
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (h[0], [*h[1]], h[2], h[3])) for key, h in self._histograms.items())
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_labels(labels)} {value:g}')
+
+        for (name, labels), (bounds, buckets, count, total) in histograms:
+            header(name)
+            for bound, bucket_count in zip(bounds, buckets):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", f"{bound:g}"),))} {bucket_count}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:g}')
+
+        for name, func in sorted(self._gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                logger.exception("计算指标失败", extra={"fields": {"metric": name}})
+                continue
+            header(name)
+            lines.append(f'{name} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', '按路由和状态码统计的请求数')
+metrics.describe('http_request_duration_seconds', 'histogram', '按路由统计的请求耗时')
+metrics.describe('mongo_command_duration_seconds', 'histogram', 'MongoDB命令耗时')
+metrics.describe('mongo_commands_per_request', 'histogram', '每个请求执行的MongoDB命令数')
+
+command_listener = MongoCommandListener(metrics)
+
+
+def init_app(app):
+    """注册请求耗时中间件和 /metrics 接口"""
+    slow_request_ms = app.config.get('SLOW_REQUEST_MS', 500)
+
+    @app.before_request
+    def start_trace():
+        g.trace_token = _current_trace.set(RequestTrace())
+
+    @app.after_request
+    def finish_trace(response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+
+        duration = time.perf_counter() - trace.started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        breakdown = trace.mongo_breakdown()
+        mongo_ms = sum(total for _, total in breakdown.values())
+        mongo_count = sum(count for count, _ in breakdown.values())
+
+        metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', duration, route=route, method=request.method)
+        metrics.observe('mongo_commands_per_request', mongo_count, buckets=COUNT_BUCKETS, route=route)
+
+        timings = [f'app;dur={duration * 1000:.1f}', f'mongo;dur={mongo_ms:.1f};desc="{mongo_count} ops"']
+        for (name, collection), (count, total) in sorted(breakdown.items()):
+            metric = f'mongo-{name}-{collection}' if collection else f'mongo-{name}'
+            timings.append(f'{metric};dur={total:.1f};desc="{count}x"')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        fields = {
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 1),
+            "mongo_ms": round(mongo_ms, 1),
+            "mongo_ops": mongo_count,
+        }
+        if duration * 1000 >= slow_request_ms:
+            fields["mongo"] = ' '.join(
+                f'{name}/{collection or "-"}={count}x{total:.1f}ms'
+                for (name, collection), (count, total) in sorted(breakdown.items(), key=lambda item: -item[1][1])
+            )
+            logger.warning("慢请求", extra={"fields": fields})
+        else:
+            logger.debug("请求完成", extra={"fields": fields})
+        return response
+
+    @app.teardown_request
+    def end_trace(exc):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            _current_trace.reset(token)
+
+    from app.jobs import job_queue
+    from app.passwords import password_hasher
+    from app.user_cache import user_cache
+    from app.view_counter import view_counter
+    metrics.describe('bcrypt_queue_depth', 'gauge', '排队和执行中的密码哈希任务数')
+    metrics.describe('user_cache_hits_total', 'counter', '用户信息缓存命中次数')
+    metrics.describe('user_cache_misses_total', 'counter', '用户信息缓存未命中次数')
+    metrics.describe('view_counter_pending', 'gauge', '缓冲中尚未写入的浏览量')
+    metrics.describe('jobs_queued', 'gauge', '已到期、等待执行的后台任务数')
+    metrics.gauge('bcrypt_queue_depth', password_hasher.queue_depth)
+    metrics.gauge('user_cache_hits_total', lambda: user_cache.hits)
+    metrics.gauge('user_cache_misses_total', lambda: user_cache.misses)
+    metrics.gauge('view_counter_pending', view_counter.pending)
+    metrics.gauge('jobs_queued', job_queue.depth)
+
+    def metrics_view():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,264 @@
+import datetime
+import gzip
+import json
+import os
+
+import click
+from bson import json_util
+from flask.cli import AppGroup
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from app import mongo
+from app.codec import content_codec
+from app.derive import DERIVATION_VERSION, derive_article_fields
+from app.drafts import stored_fields
+from app.media import extract_inline_images
+from app.page_cache import page_cache
+from app.validation import ValidationError, validate_article, validate_user
+
+# 可以导出和导入的集合
+COLLECTIONS = ('users', 'articles', 'drafts')
+
+# ObjectId、时间等类型按 MongoDB Extended JSON 保存；时间读回为不带时区的 UTC 时间，与应用写入的一致
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=False)
+
+# 最多输出的错误明细条数
+MAX_REPORTED_ERRORS = 20
+
+
+def open_ndjson(path, mode):
+    """打开 NDJSON 文件，以 .gz 结尾时按 gzip 读写"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def export_collection(name, path, batch_size=1000, query=None, progress=None):
+    """按 _id 顺序把集合写入 NDJSON 文件，返回导出的文档数
+
+    游标按批读取，内存中只保留一批文档；先写入临时文件，完成后再改名。
+    压缩保存的正文解压后写出，导出文件与存储编码无关。
+    """
+    tmp_path = path + '.tmp' + ('.gz' if path.endswith('.gz') else '')
+    exported = 0
+    with open_ndjson(tmp_path, 'w') as f:
+        cursor = mongo.db[name].find(query or {}).sort('_id', 1).batch_size(batch_size)
+        for doc in cursor:
+            if 'content' in doc:
+                doc['content'] = content_codec.decode(doc['content'])
+            f.write(json_util.dumps(doc, json_options=JSON_OPTIONS, ensure_ascii=False))
+            f.write('\n')
+            exported += 1
+            if progress and exported % batch_size == 0:
+                progress(exported)
+    os.replace(tmp_path, path)
+    return exported
+
+
+def _prepare_user(doc):
+    validate_user(doc.get('username'), doc.get('email'), doc.get('password'))
+    # 导出的是密码哈希，明文密码导入后将无法登录
+    if not str(doc['password']).startswith('$2'):
+        raise ValidationError("password 不是 bcrypt 哈希")
+    return doc
+
+
+def _prepare_article(doc):
+    doc['content'] = content_codec.decode(doc.get('content'))
+    doc.setdefault('tags', [])
+    validate_article(doc.get('title'), doc.get('content'), doc.get('category'), doc['tags'])
+    if not doc.get('author_id'):
+        raise ValidationError("缺少 author_id")
+    doc['content'] = extract_inline_images(doc['content'])
+    doc.setdefault('views', 0)
+    doc.setdefault('likes', 0)
+    doc.setdefault('comment_count', 0)
+    # 旧版本导出的文章带有内嵌的空评论数组，评论现在单独保存
+    doc.pop('comments', None)
+    doc.setdefault('created_at', datetime.datetime.now())
+    doc.setdefault('updated_at', doc['created_at'])
+    if doc.get('derived_version') != DERIVATION_VERSION:
+        doc.update(derive_article_fields(doc['content']))
+    doc['content'] = content_codec.encode(doc['content'])
+    return doc
+
+
+def _prepare_draft(doc):
+    if not doc.get('author_id'):
+        raise ValidationError("缺少 author_id")
+    doc['content'] = extract_inline_images(content_codec.decode(doc.get('content')))
+    doc['is_draft'] = True
+    doc.setdefault('updated_at', datetime.datetime.now())
+    return stored_fields(doc)
+
+
+PREPARERS = {
+    'users': _prepare_user,
+    'articles': _prepare_article,
+    'drafts': _prepare_draft,
+}
+
+
+class ImportAborted(Exception):
+    """有序导入遇到错误后停止，检查点停在出错文档所在批次的开头"""
+
+    def __init__(self, result):
+        super().__init__(result.line)
+        self.result = result
+
+
+class ImportResult:
+    def __init__(self, line=0):
+        self.line = line
+        self.written = 0
+        self.invalid = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _read_checkpoint(checkpoint, path):
+    try:
+        with open(checkpoint, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    # 检查点属于其他文件时不使用
+    if state.get('path') != os.path.abspath(path):
+        return 0
+    return state.get('line', 0)
+
+
+def _write_checkpoint(checkpoint, path, line):
+    tmp_path = checkpoint + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"path": os.path.abspath(path), "line": line}, f)
+    os.replace(tmp_path, checkpoint)
+
+
+def import_collection(name, path, batch_size=500, ordered=False, checkpoint=None, progress=None):
+    """从 NDJSON 文件导入集合，返回 ImportResult
+
+    文档先经过与注册、发布接口相同的校验；带 _id 的文档按 _id 覆盖写入，重复导入
+    结果相同。每写完一批记录检查点（已处理的行数），中断后从检查点继续。
+    有序导入遇到第一个错误即停止，无序导入跳过出错的文档并继续。
+    """
+    prepare = PREPARERS[name]
+    start = _read_checkpoint(checkpoint, path) if checkpoint else 0
+    result = ImportResult(start)
+    requests = []
+    request_lines = []
+
+    def flush(line):
+        if requests:
+            try:
+                written = mongo.db[name].bulk_write(requests, ordered=ordered)
+                result.written += written.inserted_count + written.upserted_count + written.matched_count
+            except BulkWriteError as e:
+                details = e.details
+                result.written += details.get('nInserted', 0) + details.get('nUpserted', 0) + details.get('nMatched', 0)
+                result.failed += len(details.get('writeErrors', []))
+                for error in details.get('writeErrors', []):
+                    result.error(request_lines[error['index']], error.get('errmsg'))
+                if ordered:
+                    raise ImportAborted(result)
+            requests.clear()
+            request_lines.clear()
+        result.line = line
+        if checkpoint:
+            _write_checkpoint(checkpoint, path, line)
+        if progress:
+            progress(result)
+
+    with open_ndjson(path, 'r') as f:
+        line_no = 0
+        for line_no, line in enumerate(f, 1):
+            if line_no <= start or not line.strip():
+                continue
+            try:
+                doc = json_util.loads(line, json_options=JSON_OPTIONS)
+                if not isinstance(doc, dict):
+                    raise ValidationError("每行应为一个 JSON 对象")
+                doc = prepare(doc)
+            except (ValidationError, ValueError, TypeError) as e:
+                result.invalid += 1
+                result.error(line_no, str(e))
+                if ordered:
+                    flush(line_no - 1)
+                    raise ImportAborted(result)
+                continue
+
+            if '_id' in doc:
+                requests.append(ReplaceOne({"_id": doc['_id']}, doc, upsert=True))
+            else:
+                requests.append(InsertOne(doc))
+            request_lines.append(line_no)
+            if len(requests) >= batch_size:
+                flush(line_no)
+        flush(max(line_no, start))
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return result
+
+
+data_cli = AppGroup('data', help='数据导出和导入命令')
+
+
+@data_cli.command('export')
+@click.argument('collection', type=click.Choice(COLLECTIONS))
+@click.argument('path')
+@click.option('--batch-size', default=1000, show_default=True, help='每批从数据库读取的文档数')
+@click.option('--query', default=None, help='只导出匹配的文档，Extended JSON 格式')
+def export_command(collection, path, batch_size, query):
+    """把集合导出为 NDJSON 文件，文件名以 .gz 结尾时压缩
+
+    users 的导出包含密码哈希，请妥善保管导出文件。
+    """
+    query = json_util.loads(query, json_options=JSON_OPTIONS) if query else None
+    exported = export_collection(
+        collection, path, batch_size, query,
+        progress=lambda count: click.echo(f"已导出 {count} 条", err=True)
+    )
+    click.echo(f"已导出 {exported} 条 {collection} 到 {path}")
+
+
+@data_cli.command('import')
+@click.argument('collection', type=click.Choice(COLLECTIONS))
+@click.argument('path')
+@click.option('--batch-size', default=500, show_default=True, help='每批写入的文档数')
+@click.option('--ordered', is_flag=True, help='有序写入，遇到第一个错误即停止')
+@click.option('--checkpoint', default=None, help='检查点文件，默认为 <PATH>.checkpoint')
+@click.option('--restart', is_flag=True, help='忽略已有的检查点，从头导入')
+def import_command(collection, path, batch_size, ordered, checkpoint, restart):
+    """从 NDJSON 文件导入集合，中断后再次执行会从检查点继续"""
+    checkpoint = checkpoint or path + '.checkpoint'
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    def progress(result):
+        click.echo(f"已处理到第 {result.line} 行，写入 {result.written} 条", err=True)
+
+    try:
+        result = import_collection(collection, path, batch_size, ordered, checkpoint, progress)
+        aborted = False
+    except ImportAborted as e:
+        result = e.result
+        aborted = True
+
+    click.echo(f"已写入 {result.written} 条，校验失败 {result.invalid} 条，写入失败 {result.failed} 条")
+    for line, message in result.errors:
+        click.echo(f"  第 {line} 行: {message}", err=True)
+
+    if collection == 'articles' and result.written:
+        page_cache.invalidate()
+        click.echo("导入文章后请执行 engagement recount、stats rebuild、facets rebuild、search rebuild、"
+                   "recommend build 和 thumbnails backfill 更新计数、统计、分类标签计数、搜索索引、相关文章和封面缩略图")
+
+    if aborted:
+        click.echo(f"导入已停止，检查点在第 {_read_checkpoint(checkpoint, path)} 行，修正后再次执行即可继续", err=True)
+        raise click.exceptions.Exit(1)
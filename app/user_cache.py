@@ -0,0 +1,48 @@
+from bson.objectid import ObjectId
+
+from app import mongo
+from app.cache import TTLCache
+
+# 只缓存页面需要的公开字段，不包含密码
+PUBLIC_USER_FIELDS = {"username": 1, "email": 1, "created_at": 1, "bio": 1}
+
+
+class UserCache:
+    """按用户ID缓存用户公开信息"""
+
+    def __init__(self, app=None):
+        self._cache = TTLCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._cache = TTLCache(
+            max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000),
+            ttl=app.config.get('USER_CACHE_TTL', 300)
+        )
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    def get(self, user_id):
+        """返回用户公开信息的副本，用户不存在时返回 None"""
+        user_id = str(user_id)
+        user = self._cache.get(user_id)
+        if user is None:
+            user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, PUBLIC_USER_FIELDS)
+            if user is None:
+                return None
+            self._cache.set(user_id, user)
+        return dict(user)
+
+    def invalidate(self, user_id):
+        """用户信息变化后调用"""
+        self._cache.delete(str(user_id))
+
+
+user_cache = UserCache()
@@ -0,0 +1,45 @@
+"""注册、发布文章和评论的数据校验，接口和批量导入共用"""
+
+TITLE_MIN_LENGTH = 5
+TITLE_MAX_LENGTH = 100
+COMMENT_MAX_LENGTH = 2000
+
+
+class ValidationError(ValueError):
+    """数据不满足要求，消息可以直接返回给用户"""
+
+
+def validate_user(username, email, password):
+    if not username or not email or not password:
+        raise ValidationError("所有字段都是必填的")
+
+
+def validate_registration(username, email, password, confirm_password):
+    validate_user(username, email, password)
+    if not confirm_password:
+        raise ValidationError("所有字段都是必填的")
+    if password != confirm_password:
+        raise ValidationError("两次输入的密码不一致")
+
+
+def validate_article(title, content, category, tags=()):
+    if not title or not content or not category:
+        raise ValidationError("文章标题、内容和分类为必填项")
+    if len(title) < TITLE_MIN_LENGTH or len(title) > TITLE_MAX_LENGTH:
+        raise ValidationError(f"标题长度应在{TITLE_MIN_LENGTH}-{TITLE_MAX_LENGTH}字之间")
+    validate_tags(tags)
+
+
+def validate_tags(tags):
+    # 标签必须是字符串数组，单个字符串会被当作多个单字标签计数
+    if not isinstance(tags, (list, tuple)):
+        raise ValidationError("标签必须是数组")
+    if any(not isinstance(tag, str) or not tag.strip() for tag in tags):
+        raise ValidationError("标签必须是非空字符串")
+
+
+def validate_comment(content):
+    if not content or not content.strip():
+        raise ValidationError("评论内容不能为空")
+    if len(content) > COMMENT_MAX_LENGTH:
+        raise ValidationError(f"评论不能超过{COMMENT_MAX_LENGTH}字")
@@ -0,0 +1,174 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app import mongo
+from app.stats import increment_author_stats, increment_author_views
+
+logger = logging.getLogger(__name__)
+
+
+def _unwritten(items, error):
+    """有序批量写入出错时，从出错的那一项开始都没有写入"""
+    write_errors = error.details.get('writeErrors') or [{"index": 0}]
+    return Counter(dict(items[write_errors[0]['index']:]))
+
+
+class ViewCounterBuffer:
+    """文章浏览量计数
+
+    exact 模式下每次浏览直接写入数据库；buffered 模式下在进程内合并同一篇
+    文章的增量，按时间间隔或待写入文章数阈值批量写入，进程退出时也会写入。
+    作者的总浏览量只计入写入时文章仍存在的增量：删除文章时按文章当时的浏览量
+    扣除，已删除文章的增量计入作者会使总浏览量偏高。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'exact'
+        self.flush_interval = 5.0
+        self.max_pending = 1000
+        self._lock = threading.Lock()
+        self._views = Counter()
+        self._authors = {}
+        self._author_views = Counter()
+        self._pid = None
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('VIEW_COUNTER_MODE', 'exact')
+        self.flush_interval = app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 5.0)
+        self.max_pending = app.config.get('VIEW_COUNTER_MAX_PENDING', 1000)
+        atexit.register(self.shutdown)
+
+    def record(self, article_id, author_id=None):
+        """记录一次浏览"""
+        if self.mode != 'buffered':
+            result = mongo.db.articles.update_one(
+                {"_id": ObjectId(article_id)},
+                {"$inc": {"views": 1}}
+            )
+            if result.matched_count:
+                increment_author_stats(author_id, views=1)
+            return
+
+        with self._lock:
+            self._ensure_worker()
+            self._views[str(article_id)] += 1
+            if author_id:
+                self._authors[str(article_id)] = author_id
+            full = len(self._views) >= self.max_pending
+
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return sum(self._views.values())
+
+    def flush(self):
+        """把缓冲的增量用一次 bulk_write 写入数据库"""
+        with self._lock:
+            views, self._views = self._views, Counter()
+            authors, self._authors = self._authors, {}
+            # 上次写入失败、等待重试的作者增量
+            author_views, self._author_views = self._author_views, Counter()
+
+        if not views and not author_views:
+            return
+
+        # 文章和作者分别有序写入，失败时只把没有写入的部分放回缓冲区，下次重试，
+        # 已写入的增量不会重复计入
+        article_items = list(views.items())
+        failed_views = Counter()
+        failed_author_views = Counter()
+        with self.app.app_context():
+            written, unmatched = [], 0
+            try:
+                result = mongo.db.articles.bulk_write([
+                    UpdateOne({"_id": ObjectId(article_id)}, {"$inc": {"views": count}})
+                    for article_id, count in article_items
+                ], ordered=True)
+                written, unmatched = article_items, len(article_items) - result.matched_count
+            except BulkWriteError as e:
+                logger.exception("写入浏览量失败")
+                failed_views = _unwritten(article_items, e)
+                written = article_items[:len(article_items) - len(failed_views)]
+                unmatched = len(written) - e.details.get('nMatched', len(written))
+            except Exception:
+                # 连接错误等无法确定写入了多少，全部重试，可能重复计入少量浏览量
+                logger.exception("写入浏览量失败")
+                failed_views = views
+
+            # 只有写入了文章的增量才计入作者
+            if unmatched:
+                written = self._matched(written, unmatched)
+            for article_id, count in written:
+                if authors.get(article_id):
+                    author_views[authors[article_id]] += count
+            author_items = [(author_id, count) for author_id, count in author_views.items() if author_id and count]
+
+            try:
+                increment_author_views(dict(author_items))
+            except BulkWriteError as e:
+                logger.exception("写入作者浏览量失败")
+                failed_author_views = _unwritten(author_items, e)
+            except Exception:
+                logger.exception("写入作者浏览量失败")
+                failed_author_views = Counter(dict(author_items))
+
+        if failed_views or failed_author_views:
+            with self._lock:
+                self._views.update(failed_views)
+                for article_id in failed_views:
+                    if article_id in authors:
+                        self._authors.setdefault(article_id, authors[article_id])
+                self._author_views.update(failed_author_views)
+
+    def _matched(self, items, unmatched):
+        """批量写入只返回匹配的总数，用文章是否仍存在找出匹配的那些
+
+        写入之后才删除的文章也不再存在，但删除时已按包含这次增量的浏览量扣除；
+        只有同时有文章不存在和刚被删除时无法区分，此时按未匹配处理，少计的浏览量
+        由 stats rebuild 修正。
+        """
+        ids = [ObjectId(article_id) for article_id, _ in items]
+        existing = {str(doc['_id']) for doc in mongo.db.articles.find({"_id": {"$in": ids}}, {"_id": 1})}
+        if len(items) - len(existing) > unmatched:
+            logger.warning("无法确定浏览量写入了哪些文章", extra={"fields": {"unmatched": unmatched}})
+        return [(article_id, count) for article_id, count in items if article_id in existing]
+
+    def shutdown(self):
+        self._stop.set()
+        if self.mode == 'buffered' and self._pid == os.getpid():
+            self.flush()
+
+    def _ensure_worker(self):
+        # fork 之后子进程没有定时线程，且不应继承父进程的缓冲
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._views.clear()
+        self._authors.clear()
+        self._author_views.clear()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+view_counter = ViewCounterBuffer()
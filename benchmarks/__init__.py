@@ -0,0 +1,13 @@
+"""压测和微基准
+
+    python -m benchmarks seed --articles 100000
+    python -m benchmarks run --output report.json
+    python -m benchmarks run --url http://127.0.0.1:8000 --concurrency 16
+    python -m benchmarks run --mongomock --articles 2000
+    python -m benchmarks micro
+
+seed 向 BENCH_MONGO_URI 指向的数据库（默认 world_guide_bench，不使用应用的
+MONGO_URI）写入合成数据；run 通过 Flask 测试客户端或
+HTTP 驱动各个场景，以 JSON 输出吞吐量、延迟分位数和每个请求的 MongoDB 命令数，
+便于比较不同版本在 1 万、10 万、100 万篇文章下的表现。
+"""
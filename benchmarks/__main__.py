@@ -0,0 +1,176 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from app import create_app, mongo
+from app.indexes import ensure_indexes
+from app.facets import rebuild_facets
+from app.search import rebuild_index
+from app.stats import rebuild_author_stats
+from benchmarks.corpus import BENCH_MONGO_URI, corpus_size, drop_corpus, is_bench_database, seed_corpus
+from benchmarks.load import SCENARIOS, ClientSession, HttpSession, load_context, run_scenario
+from benchmarks.micro import run_micro
+
+
+def use_mongomock():
+    """把应用的数据库换成进程内的 mongomock，仅适用于测试客户端模式"""
+    try:
+        import mongomock
+        import mongomock.gridfs
+    except ImportError:
+        sys.exit('使用 --mongomock 需要先安装 mongomock')
+    mongomock.gridfs.enable_gridfs_integration()
+    client = mongomock.MongoClient()
+    mongo.cx = client
+    mongo.db = client['world_guide_bench']
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def progress(name, done, total):
+    print(f'{name}: {done}/{total}', file=sys.stderr)
+
+
+def seed(app, args):
+    with app.app_context():
+        if getattr(args, 'drop', False):
+            if not is_bench_database(mongo.db.name):
+                sys.exit(f'{mongo.db.name} 不是压测数据库（名称需以 _bench 结尾），拒绝 --drop')
+            drop_corpus()
+        elif mongo.db.articles.estimated_document_count():
+            sys.exit('数据库中已有文章，加 --drop 清空后重新生成')
+
+        counts = seed_corpus(
+            users=args.users, articles=args.articles, drafts=args.drafts,
+            images=args.images, seed=args.seed, progress=progress
+        )
+        ensure_indexes()
+        rebuild_author_stats()
+        rebuild_facets()
+        if args.search:
+            rebuild_index()
+    return counts
+
+
+def write_report(report, output):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+def report_meta(app, mode, target):
+    return {
+        "started_at": datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "mode": mode,
+        "target": target,
+        "config": {key: app.config.get(key) for key in (
+            'PAGE_CACHE_BACKEND', 'VIEW_COUNTER_MODE', 'BCRYPT_LOG_ROUNDS', 'BCRYPT_POOL_SIZE',
+            'JOB_QUEUE_MODE', 'RATE_LIMIT_BACKEND'
+        )},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='世界指南压测工具')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_corpus_options(command):
+        command.add_argument('--users', type=int, default=200, help='测试用户数')
+        command.add_argument('--articles', type=int, default=10000, help='文章数')
+        command.add_argument('--drafts', type=int, default=1000, help='草稿数')
+        command.add_argument('--images', type=int, default=64, help='文章引用的不同图片数')
+        command.add_argument('--search', action='store_true', help='同时建立搜索索引')
+
+    seed_parser = commands.add_parser('seed', help='写入合成数据')
+    add_corpus_options(seed_parser)
+    seed_parser.add_argument('--drop', action='store_true', help='先删除已有数据')
+    seed_parser.add_argument('--seed', type=int, default=42, help='随机种子')
+
+    run_parser = commands.add_parser('run', help='执行压测场景')
+    add_corpus_options(run_parser)
+    run_parser.add_argument('--url', help='已启动服务的地址；不指定时在当前进程内使用测试客户端')
+    run_parser.add_argument('--mongomock', action='store_true', help='使用进程内的 mongomock 并先写入数据')
+    run_parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔的场景名')
+    run_parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    run_parser.add_argument('--concurrency', type=int, default=1, help='并发线程数')
+    run_parser.add_argument('--warmup', type=int, default=10, help='每个线程计时前的预热请求数')
+    run_parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    run_parser.add_argument('--output', help='报告输出文件，默认输出到标准输出')
+
+    micro_parser = commands.add_parser('micro', help='纯函数微基准')
+    micro_parser.add_argument('--iterations', type=int, default=200, help='每个用例的执行次数')
+    micro_parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    micro_parser.add_argument('--output', help='报告输出文件，默认输出到标准输出')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'micro':
+        write_report({"micro": run_micro(args.iterations, args.seed)}, args.output)
+        return
+
+    # 压测请求都来自同一IP，测试客户端模式下默认关闭限流；压测已启动的服务时需在服务端设置
+    os.environ.setdefault('RATE_LIMIT_BACKEND', 'none')
+    # 压测数据写入单独的数据库，不使用应用的 MONGO_URI，避免误写或误删线上数据
+    os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', BENCH_MONGO_URI)
+    app = create_app()
+
+    if args.command == 'seed':
+        counts = seed(app, args)
+        print(json.dumps(counts, ensure_ascii=False))
+        return
+
+    if args.mongomock:
+        if args.url:
+            sys.exit('--mongomock 只能用于测试客户端模式')
+        use_mongomock()
+        seed(app, args)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f'未知场景: {", ".join(unknown)}')
+
+    with app.app_context():
+        ctx = load_context()
+        corpus = corpus_size()
+
+    if args.url:
+        mode, target = 'http', args.url
+        make_session = lambda: HttpSession(args.url)
+    else:
+        mode, target = 'test_client', 'mongomock' if args.mongomock else 'mongodb'
+        make_session = lambda: ClientSession(app)
+
+    report = {"meta": report_meta(app, mode, target), "corpus": corpus, "scenarios": {}}
+    for name in names:
+        report["scenarios"][name] = run_scenario(
+            name, make_session, ctx,
+            requests=args.requests, concurrency=args.concurrency,
+            warmup=args.warmup, seed=args.seed
+        )
+        progress(name, report["scenarios"][name]["requests"], args.requests)
+        if args.mongomock:
+            # mongomock 不产生命令监听事件，无法统计MongoDB命令
+            report["scenarios"][name].update(mongo_ops_per_request=None, mongo_ms_per_request=None)
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
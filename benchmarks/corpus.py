@@ -0,0 +1,212 @@
+"""合成测试数据
+
+同一个随机种子总是生成相同的用户、文章和草稿，不同次运行的结果可以直接比较。
+文章和线上发布接口写入的格式一致：内嵌图片已转存到图片存储，派生字段已计算。
+"""
+import base64
+import datetime
+import random
+import struct
+import zlib
+
+from app import mongo
+from app.codec import content_codec
+from app.derive import derive_article
+from app.drafts import stored_fields
+from app.indexes import INDEXES
+from app.media import MEDIA_COLLECTION, media_url, store_image
+from app.passwords import password_hasher
+from app.search import DOCS_COLLECTION, TERMS_COLLECTION
+from app.stats import STATS_COLLECTION
+from app.thumbnails import THUMBNAIL_COLLECTION
+
+# 压测默认使用的数据库，与应用的 world_guide 分开
+BENCH_MONGO_URI = 'mongodb://localhost:27017/world_guide_bench'
+# 只允许清空名称以此结尾的数据库
+BENCH_DB_SUFFIX = '_bench'
+
+# 所有测试用户共用的密码
+BENCH_PASSWORD = 'benchmark-password'
+USERNAME_PREFIX = 'bench_user_'
+
+CATEGORIES = ('technology', 'culture', 'travel', 'food', 'health', 'education', 'finance', 'other')
+
+CJK_WORDS = (
+    '旅行', '城市', '山脉', '河流', '古镇', '美食', '文化', '历史', '博物馆', '街道',
+    '市场', '寺庙', '海岸', '森林', '沙漠', '火车', '航班', '酒店', '地图', '季节',
+    '风景', '建筑', '传统', '节日', '语言', '音乐', '咖啡', '茶馆', '夜市', '港口',
+)
+LATIN_WORDS = (
+    'guide', 'route', 'budget', 'museum', 'station', 'coffee', 'island', 'harbor',
+    'festival', 'market', 'temple', 'mountain', 'valley', 'railway', 'hostel', 'visa',
+)
+TAGS = ('自由行', '美食', '摄影', '徒步', '城市漫步', 'budget', 'family', 'solo', '历史', '海岛')
+
+BATCH_SIZE = 1000
+
+
+def _png(width, height, rng):
+    """生成一张随机色块的PNG图片"""
+    rows = []
+    for _ in range(height):
+        color = bytes(rng.randrange(256) for _ in range(3))
+        rows.append(b'\x00' + color * width)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows))) + chunk(b'IEND', b''))
+
+
+def image_data_url(rng, width=160, height=120):
+    """编辑器嵌入图片时产生的 data URL"""
+    return 'data:image/png;base64,' + base64.b64encode(_png(width, height, rng)).decode('ascii')
+
+
+def sentence(rng):
+    words = []
+    for _ in range(rng.randint(8, 20)):
+        words.append(rng.choice(LATIN_WORDS) if rng.random() < 0.15 else rng.choice(CJK_WORDS))
+    return ''.join(words) + '。'
+
+
+def title(rng):
+    return ''.join(rng.choice(CJK_WORDS) for _ in range(rng.randint(3, 6))) + '游记'
+
+
+def article_html(rng, image_srcs, paragraphs=12):
+    """生成带标题、段落、列表和图片的文章HTML"""
+    parts = []
+    for i in range(paragraphs):
+        if i % 4 == 0:
+            level = 'h2' if i % 8 == 0 else 'h3'
+            parts.append(f'<{level}>{"".join(rng.choice(CJK_WORDS) for _ in range(3))}</{level}>')
+        parts.append('<p>' + ''.join(sentence(rng) for _ in range(rng.randint(2, 5))) + '</p>')
+        if image_srcs and i % 5 == 1:
+            parts.append(f'<p><img src="{rng.choice(image_srcs)}" alt="配图"></p>')
+        if i % 6 == 3:
+            items = ''.join(f'<li>{sentence(rng)}</li>' for _ in range(rng.randint(2, 4)))
+            parts.append(f'<ul>{items}</ul>')
+    return ''.join(parts)
+
+
+def article_payload(rng, inline_images=1, paragraphs=12):
+    """发布和保存草稿接口的请求体，图片以 data URL 内嵌"""
+    images = [image_data_url(rng) for _ in range(inline_images)]
+    return {
+        "title": title(rng),
+        "content": article_html(rng, images, paragraphs),
+        "category": rng.choice(CATEGORIES),
+        "tags": rng.sample(TAGS, rng.randint(0, 3)),
+    }
+
+
+def is_bench_database(name):
+    return name.endswith(BENCH_DB_SUFFIX)
+
+
+def drop_corpus():
+    """删除应用使用的全部集合，包括任务、限流、缓存和派生数据，重复运行时不混入上次的状态
+
+    登记了索引的集合取自 INDEXES，新增集合时只需登记索引；只按 _id 读写的集合和图片存储单独列出。
+    数据库名不以 _bench 结尾时拒绝执行，避免误删应用数据。
+    """
+    if not is_bench_database(mongo.db.name):
+        raise ValueError(f'{mongo.db.name} 不是压测数据库，拒绝删除')
+    names = set(INDEXES)
+    names.update((STATS_COLLECTION, TERMS_COLLECTION, DOCS_COLLECTION))
+    for bucket in (MEDIA_COLLECTION, THUMBNAIL_COLLECTION):
+        names.update((bucket + '.files', bucket + '.chunks'))
+    for name in sorted(names):
+        mongo.db.drop_collection(name)
+
+
+def seed_corpus(users=200, articles=10000, drafts=1000, images=64, seed=42, progress=None):
+    """写入合成数据，需要在应用上下文中调用
+
+    返回各集合写入的文档数。
+    """
+    rng = random.Random(seed)
+    counts = {}
+
+    # 所有用户共用一个哈希，工作因子与当前配置一致，登录时不会触发重新哈希
+    hashed = password_hasher.hash(BENCH_PASSWORD)
+    user_docs = []
+    for i in range(users):
+        user_docs.append({
+            "username": f'{USERNAME_PREFIX}{i}',
+            "email": f'{USERNAME_PREFIX}{i}@example.com',
+            "password": hashed,
+        })
+    # insert_many 会把生成的 _id 写回文档
+    mongo.db.users.insert_many(user_docs, ordered=False)
+    counts['users'] = len(user_docs)
+    authors = [(str(doc['_id']), doc['username']) for doc in user_docs]
+
+    image_srcs = [media_url(store_image(_png(320, 240, rng), 'image/png')) for _ in range(images)]
+    counts['images'] = len(image_srcs)
+
+    # 文章的发布时间分布在过去一年内
+    now = datetime.datetime.now().replace(microsecond=0)
+    written = 0
+    batch = []
+    for _ in range(articles):
+        author_id, author_name = rng.choice(authors)
+        content = article_html(rng, image_srcs, paragraphs=rng.randint(6, 20))
+        created_at = now - datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        doc = {
+            "title": title(rng),
+            "content": content_codec.encode(content),
+            "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+            "author_id": author_id,
+            "author_name": author_name,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "views": rng.randrange(5000),
+            "likes": 0,
+            "comment_count": 0,
+        }
+        doc.update(derive_article(content)[0])
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            mongo.db.articles.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+            if progress:
+                progress('articles', written, articles)
+    if batch:
+        mongo.db.articles.insert_many(batch, ordered=False)
+        written += len(batch)
+    counts['articles'] = written
+
+    draft_docs = []
+    for _ in range(drafts):
+        author_id, _ = rng.choice(authors)
+        updated_at = now - datetime.timedelta(seconds=rng.randrange(30 * 24 * 3600))
+        draft_docs.append(stored_fields({
+            "title": title(rng),
+            "content": article_html(rng, image_srcs, paragraphs=rng.randint(2, 8)),
+            "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(TAGS, rng.randint(0, 2)),
+            "author_id": author_id,
+            "created_at": updated_at,
+            "updated_at": updated_at,
+            "is_draft": True,
+        }))
+    for start in range(0, len(draft_docs), BATCH_SIZE):
+        mongo.db.drafts.insert_many(draft_docs[start:start + BATCH_SIZE], ordered=False)
+    counts['drafts'] = len(draft_docs)
+
+    return counts
+
+
+def corpus_size():
+    """当前数据库中测试相关集合的文档数"""
+    return {
+        "users": mongo.db.users.estimated_document_count(),
+        "articles": mongo.db.articles.estimated_document_count(),
+        "drafts": mongo.db.drafts.estimated_document_count(),
+    }
@@ -0,0 +1,214 @@
+"""压测场景和负载生成
+
+每个场景由若干线程并发执行，每个线程持有自己的会话（Flask 测试客户端或
+HTTP 连接加 Cookie），需要登录的场景在计时开始前先登录。MongoDB 命令数
+从响应的 Server-Timing 头中读取。
+"""
+import http.cookiejar
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from app import mongo
+from benchmarks.corpus import BENCH_PASSWORD, USERNAME_PREFIX, article_payload, title
+
+MONGO_TIMING_RE = re.compile(r'(?:^|,\s*)mongo;dur=([0-9.]+);desc="(\d+) ops"')
+
+# 用于详情页随机访问的文章ID数量
+SAMPLE_SIZE = 1000
+
+
+class ClientSession:
+    """在当前进程内通过 Flask 测试客户端发送请求"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, json_body=None):
+        response = self.client.open(path, method=method, data=form, json=json_body)
+        response.close()
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class HttpSession:
+    """通过 HTTP 访问已启动的服务，保持 Cookie 以维持登录状态"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, method, path, form=None, json_body=None):
+        headers = {}
+        data = None
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('Server-Timing', '')
+
+
+def login_form(rng, users):
+    return {"username": f'{USERNAME_PREFIX}{rng.randrange(users)}', "password": BENCH_PASSWORD}
+
+
+class Context:
+    """场景共用的数据：测试用户数和随机抽取的文章ID"""
+
+    def __init__(self, users, article_ids):
+        self.users = users
+        self.article_ids = article_ids
+
+
+def load_context():
+    """读取测试数据的规模，需要在应用上下文中调用"""
+    users = mongo.db.users.count_documents({"username": {"$regex": f'^{USERNAME_PREFIX}'}})
+    if not users:
+        raise RuntimeError('数据库中没有测试用户，请先运行 python -m benchmarks seed')
+    article_ids = [str(doc['_id']) for doc in mongo.db.articles.aggregate([
+        {"$sample": {"size": SAMPLE_SIZE}},
+        {"$project": {"_id": 1}}
+    ])]
+    return Context(users, article_ids)
+
+
+def _login(session, ctx, rng):
+    return session.request('POST', '/auth/api/login', form=login_form(rng, ctx.users))
+
+
+def _articles(session, ctx, rng):
+    return session.request('GET', '/auth/articles')
+
+
+def _article_detail(session, ctx, rng):
+    return session.request('GET', f'/auth/article/{rng.choice(ctx.article_ids)}')
+
+
+def _user_center(session, ctx, rng):
+    return session.request('GET', '/auth/user-center')
+
+
+def _publish_article(session, ctx, rng):
+    return session.request('POST', '/auth/api/article/publish', json_body=article_payload(rng))
+
+
+def _save_article_draft(session, ctx, rng):
+    payload = article_payload(rng, paragraphs=4)
+    # 标题从少量候选中选取，一部分请求会更新已有草稿
+    payload['title'] = title(random.Random(rng.randrange(8)))
+    return session.request('POST', '/auth/api/article/draft', json_body=payload)
+
+
+# 场景名称 -> (是否需要登录, 视为成功的状态码, 请求函数)
+SCENARIOS = {
+    "login": (False, {200}, _login),
+    "articles": (False, {200}, _articles),
+    "article_detail": (False, {200}, _article_detail),
+    "user_center": (True, {200}, _user_center),
+    "publish_article": (True, {201}, _publish_article),
+    "save_article_draft": (True, {200, 201}, _save_article_draft),
+}
+
+
+def percentile(sorted_values, p):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(p / 100.0 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def run_scenario(name, make_session, ctx, requests=200, concurrency=1, warmup=10, seed=42):
+    """并发执行一个场景，返回吞吐量、延迟分位数和每个请求的MongoDB命令数"""
+    needs_login, ok_statuses, func = SCENARIOS[name]
+    samples = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [requests]
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        session = make_session()
+        try:
+            if needs_login:
+                status, _ = session.request('POST', '/auth/api/login', form=login_form(rng, ctx.users))
+                if status != 200:
+                    raise RuntimeError(f'登录失败: {status}')
+            for _ in range(warmup):
+                func(session, ctx, rng)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        ready.wait()
+
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                status, server_timing = func(session, ctx, rng)
+            except Exception as e:
+                status, server_timing = None, ''
+                error = str(e)
+            else:
+                error = None if status in ok_statuses else f'HTTP {status}'
+            elapsed = time.perf_counter() - start
+
+            match = MONGO_TIMING_RE.search(server_timing)
+            with lock:
+                samples.append((elapsed, int(match.group(2)) if match else None,
+                                float(match.group(1)) if match else None))
+                if error:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    mongo_ops = [sample[1] for sample in samples if sample[1] is not None]
+    mongo_ms = [sample[2] for sample in samples if sample[2] is not None]
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "concurrency": concurrency,
+        "throughput_rps": round(len(samples) / wall, 2) if wall > 0 else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "mongo_ops_per_request": round(sum(mongo_ops) / len(mongo_ops), 2) if mongo_ops else None,
+        "mongo_ms_per_request": round(sum(mongo_ms) / len(mongo_ms), 3) if mongo_ms else None,
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
@@ -0,0 +1,48 @@
+"""热点路径上的纯函数微基准，不访问数据库"""
+import datetime
+import random
+import time
+
+from bson.objectid import ObjectId
+
+from app.derive import derive_article
+from app.pagination import decode_cursor, encode_cursor
+from app.search import term_weights, tokenize
+from benchmarks.corpus import article_html, title
+from benchmarks.load import percentile
+
+
+def _cases(rng):
+    content = article_html(rng, ['/media/' + '0' * 64], paragraphs=16)
+    text = derive_article(content)[1]
+    article_title = title(rng)
+    cursor = encode_cursor({"created_at": datetime.datetime(2024, 5, 1, 12, 0, 0), "_id": ObjectId()})
+    return {
+        "derive_article": lambda: derive_article(content),
+        "tokenize": lambda: tokenize(text),
+        "term_weights": lambda: term_weights(article_title, ['美食', 'budget'], text),
+        "decode_cursor": lambda: decode_cursor(cursor),
+    }
+
+
+def run_micro(iterations=200, seed=42):
+    """每个用例执行若干次，返回每次调用耗时的分位数（微秒）"""
+    results = {}
+    for name, func in _cases(random.Random(seed)).items():
+        func()
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        timings.sort()
+        results[name] = {
+            "iterations": iterations,
+            "ops_per_second": round(iterations / (sum(timings) / 1_000_000), 1),
+            "latency_us": {
+                "p50": round(percentile(timings, 50), 1),
+                "p95": round(percentile(timings, 95), 1),
+                "p99": round(percentile(timings, 99), 1),
+            },
+        }
+    return results